@@ -0,0 +1,47 @@
+"""
+Compare convert_amount with converting by adding relativedeltas to now like it
+used to, for the conversions RangeSpec asks for
+
+Run with ``python benchmarks/convert_amount.py``
+"""
+from timepiece.sizing import convert_amount, Sizes
+
+from dateutil.relativedelta import relativedelta
+from datetime import datetime
+import timeit
+
+def with_relativedelta(old_size, new_size, old_num):
+    now = datetime.utcnow()
+    class seconds_diff(relativedelta):
+        def _fix(self):
+            pass
+
+    delta = relativedelta(**{"{0}s".format(old_size): old_num})
+    if new_size == Sizes.MONTH.value:
+        return relativedelta(now + delta, now).months
+    elif new_size == Sizes.YEAR.value:
+        return relativedelta(now + delta, now).years
+    diff = seconds_diff(now + delta, now).seconds
+    if new_size == Sizes.SECOND.value:
+        return diff
+    return diff / {"minute": 60.0, "hour": 3600.0, "day": 86400.0, "week": 604800.0}[new_size]
+
+conversions = [
+      (Sizes.HOUR.value, Sizes.SECOND.value, 2)
+    , (Sizes.DAY.value, Sizes.MINUTE.value, 3)
+    , (Sizes.WEEK.value, Sizes.HOUR.value, 1)
+    , (Sizes.YEAR.value, Sizes.MONTH.value, 2)
+    ]
+
+def best(func, number=2000):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+def main():
+    print("{0:>8} {1:>8} {2:>16} {3:>12} {4:>8}".format("from", "to", "relativedelta", "table", "speedup"))
+    for old_size, new_size, num in conversions:
+        slow = best(lambda: with_relativedelta(old_size, new_size, num))
+        fast = best(lambda: convert_amount(old_size, new_size, num))
+        print("{0:>8} {1:>8} {2:>14.2f}us {3:>10.2f}us {4:>7.1f}x".format(old_size, new_size, slow * 1e6, fast * 1e6, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare finding the next time that gets through sparse filters by checking
+every time from a dense interval with the skip ahead in following
+
+Run with ``python benchmarks/filters.py``
+"""
+from timepiece.sections.final import RepeatAndFiltersSpec, FilterSpec
+from timepiece.spec import make_timepiece
+
+from datetime import datetime
+import timeit
+
+filters = [
+      ("hours: 3", {"hours": "3"})
+    , ("hours: 3, minutes: 30", {"hours": "3", "minutes": "30"})
+    , ("day_names: sun, hours: 12", {"day_names": "sun", "hours": "12"})
+    , ("months: 6, hours: 1", {"months": "6", "hours": "1"})
+    ]
+
+def one_at_a_time(spec, at):
+    nxt = spec.repeat.following(at)
+    while nxt is not None and not spec.is_filtered(nxt):
+        nxt = spec.repeat.following(nxt)
+    return nxt
+
+def best(func, number=3, repeat=3):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def main():
+    repeat = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 1, size: minute))")
+    at = datetime(2016, 7, 1, 4)
+
+    print("{0:>28} {1:>16} {2:>14} {3:>8}".format("filters", "one at a time", "skip ahead", "speedup"))
+    for name, kwargs in filters:
+        spec = RepeatAndFiltersSpec(repeat=repeat, filters=[FilterSpec.using(**kwargs)])
+        assert one_at_a_time(spec, at) == spec.following(at)
+
+        slow = best(lambda: one_at_a_time(spec, at), number=1, repeat=1)
+        fast = best(lambda: spec.following(at))
+        print("{0:>28} {1:>14.2f}ms {2:>12.2f}ms {3:>7.0f}x".format(name, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+See how long following takes when it's called over and over with the time
+moving forward a little each call, like an API server asking with utcnow
+
+Run with ``python benchmarks/following_memo.py [calls]``
+"""
+from timepiece.interning import Interner
+from timepiece.spec import make_timepiece
+
+from datetime import datetime, timedelta
+import time
+import sys
+
+specs = [
+      "between(start: epoch(epoch: 0)) & interval(every: amount(num: 15, size: minute))"
+    , "(between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: hour))) & day_name(name: mon;wed;fri)"
+    ]
+
+def forgetting(spec):
+    """Take the memo off this spec and its repeat so following works it out again"""
+    spec.__dict__.pop("_following_memo", None)
+    repeat = getattr(spec, "repeat", None)
+    if repeat is not None:
+        repeat.__dict__.pop("_following_memo", None)
+
+def timed(spec, times, forget):
+    started = time.time()
+    for at in times:
+        if forget:
+            forgetting(spec)
+        spec.following(at)
+    return time.time() - started
+
+def main(calls=100000):
+    timepiece = make_timepiece()
+    times = [datetime(2016, 7, 4, 9) + timedelta(milliseconds=ms * 5) for ms in range(calls)]
+
+    print("{0:>90} {1:>12} {2:>12}".format("spec", "worked out", "remembered"))
+    for specification in specs:
+        # Only interned specs remember, as nothing can change underneath them
+        spec = Interner().intern(timepiece.time_spec_to_object(specification))
+        slow = timed(spec, times, True)
+        fast = timed(spec, times, False)
+        print("{0:>90} {1:>10.2f}us {2:>10.2f}us".format(specification, slow / calls * 1e6, fast / calls * 1e6))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
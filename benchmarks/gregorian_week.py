@@ -0,0 +1,38 @@
+"""
+Compare FilterSpec.is_filtered with weeks set against working out the week
+with strptime and isocalendar like gregorian_week used to
+
+Run with ``python benchmarks/gregorian_week.py``
+"""
+from timepiece.sections import final
+
+from datetime import datetime, timedelta
+import timeit
+
+def with_strptime(dt):
+    iso_week = dt.isocalendar()[1]
+    base_greg = datetime.strptime('{0}-1-1'.format(dt.year), "%Y-%W-%w")
+    return iso_week if base_greg.isocalendar()[1] == 1 else iso_week - 1
+
+def best(func, number=3):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+def main(count=20000):
+    spec = final.FilterSpec.using(weeks="1;10;20;30;40;50")
+    times = [datetime(2000, 1, 1) + timedelta(hours=h * 5) for h in range(count)]
+
+    fast = best(lambda: [spec.is_filtered(t) for t in times])
+    arithmetic = final.gregorian_week
+    final.gregorian_week = with_strptime
+    try:
+        expected = [spec.is_filtered(t) for t in times]
+        slow = best(lambda: [spec.is_filtered(t) for t in times])
+    finally:
+        final.gregorian_week = arithmetic
+    assert expected == [spec.is_filtered(t) for t in times]
+
+    print("{0:>10} {1:>14} {2:>14} {3:>8}".format("times", "strptime", "arithmetic", "speedup"))
+    print("{0:>10} {1:>12.2f}ms {2:>12.2f}ms {3:>7.1f}x".format(count, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Measure how long ``import timepiece.spec`` takes in a fresh interpreter
+
+Run with ``python benchmarks/import_time.py``
+
+This uses ``python -X importtime`` to show which modules take the longest,
+which needs python3.7 or above. Older pythons only get the total.
+"""
+import subprocess
+import statistics
+import sys
+import time
+import os
+
+here = os.path.abspath(os.path.dirname(__file__))
+root = os.path.dirname(here)
+
+def importtime(module):
+    """Return {module: (self, cumulative)} in microseconds for importing this module"""
+    output = subprocess.check_output([sys.executable, "-X", "importtime", "-c", "import {0}".format(module)], cwd=root, stderr=subprocess.STDOUT)
+
+    result = {}
+    for line in output.decode().splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        result[name.strip()] = (int(own), int(cumulative))
+    return result
+
+def wall_clock(module):
+    start = time.time()
+    subprocess.check_call([sys.executable, "-c", "import {0}".format(module)], cwd=root)
+    return time.time() - start
+
+def main(module="timepiece.spec", repeat=10):
+    if sys.version_info < (3, 7):
+        took = [wall_clock(module) for _ in range(repeat)]
+        print("-X importtime needs python3.7, interpreter startup and import of {0} took {1:.1f}ms".format(module, statistics.median(took) * 1000))
+        return
+
+    runs = [importtime(module) for _ in range(repeat)]
+    print("import {0}: {1:.1f}ms (median of {2})".format(module, statistics.median(run[module][1] for run in runs) / 1000, repeat))
+
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1][1], reverse=True)
+    print("")
+    print("{0:>12} {1:>12}  {2}".format("self (ms)", "total (ms)", "module"))
+    for name, (own, cumulative) in heaviest[:15]:
+        print("{0:>12.1f} {1:>12.1f}  {2}".format(own / 1000, cumulative / 1000, name))
+
+    lazy = ["aniso8601", "dateutil", "parsimonious", "concurrent.futures"]
+    imported = [name for name in lazy if name in runs[-1]]
+    if imported:
+        print("")
+        print("These should only be imported when they are used: {0}".format(", ".join(imported)))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
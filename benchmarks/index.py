@@ -0,0 +1,60 @@
+"""
+Compare finding which specifications are filtered at a time with a FilterIndex
+against calling is_filtered on every one of them
+
+Run with ``python benchmarks/index.py [count]``, which defaults to 500000
+"""
+from timepiece.sections.final import FilterSpec, RepeatAndFiltersSpec
+from timepiece.index import FilterIndex
+from timepiece.spec import make_timepiece
+
+from datetime import datetime, timedelta
+import random
+import time
+import sys
+
+def make_specs(count, distinct=5000):
+    """Specifications for things like business hours and maintenance windows"""
+    r = random.Random(1)
+    repeat = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: minute))")
+
+    pool = []
+    for _ in range(distinct):
+        hours = sorted(r.sample(range(24), r.randint(1, 10)))
+        options = {"hours": ";".join(str(h) for h in hours)}
+        if r.random() < 0.7:
+            options["minutes"] = ";".join(str(m) for m in sorted(r.sample(range(60), r.randint(1, 15))))
+        if r.random() < 0.5:
+            options["day_names"] = ";".join(r.sample(["mon", "tues", "wed", "thur", "fri", "sat", "sun"], r.randint(1, 5)))
+        if r.random() < 0.2:
+            options["months"] = ";".join(str(m) for m in r.sample(range(1, 13), r.randint(1, 4)))
+        pool.append(RepeatAndFiltersSpec(repeat=repeat, filters=[FilterSpec.using(**options)]))
+
+    return [pool[index % distinct] for index in range(count)]
+
+def main(count=500000):
+    specs = make_specs(count)
+
+    started = time.time()
+    index = FilterIndex()
+    for ident, spec in enumerate(specs):
+        index.add(ident, spec)
+    built = time.time() - started
+
+    times = [datetime(2016, 3, 1) + timedelta(minutes=m * 97) for m in range(20)]
+
+    started = time.time()
+    found = [index.matching(at) for at in times]
+    lookup = (time.time() - started) / len(times)
+
+    started = time.time()
+    for at, matched in zip(times[:3], found):
+        assert matched == set(ident for ident, spec in enumerate(specs) if spec.is_filtered(at))
+    scan = (time.time() - started) / 3
+
+    print("{0:>8} {1:>10} {2:>10} {3:>12} {4:>12} {5:>8}".format("specs", "build", "matched", "lookup", "scan", "speedup"))
+    print("{0:>8} {1:>9.1f}s {2:>10.0f} {3:>10.2f}ms {4:>10.2f}ms {5:>7.0f}x".format(count, built, sum(len(m) for m in found) / len(found), lookup * 1000, scan * 1000, scan / lookup))
+    print(index.stats)
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
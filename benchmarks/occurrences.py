@@ -0,0 +1,44 @@
+"""
+Compare listing times by calling following in a loop with occurrences
+
+Run with ``python benchmarks/occurrences.py``
+"""
+from timepiece.spec import make_timepiece
+
+from datetime import datetime
+import timeit
+
+specs = [
+      ("minutes", (10, 100, 1000), "between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & (interval(every: amount(num: 7, size: minute)) | interval(every: amount(num: 1, size: hour)) | interval(every: amount(num: 5, size: minute)))")
+
+    # Durations step from the start of the repeat every time following is called
+    , ("durations", (10, 100, 300), "between(start: epoch(epoch: 1400000000), end: epoch(epoch: 2000000000)) & (interval(every: iso8601(type: duration, specification: PT12H)) | interval(every: iso8601(type: duration, specification: P1D)))")
+    ]
+
+def with_following(obj, at, count):
+    found = []
+    for _ in range(count):
+        at = obj.following(at)
+        if at is None:
+            break
+        found.append(at)
+    return found
+
+def best(func, number=3):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+def main():
+    timepiece = make_timepiece()
+    at = datetime(2016, 1, 1)
+
+    print("{0:>10} {1:>8} {2:>14} {3:>14} {4:>8}".format("intervals", "count", "following", "occurrences", "speedup"))
+    for name, counts, spec in specs:
+        obj = timepiece.time_spec_to_object(spec)
+        for count in counts:
+            assert with_following(obj, at, count) == list(obj.occurrences(at, limit=count))
+            slow = best(lambda: with_following(obj, at, count))
+            fast = best(lambda: list(obj.occurrences(at, limit=count)))
+            print("{0:>10} {1:>8} {2:>12.2f}ms {3:>12.2f}ms {4:>7.1f}x".format(name, count, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Compare listing a year of occurrences with occurrences and occurrences_array
+
+Run with ``python benchmarks/occurrences_array.py``, it needs numpy installed
+"""
+from timepiece.spec import make_timepiece
+from timepiece.sections import final
+
+from datetime import datetime
+import timeit
+
+def make_specs(timepiece):
+    minutely = timepiece.time_spec_to_object("between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: minute))")
+    mixed = timepiece.time_spec_to_object("between(start: epoch(epoch: 0)) & (interval(every: amount(num: 7, size: minute)) | interval(every: amount(num: 1, size: hour)) | interval(every: amount(num: 5, size: minute)))")
+    return [
+          ("minutely", minutely)
+        , ("mixed", mixed)
+        , ("filtered", final.RepeatAndFiltersSpec(repeat=minutely, filters=[final.FilterSpec.using(hours="9;10;11;12;13;14;15;16", day_names="mon;tues;wed;thur;fri")]))
+        ]
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=3))
+
+def main():
+    start = datetime(2016, 1, 1)
+    end = datetime(2017, 1, 1)
+
+    print("{0:>10} {1:>8} {2:>14} {3:>18} {4:>8}".format("spec", "count", "occurrences", "occurrences_array", "speedup"))
+    for name, obj in make_specs(make_timepiece()):
+        times = obj.occurrences_array(start, end)
+        assert times.tolist() == list(obj.occurrences(start, end))
+        slow = best(lambda: list(obj.occurrences(start, end)))
+        fast = best(lambda: obj.occurrences_array(start, end))
+        print("{0:>10} {1:>8} {2:>12.2f}ms {3:>16.2f}ms {4:>7.1f}x".format(name, len(times), slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
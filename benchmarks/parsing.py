@@ -0,0 +1,43 @@
+"""
+Compare the parsimonious grammar with the recursive descent parser
+
+Run with ``python benchmarks/parsing.py``
+"""
+from timepiece.descent import tokenize, Parser
+from timepiece.spec import make_timepiece
+
+import timeit
+
+def or_chain(length):
+    intervals = " | ".join("interval(every: amount(num: {0}, size: minute))".format(i + 1) for i in range(length))
+    return "between(start: epoch(epoch: 0), end: epoch(epoch: 1000000)) & ({0})".format(intervals)
+
+def best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+def main():
+    parsimonious = make_timepiece()
+    descent = make_timepiece(parser="descent")
+
+    print("{0:>8} {1:>16} {2:>16} {3:>8} {4:>16} {5:>16} {6:>8}".format("length", "parsimonious", "descent", "speedup", "syntax only", "descent syntax", "speedup"))
+    # parsimonious runs out of recursion not far past 100
+    for length in (1, 10, 50, 100):
+        spec = parsimonious.strip(or_chain(length))
+        assert parsimonious.time_spec_to_object(spec) == descent.time_spec_to_object(spec)
+
+        number = max(1, 200 // length)
+        slow = best(lambda: parsimonious.time_spec_to_object(spec), number)
+        fast = best(lambda: descent.time_spec_to_object(spec), number)
+
+        grammar = parsimonious.visitor.grammar
+        slow_syntax = best(lambda: grammar.parse(spec), number)
+        fast_syntax = best(lambda: Parser(tokenize(spec)).time_spec(), number)
+
+        print("{0:>8} {1:>14.2f}ms {2:>14.2f}ms {3:>7.1f}x {4:>14.2f}ms {5:>14.2f}ms {6:>7.1f}x".format(
+              length
+            , slow * 1000, fast * 1000, slow / fast
+            , slow_syntax * 1000, fast_syntax * 1000, slow_syntax / fast_syntax
+            ))
+
+if __name__ == "__main__":
+    main()
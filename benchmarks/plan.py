@@ -0,0 +1,88 @@
+"""
+Compare the memory and speed of specs from time_spec_to_object with the plans
+compile makes from them
+
+Run with ``python benchmarks/plan.py``
+"""
+from timepiece.sections.final import RepeatAndFiltersSpec, ManyRepeatAndFiltersSpec, FilterSpec
+from timepiece.spec import make_timepiece
+from timepiece.plan import compile
+
+from datetime import datetime, timedelta
+import tracemalloc
+import timeit
+import gc
+
+specs = [
+      ("once", "epoch(epoch: 1451649600)", None)
+    , ("every 15 minutes", "between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 15, size: minute))", None)
+    , ("monthly", "between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 1, size: month))", None)
+    , ("hourly at 3am on sundays", "between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 1, size: hour))", {"hours": "3", "day_names": "sun"})
+    ]
+
+count = 2000
+
+def make(timepiece, spec, filters):
+    obj = timepiece.time_spec_to_object(spec)
+    if filters is None:
+        return obj
+    return ManyRepeatAndFiltersSpec(specs=[RepeatAndFiltersSpec(repeat=obj, filters=[FilterSpec.using(**filters)])])
+
+def memory(func):
+    """Return how many bytes each of count results of func holds onto"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [func() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+def forget(obj):
+    """Forget the answers obj and the specs in it remember from following"""
+    obj.__dict__.pop("_following_memo", None)
+    for rf in getattr(obj, "specs", []):
+        rf.__dict__.pop("_following_memo", None)
+        rf.repeat.__dict__.pop("_following_memo", None)
+
+def best(func, number=2000):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+def main():
+    timepiece = make_timepiece()
+    times = [datetime(2016, 1, 1) + timedelta(minutes=7 * n, seconds=n) for n in range(50)]
+
+    print("{0:>26} {1:>10} {2:>10} {3:>14} {4:>12} {5:>14} {6:>12}".format("spec", "dictobj", "plan", "following", "plan", "is_filtered", "plan"))
+    for name, spec, filters in specs:
+        obj = make(timepiece, spec, filters)
+        plan = compile(obj)
+        assert all(plan.following(at) == obj.following(at) and plan.is_filtered(at) == obj.is_filtered(at) for at in times)
+
+        # Compile one spec each time so the plans don't share what they're made from
+        obj_bytes = memory(lambda: make(timepiece, spec, filters))
+        plan_bytes = memory(lambda: compile(make(timepiece, spec, filters)))
+
+        # Specs remember their last answer from following, which would hide the work
+        def spec_following():
+            for at in times:
+                forget(obj)
+                obj.following(at)
+
+        def plan_following():
+            for at in times:
+                plan.following(at)
+
+        slow = best(spec_following, number=20) / len(times)
+        fast = best(plan_following, number=20) / len(times)
+        slow_filtered = best(lambda: [obj.is_filtered(at) for at in times], number=20) / len(times)
+        fast_filtered = best(lambda: [plan.is_filtered(at) for at in times], number=20) / len(times)
+
+        print("{0:>26} {1:>9.0f}B {2:>9.0f}B {3:>12.2f}us {4:>7.2f}us {5:>3.1f}x {6:>10.2f}us {7:>7.2f}us {8:>3.1f}x".format(
+              name, obj_bytes, plan_bytes
+            , slow * 1e6, fast * 1e6, slow / fast
+            , slow_filtered * 1e6, fast_filtered * 1e6, slow_filtered / fast_filtered
+            ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Compare is_filtered with the function timepiece.predicate generates for
+specs with a few filters
+
+Run with ``python benchmarks/predicate.py``
+"""
+from timepiece.sections.final import RepeatAndFiltersSpec, ManyRepeatAndFiltersSpec, FilterSpec
+from timepiece.spec import make_timepiece
+from timepiece import predicate
+
+from datetime import datetime, timedelta
+import timeit
+
+specs = [
+      ("one filter", [[{"hours": ["3"]}]])
+    , ("two filters", [[{"hours": ["3", "4", "5"]}, {"day_names": ["sun", "mon"]}]])
+    , ("three specs", [[{"hours": ["3"]}], [{"minutes": ["0", "30"], "months": ["6"]}], [{"weeks": ["2", "3"], "day_names": ["fri"]}]])
+    ]
+
+def best(func, number=20):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+def main():
+    repeat = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 1, size: minute))")
+    times = [datetime(2016, 1, 1) + timedelta(minutes=37 * n) for n in range(1000)]
+
+    print("{0:>14} {1:>14} {2:>12} {3:>8}".format("spec", "is_filtered", "generated", "speedup"))
+    for name, parts in specs:
+        spec = ManyRepeatAndFiltersSpec(specs=[RepeatAndFiltersSpec(repeat=repeat, filters=[FilterSpec.using(**f) for f in filters]) for filters in parts])
+        func = predicate.for_spec(spec)
+        assert [func(at) for at in times] == [spec.is_filtered(at) for at in times]
+
+        slow = best(lambda: [spec.is_filtered(at) for at in times]) / len(times)
+        fast = best(lambda: [func(at) for at in times]) / len(times)
+        print("{0:>14} {1:>12.2f}us {2:>10.2f}us {3:>7.1f}x".format(name, slow * 1e6, fast * 1e6, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+See how long the Scheduler takes to say what is due each second and how much
+memory it uses, compared with calling following on every specification
+
+Run with ``python benchmarks/scheduler.py [count ...]``, which defaults to
+10000, 100000 and 1000000 specifications. Calling following on everything is
+only timed for up to 100000 specifications.
+"""
+from timepiece.scheduler import Scheduler
+from timepiece.spec import make_timepiece
+
+from datetime import datetime, timedelta
+import tracemalloc
+import time
+import sys
+
+def make_specs(timepiece, count=500):
+    """Specifications that fire every 1 to 60 minutes from different starts"""
+    specs = []
+    for index in range(count):
+        minutes = index % 60 + 1
+        start = 1451606400 - index * 37
+        specs.append(timepiece.time_spec_to_object("between(start: epoch(epoch: {0})) & interval(every: amount(num: {1}, size: minute))".format(start, minutes)))
+    return specs
+
+def following_everything(specs, at):
+    return min(spec.following(at) for spec in specs)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def run(count, specs, now, ticks=120):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    started = time.time()
+    scheduler = Scheduler()
+    for ident in range(count):
+        scheduler.add(ident, specs[ident % len(specs)], after=now)
+    built = time.time() - started
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    latencies = []
+    fired = 0
+    for tick in range(1, ticks + 1):
+        started = time.time()
+        fired += len(scheduler.pop_due(now + timedelta(seconds=tick)))
+        latencies.append(time.time() - started)
+
+    scan = None
+    if count <= 100000:
+        everything = [specs[ident % len(specs)] for ident in range(count)]
+        started = time.time()
+        following_everything(everything, now)
+        scan = time.time() - started
+
+    return built, memory, latencies, fired / ticks, scan
+
+def main(counts=(10000, 100000, 1000000)):
+    specs = make_specs(make_timepiece())
+    now = datetime(2016, 1, 1, 12)
+
+    print("{0:>9} {1:>9} {2:>10} {3:>10} {4:>10} {5:>10} {6:>10} {7:>12}".format("specs", "add all", "memory", "fires/tick", "tick mean", "tick p99", "tick max", "following all"))
+    for count in counts:
+        built, memory, latencies, fires, scan = run(count, specs, now)
+        print("{0:>9} {1:>8.1f}s {2:>8.1f}MB {3:>10.1f} {4:>8.2f}ms {5:>8.2f}ms {6:>8.2f}ms {7:>12}".format(
+              count, built, memory / 1024 / 1024, fires
+            , sum(latencies) / len(latencies) * 1000, percentile(latencies, 99) * 1000, max(latencies) * 1000
+            , "-" if scan is None else "{0:.2f}ms".format(scan * 1000)
+            ))
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or (10000, 100000, 1000000))
@@ -0,0 +1,42 @@
+"""
+Compare loading serialised specifications with parsing them again
+
+Run with ``python benchmarks/serialise.py``
+"""
+from timepiece.serialise import dumps, loads
+from timepiece.spec import make_timepiece
+
+import time
+
+specs = [
+      "between(start: epoch(epoch: {0}), end: epoch(epoch: 1000000)) & interval(every: amount(num: {1}, size: minute))"
+    , "between(start: epoch(epoch: {0}), end: epoch(epoch: 1000000)) & (interval(every: amount(num: {1}, size: hour)) | interval(every: amount(num: 2, size: minute)))"
+    , "between(start: epoch(epoch: {0}), end: epoch(epoch: 1000000)) & interval(every: iso8601(type: duration, specification: P{1}DT4H))"
+    , "between(start: epoch(epoch: {0}), end: epoch(epoch: 1000000)) & day_name(name: mon;wed)"
+    ]
+
+def timed(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+def main(count=100000):
+    sources = [specs[i % len(specs)].format(i, i % 60 + 1) for i in range(count)]
+
+    for parser in ("parsimonious", "descent"):
+        grammar = make_timepiece(parser=parser)
+        took = timed(lambda: [grammar.time_spec_to_object(spec) for spec in sources])
+        print("{0:>16} {1:>10.2f}s".format(parser, took))
+
+    objs = [grammar.time_spec_to_object(spec) for spec in sources]
+    dumped = [dumps(obj) for obj in objs]
+    took_loads = timed(lambda: [loads(data) for data in dumped])
+    assert [dumps(loads(data)) for data in dumped] == dumped
+
+    print("{0:>16} {1:>10.2f}s".format("loads", took_loads))
+    print("{0:>16} {1:>10.1f} bytes per specification ({2:.1f} characters of source)".format(
+          "size", sum(len(d) for d in dumped) / count, sum(len(s) for s in sources) / count
+        ))
+
+if __name__ == "__main__":
+    main()
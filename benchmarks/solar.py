@@ -0,0 +1,44 @@
+"""
+See how long sunrise takes for a year at many sites worked out a day at a
+time, a year at a time with numpy, and once they're in the cache
+
+Run with ``python benchmarks/solar.py [sites]``, which defaults to 300 sites.
+"""
+from timepiece import solar
+
+from datetime import date, timedelta
+import random
+import time
+import sys
+
+def sites(count):
+    r = random.Random(0)
+    return [(round(r.uniform(-60, 60), 4), round(r.uniform(-180, 180), 4)) for _ in range(count)]
+
+def days(year):
+    first = date(year, 1, 1)
+    return [first + timedelta(days=offset) for offset in range((date(year + 1, 1, 1) - first).days)]
+
+def timed(func):
+    started = time.time()
+    func()
+    return time.time() - started
+
+def main(count=300, year=2016):
+    locations = sites(count)
+    each_day = days(year)
+
+    solar.cache.clear()
+    scalar = timed(lambda: [solar.sunrise(day, *location) for location in locations for day in each_day])
+
+    solar.cache.clear()
+    whole_year = timed(lambda: [solar.year_of("sunrise", year, *location) for location in locations])
+
+    cached = timed(lambda: [solar.sunrise(day, *location) for location in locations for day in each_day])
+
+    lookups = count * len(each_day)
+    print("{0:>8} {1:>10} {2:>12} {3:>12} {4:>14}".format("sites", "lookups", "day by day", "year_of", "cached lookup"))
+    print("{0:>8} {1:>10} {2:>11.1f}ms {3:>11.1f}ms {4:>12.2f}us".format(count, lookups, scalar * 1000, whole_year * 1000, cached / lookups * 1e6))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
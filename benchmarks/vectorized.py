@@ -0,0 +1,37 @@
+"""
+Compare calling is_filtered for each time with is_filtered_many on an array
+
+Run with ``python benchmarks/vectorized.py``, it needs numpy installed
+"""
+from timepiece.spec import make_timepiece
+from timepiece.sections import final
+
+from datetime import datetime
+import timeit
+import numpy
+
+def make_specs(timepiece):
+    repeat = timepiece.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 7, size: minute))")
+    return [
+          ("filter", final.FilterSpec.using(minutes="0;15;30", hours="9;17", day_names="mon;wed;sat", weeks="1;2;3"))
+        , ("repeat and filters", final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(hours="3;4"), final.FilterSpec.using(months="2;7")]))
+        , ("many", final.ManyRepeatAndFiltersSpec(specs=[
+              final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(minutes="5")])
+            , final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(day_names="sun", day_numbers="1;100")])
+            ]))
+        ]
+
+def main(count=200000):
+    start = numpy.datetime64("2000-01-01T00:00")
+    times = numpy.arange(start, start + numpy.timedelta64(count, "m"), numpy.timedelta64(1, "m")).astype("datetime64[us]")
+    datetimes = times.astype(datetime).tolist()
+
+    print("{0:>20} {1:>10} {2:>14} {3:>14} {4:>8}".format("spec", "times", "is_filtered", "is_filtered_many", "speedup"))
+    for name, obj in make_specs(make_timepiece()):
+        assert obj.is_filtered_many(times).tolist() == [obj.is_filtered(t) for t in datetimes]
+        slow = min(timeit.repeat(lambda: [obj.is_filtered(t) for t in datetimes], number=1, repeat=3))
+        fast = min(timeit.repeat(lambda: obj.is_filtered_many(times), number=1, repeat=3))
+        print("{0:>20} {1:>10} {2:>12.2f}ms {3:>14.2f}ms {4:>7.1f}x".format(name, count, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -17,11 +17,21 @@ setup(
        , "aniso8601==1.1.0"
        ]
 
+    , entry_points =
+      { "console_scripts":
+        [ "timepiece = timepiece.cli:main"
+        ]
+      }
+
     , extras_require =
       { "tests":
         [ "nose"
         , "mock"
         , "noseOfYeti"
+        , "numpy"
+        ]
+      , "numpy":
+        [ "numpy"
         ]
       }
 
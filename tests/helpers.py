@@ -1,5 +1,22 @@
 from unittest import TestCase as UnitTestTestCase
 from delfick_error import DelfickErrorTestMixin
 
+from timepiece.sections import final
+
 class TestCase(UnitTestTestCase, DelfickErrorTestMixin):
     pass
+
+filter_fields = {
+      "minutes": lambda r: r.sample(range(62), r.randint(1, 3))
+    , "hours": lambda r: r.sample(range(24), r.randint(1, 8))
+    , "weeks": lambda r: r.sample(range(54), r.randint(1, 30))
+    , "months": lambda r: r.sample(range(1, 13), r.randint(1, 6))
+    , "day_names": lambda r: r.sample(final.weekday_names, r.randint(1, 4))
+    , "day_numbers": lambda r: r.sample(range(1, 367), r.randint(1, 200))
+    }
+
+def random_filter(r):
+    options = {}
+    for name in r.sample(sorted(filter_fields), r.randint(0, 3)):
+        options[name] = [str(v) for v in filter_fields[name](r)]
+    return final.FilterSpec.using(**options)
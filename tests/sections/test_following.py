@@ -3,13 +3,16 @@
 from tests.helpers import TestCase
 
 from timepiece.sections import sections, final
+from timepiece.interning import Interner
+from timepiece import clock
 
-from datetime import datetime
+from datetime import datetime, timedelta
+import itertools
 import mock
 
 describe TestCase, "following functionality":
     describe "RepeatSpec":
-        it "defaults at to utcnow":
+        it "defaults at to the time from the clock":
             dt = datetime(2078, 2, 15)
             dtstart = datetime(2079, 2, 15)
 
@@ -18,14 +21,15 @@ describe TestCase, "following functionality":
             start = mock.Mock(name="start", datetime=dtstart)
             start.following.return_value = res
 
-            fake_datetime = mock.Mock(name="datetime")
-            fake_datetime.utcnow.return_value = dt
+            fake_clock = mock.Mock(name="clock")
+            fake_clock.now.return_value = dt
 
             spec = final.RepeatSpec(start=start, end=None, every=None)
-            with mock.patch("timepiece.sections.final.datetime", fake_datetime):
+            with clock.using(fake_clock):
                 self.assertIs(spec.following(), res)
 
-            fake_datetime.utcnow.assert_called_once_with()
+            fake_clock.now.assert_called_once_with()
+            start.following.assert_called_once_with(dt)
 
         it "returns nothing if end is less than at":
             at = datetime(2078, 2, 15)
@@ -89,23 +93,32 @@ describe TestCase, "following functionality":
             with mock.patch("timepiece.sections.final.datetime", fake_datetime):
                 self.assertIs(spec.following(at), res)
 
+        it "repeats forever without an end":
+            every = final.IntervalsSpec.contain(
+                  sections.IntervalSpec.using(every=sections.AmountSpec.using(num=15, size="minute"))
+                , sections.IntervalSpec.using(every=sections.AmountSpec.using(num=1, size="month"))
+                )
+            spec = final.RepeatSpec.using(start=final.DateTimeSpec.contain(datetime(2000, 1, 31)), every=every)
+            self.assertEqual(spec.following(datetime(2016, 1, 1, 10, 1)), datetime(2016, 1, 1, 10, 15))
+            self.assertEqual(list(spec.occurrences(datetime(2016, 2, 28, 23, 50), limit=3)), [datetime(2016, 2, 29), datetime(2016, 2, 29, 0, 15), datetime(2016, 2, 29, 0, 30)])
+
     describe "ManyRepeatAndFiltersSpec":
-        it "defaults at to utcnow":
+        it "defaults at to the time from the clock":
             res = datetime(2000, 1, 1)
-            utcnow = mock.Mock(name="utcnow")
+            now = datetime(1999, 1, 1)
 
             repeat_spec = mock.Mock(name="repeat_spec")
             repeat_spec.following.return_value = res
 
-            fake_datetime = mock.Mock(name="datetime")
-            fake_datetime.utcnow.return_value = utcnow
+            fake_clock = mock.Mock(name="clock")
+            fake_clock.now.return_value = now
 
             spec = final.ManyRepeatAndFiltersSpec(specs=[repeat_spec])
-            with mock.patch("timepiece.sections.final.datetime", fake_datetime):
+            with clock.using(fake_clock):
                 self.assertIs(spec.following(), res)
 
-            fake_datetime.utcnow.assert_called_once_with()
-            repeat_spec.following.assert_called_once_with(utcnow)
+            fake_clock.now.assert_called_once_with()
+            repeat_spec.following.assert_called_once_with(now)
 
         it "returns the min datetime found":
             at = mock.Mock(name="at")
@@ -133,21 +146,18 @@ describe TestCase, "following functionality":
             repeat_spec2.following.assert_called_once_with(at)
 
     describe "DateTimeSpec":
-        it "defaults at to utcnow":
-            utcnow = datetime(2001, 1, 1, 20, 15, 2)
+        it "defaults at to the time from the clock":
+            now = datetime(2001, 1, 1, 20, 15, 2)
             res = datetime(2002, 1, 1, 5, 5, 5)
 
-            repeat_spec = mock.Mock(name="repeat_spec")
-            repeat_spec.following.return_value = res
-
-            fake_datetime = mock.Mock(name="datetime")
-            fake_datetime.utcnow.return_value = utcnow
+            fake_clock = mock.Mock(name="clock")
+            fake_clock.now.return_value = now
 
             spec = final.DateTimeSpec(datetime=res)
-            with mock.patch("timepiece.sections.final.datetime", fake_datetime):
+            with clock.using(fake_clock):
                 self.assertIs(spec.following(), res)
 
-            fake_datetime.utcnow.assert_called_once_with()
+            fake_clock.now.assert_called_once_with()
 
         it "removes microseconds before comparing":
             at = datetime(2001, 1, 1, 20, 15, 2, 200)
@@ -218,7 +228,7 @@ describe TestCase, "following functionality":
 
             self.assertEqual(called, [[1, 2], [1, 2]])
 
-        it "keeps going till we've reached over 100 rounds":
+        it "drops repeaters that stop moving forward":
             at = datetime(2001, 1, 1)
             start = datetime(1999, 1, 1)
             end = datetime(2002, 1, 1)
@@ -253,7 +263,67 @@ describe TestCase, "following functionality":
             spec = final.IntervalsSpec(intervals=[interval1, interval2])
             self.assertEqual(spec.following(at, start, end), None)
 
-            self.assertEqual(len(called), 101)
+            self.assertEqual(called, [[1, 2]])
+
+        it "finds the soonest time even if one interval takes many steps to get past at":
+            at = datetime(2001, 1, 1)
+            start = datetime(1999, 1, 1)
+            end = datetime(2002, 1, 1)
+
+            def interval1_gen(a, s, e):
+                for i in range(500):
+                    yield datetime(2000, 1, 1) + timedelta(minutes=i)
+                yield datetime(2001, 1, 2)
+
+            def interval2_gen(a, s, e):
+                for month in range(6, 13):
+                    yield datetime(2001, month, 1)
+
+            interval1 = mock.Mock(name="interval1")
+            interval1.following.side_effect = interval1_gen
+
+            interval2 = mock.Mock(name="interval2")
+            interval2.following.side_effect = interval2_gen
+
+            spec = final.IntervalsSpec(intervals=[interval1, interval2])
+            self.assertEqual(spec.following(at, start, end), datetime(2001, 1, 2))
+
+        it "merges lots of intervals of different sizes":
+            start = datetime(2000, 1, 1, 0, 0, 7)
+            end = datetime(2030, 1, 1)
+            at = datetime(2016, 3, 5, 12, 30)
+
+            # Seconds go up in 97s so we don't walk every second of the week
+            sizes = ["second", "minute", "hour", "day", "week", "month", "year"]
+            steps = {"second": 97}
+            intervals = [
+                  sections.IntervalSpec(every=sections.AmountSpec(num=(i // len(sizes) + 1) * steps.get(sizes[i % len(sizes)], 1), size=sizes[i % len(sizes)]))
+                  for i in range(1000)
+                ]
+            spec = final.IntervalsSpec(intervals=intervals)
+
+            firsts = []
+            for interval in intervals:
+                for nxt in interval.following(at, start, end):
+                    if nxt.replace(microsecond=0) > end:
+                        break
+                    if nxt > at:
+                        firsts.append(nxt)
+                        break
+
+            self.assertEqual(spec.following(at, start, end), min(firsts))
+
+            expected = set()
+            limit = datetime(2016, 3, 12)
+            for interval in intervals:
+                for nxt in interval.following(at, start, end):
+                    if nxt > limit:
+                        break
+                    if nxt > at:
+                        expected.add(nxt)
+
+            found = list(itertools.takewhile(lambda t: t <= limit, spec.occurrences(at, start, end)))
+            self.assertEqual(found, sorted(expected))
 
         it "drops repeaters that give values greater than end":
             at = datetime(2001, 1, 1)
@@ -406,3 +476,149 @@ describe TestCase, "following functionality":
 
             every.interval.assert_called_once_with(a, s, e)
 
+    describe "FilterSpec.next_allowed":
+        it "returns at if it already gets through":
+            at = datetime(2016, 7, 1, 3, 30, 15)
+            self.assertEqual(final.FilterSpec.using(hours="3").next_allowed(at), at)
+
+        it "jumps to the next allowed minute and hour":
+            spec = final.FilterSpec.using(hours="3;5", minutes="15;45")
+            self.assertEqual(spec.next_allowed(datetime(2016, 7, 1, 3, 20, 10)), datetime(2016, 7, 1, 3, 45))
+            self.assertEqual(spec.next_allowed(datetime(2016, 7, 1, 3, 50)), datetime(2016, 7, 1, 5, 15))
+            self.assertEqual(spec.next_allowed(datetime(2016, 7, 1, 6)), datetime(2016, 7, 2, 3, 15))
+
+        it "jumps to the next allowed day and month":
+            spec = final.FilterSpec.using(months="2", day_names="mon", hours="9")
+            self.assertEqual(spec.next_allowed(datetime(2016, 7, 1)), datetime(2017, 2, 6, 9))
+
+            spec = final.FilterSpec.using(day_numbers="60")
+            self.assertEqual(spec.next_allowed(datetime(2016, 3, 1, 12)), datetime(2017, 3, 1))
+
+        it "gives up when nothing can get through":
+            self.assertIs(final.FilterSpec.using(minutes="75").next_allowed(datetime(2016, 1, 1)), None)
+            self.assertIs(final.FilterSpec.using(day_numbers="366", day_names="mon").next_allowed(datetime(2016, 1, 1), until=datetime(2017, 1, 1)), None)
+
+        it "finds the first time every filter allows":
+            filters = [final.FilterSpec.using(hours="3;4"), final.FilterSpec.using(hours="4;5", minutes="10")]
+            self.assertEqual(final.next_allowed(filters, datetime(2016, 1, 1)), datetime(2016, 1, 1, 4, 10))
+
+    describe "RepeatAndFiltersSpec":
+        def make(self, **filters):
+            from timepiece.spec import make_timepiece
+            repeat = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 7, size: minute))")
+            return final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(**filters)])
+
+        it "returns the next time from the repeat that gets through the filters":
+            spec = self.make(hours="3")
+            at = datetime(2016, 7, 1, 4)
+
+            expected = spec.repeat.following(at)
+            while not spec.is_filtered(expected):
+                expected = spec.repeat.following(expected)
+
+            found = spec.following(at)
+            self.assertEqual(found, expected)
+            self.assertEqual(found.hour, 3)
+
+            nxt = spec.following(found)
+            self.assertGreater(nxt, found)
+            self.assertEqual(nxt.hour, 3)
+
+        it "returns None when nothing gets through":
+            self.assertIs(self.make(minutes="75").following(datetime(2016, 7, 1)), None)
+
+        it "ignores the filters if there aren't any":
+            spec = self.make()
+            spec.filters = []
+            at = datetime(2016, 7, 1)
+            self.assertEqual(spec.following(at), spec.repeat.following(at))
+
+        it "skips ahead in occurrences":
+            spec = self.make(hours="3", day_names="sun")
+            at = datetime(2016, 7, 1)
+            found = list(spec.occurrences(at, limit=20))
+            self.assertEqual(len(found), 20)
+            assert all(f.hour == 3 and f.weekday() == 6 for f in found)
+
+            expected = []
+            nxt = at
+            for _ in range(20):
+                nxt = spec.following(nxt)
+                expected.append(nxt)
+            self.assertEqual(found, expected)
+
+    describe "remembering following":
+        def make(self, spec="between(start: epoch(epoch: 0)) & interval(every: amount(num: 7, size: minute))", intern=True):
+            from timepiece.spec import make_timepiece
+            obj = make_timepiece().time_spec_to_object(spec)
+            return Interner().intern(obj) if intern else obj
+
+        it "answers from the memo until the answer":
+            spec = self.make()
+            at = datetime(2016, 7, 1, 4, 0, 30)
+            expected = spec.following(at)
+
+            with mock.patch.object(final.IntervalsSpec, "following", side_effect=AssertionError("shouldn't be called")):
+                for offset in (0, 1, 100, 300):
+                    self.assertEqual(spec.following(at + timedelta(seconds=offset)), expected)
+
+            self.assertEqual(spec.__dict__["_following_memo"], (at, expected))
+            self.assertEqual(spec.following(expected), expected + timedelta(minutes=7))
+            self.assertEqual(spec.following(at - timedelta(seconds=1)), expected)
+
+        it "gives the same answers as working them out":
+            mondays = "(between(start: epoch(epoch: 0)) & interval(every: amount(num: 7, size: minute))) & day_name(name: mon)"
+            weekends = "(between(start: epoch(epoch: 60)) & interval(every: amount(num: 1, size: hour))) & day_name(name: sat;sun)"
+            spec = Interner().intern(final.ManyRepeatAndFiltersSpec(specs=[self.make(mondays), self.make(weekends)]))
+            at = datetime(2016, 7, 3, 23)
+            for _ in range(200):
+                fresh = final.ManyRepeatAndFiltersSpec(specs=[self.make(mondays), self.make(weekends)])
+                self.assertEqual(spec.following(at), fresh.following(at))
+                at += timedelta(seconds=47)
+
+        it "doesn't remember for specs that can be changed":
+            spec = self.make(intern=False)
+            at = datetime(2016, 7, 1, 4)
+            spec.following(at)
+            self.assertNotIn("_following_memo", spec.__dict__)
+
+            spec.every = final.IntervalsSpec.contain(sections.IntervalSpec.using(every=sections.AmountSpec.using(num=1, size="hour")))
+            self.assertEqual(spec.following(at), datetime(2016, 7, 1, 5))
+
+        it "sees changes to specs inside a spec that isn't interned":
+            repeat = self.make("between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: hour))", intern=False)
+            rf = final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(hours="5")])
+            many = final.ManyRepeatAndFiltersSpec(specs=[rf])
+            at = datetime(2016, 1, 1, 0, 30)
+            self.assertEqual(many.following(at), datetime(2016, 1, 1, 5))
+
+            rf.filters[0].hours = [7]
+            self.assertEqual(rf.following(at), datetime(2016, 1, 1, 7))
+            self.assertEqual(many.following(at), datetime(2016, 1, 1, 7))
+
+            rf.filters.append(final.FilterSpec.using(day_names="sun"))
+            self.assertEqual(many.following(at), datetime(2016, 1, 3, 7))
+            self.assertIs(many.is_filtered(many.following(at)), True)
+
+        it "can't have the lists inside an interned spec changed":
+            repeat = self.make("between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: hour))", intern=False)
+            many = Interner().intern(final.ManyRepeatAndFiltersSpec(specs=[final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(hours="3")])]))
+            at = datetime(2016, 1, 1, 0, 30)
+            self.assertEqual(many.following(at), datetime(2016, 1, 1, 3))
+
+            with self.assertRaises(AttributeError):
+                many.specs[0].filters.append(final.FilterSpec.using(hours="4"))
+            with self.assertRaises(TypeError):
+                many.specs[0].filters[0].hours[0] = 4
+            self.assertEqual(many.following(at), datetime(2016, 1, 1, 3))
+
+        it "doesn't remember when the start is sunrise or sunset":
+            spec = self.make("between(start: sunrise(latitude: 51.5, longitude: 0)) & interval(every: amount(num: 1, size: hour))")
+            self.assertIs(spec.remembers_following, False)
+            spec.following(datetime(2016, 7, 1))
+            self.assertNotIn("_following_memo", spec.__dict__)
+
+        it "doesn't remember when there is no answer":
+            spec = self.make("between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & interval(every: amount(num: 7, size: minute))")
+            self.assertIs(spec.following(datetime(2016, 7, 1)), None)
+            self.assertNotIn("_following_memo", spec.__dict__)
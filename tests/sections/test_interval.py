@@ -5,6 +5,8 @@ from tests.helpers import TestCase
 from timepiece.sections import sections
 from timepiece.sizing import Sizes
 
+from input_algorithms.errors import BadSpecValue
+
 from datetime import datetime
 import time
 
@@ -48,6 +50,62 @@ describe TestCase, "interval functionality":
 
             self.assertEqual(nxt, datetime(2000, 12, 2, 1, 1, 2))
 
+        it "is efficient for every size a long way from start":
+            start = datetime(1900, 1, 31, 1, 1, 1)
+            end = datetime(2100, 1, 1)
+            at = datetime(2050, 6, 15, 12)
+
+            expected = {
+                  Sizes.SECOND.value: datetime(2050, 6, 15, 12, 0, 1)
+                , Sizes.MINUTE.value: datetime(2050, 6, 15, 12, 0, 1)
+                , Sizes.HOUR.value: datetime(2050, 6, 15, 12, 1, 1)
+                , Sizes.DAY.value: datetime(2050, 6, 16, 1, 1, 1)
+                , Sizes.WEEK.value: datetime(2050, 6, 22, 1, 1, 1)
+                , Sizes.MONTH.value: datetime(2050, 6, 30, 1, 1, 1)
+                , Sizes.YEAR.value: datetime(2051, 1, 31, 1, 1, 1)
+                }
+
+            for size in Sizes:
+                amount = sections.AmountSpec(num=1, size=size.value)
+                start_time = time.time()
+                nxt = next(amount.interval(start, at, end))
+                self.assertLess(time.time() - start_time, 0.01)
+                self.assertEqual(nxt, expected[size.value], size)
+
+        it "fast forwards days correctly":
+            start = datetime(2000, 1, 1, 6)
+            at = datetime(2000, 3, 10, 12)
+            amount = sections.AmountSpec(num=3, size=Sizes.DAY.value)
+            self.assertEqual(next(amount.interval(start, at, datetime(2001, 1, 1))), datetime(2000, 3, 13, 6))
+
+        it "adds months and years to start so the end of the month doesn't drift":
+            start = datetime(2000, 1, 31)
+            end = datetime(2001, 1, 1)
+            amount = sections.AmountSpec(num=1, size=Sizes.MONTH.value)
+            found = list(amount.interval(start, start, end))[:4]
+            self.assertEqual(found, [datetime(2000, 2, 29), datetime(2000, 3, 31), datetime(2000, 4, 30), datetime(2000, 5, 31)])
+
+            start = datetime(2000, 2, 29)
+            amount = sections.AmountSpec(num=1, size=Sizes.YEAR.value)
+            found = list(amount.interval(start, datetime(2001, 1, 1), datetime(2010, 1, 1)))
+            self.assertEqual(found, [datetime(2001, 2, 28), datetime(2002, 2, 28), datetime(2003, 2, 28), datetime(2004, 2, 29)] + [datetime(y, 2, 28) for y in range(2005, 2008)] + [datetime(2008, 2, 29), datetime(2009, 2, 28)])
+
+        it "yields nothing if at is before start":
+            start = datetime(2000, 1, 1)
+            amount = sections.AmountSpec(num=1, size=Sizes.HOUR.value)
+            self.assertEqual(list(amount.interval(start, datetime(1999, 1, 1), datetime(2001, 1, 1))), [])
+
+        it "doesn't need an end":
+            start = datetime(2000, 1, 1)
+            amount = sections.AmountSpec(num=2, size=Sizes.HOUR.value)
+            intervals = amount.interval(start, start, None)
+            self.assertEqual([next(intervals) for _ in range(2)], [datetime(2000, 1, 1, 2), datetime(2000, 1, 1, 4)])
+
+        it "complains if the amount doesn't move forward":
+            amount = sections.AmountSpec(num=0, size=Sizes.DAY.value)
+            with self.fuzzyAssertRaisesError(BadSpecValue, "Interval must move time forward", num=0, size="day"):
+                next(amount.interval(datetime(2000, 1, 1), datetime(2000, 2, 1), datetime(2001, 1, 1)))
+
     describe "ISO8601DurationSpec":
         it "gets the interval from the specification":
             spec = sections.ISO8601DurationSpec(type="duration", specification="P1D").simplify()
@@ -58,3 +116,16 @@ describe TestCase, "interval functionality":
             intervals = spec.interval(start, at, end)
             self.assertEqual(next(intervals), datetime(2000, 6, 2, 1, 1, 1))
             self.assertEqual(next(intervals), datetime(2000, 6, 3, 1, 1, 1))
+
+        it "keeps fractions of a second and mixed durations":
+            spec = sections.ISO8601DurationSpec(type="duration", specification="P1M1DT0.5S").simplify()
+            start = datetime(2000, 1, 1)
+            end = datetime(2100, 1, 1)
+            at = datetime(2050, 1, 1)
+
+            start_time = time.time()
+            nxt = next(spec.interval(start, at, end))
+            self.assertLess(time.time() - start_time, 0.01)
+
+            # 581 months, 581 days and 290.5 seconds from start
+            self.assertEqual(nxt, datetime(2050, 1, 3, 0, 4, 50, 500000))
@@ -4,9 +4,30 @@ from tests.helpers import TestCase
 
 from timepiece.sections import final
 
-from datetime import datetime
+from input_algorithms import spec_base as sb
+from datetime import datetime, timedelta
 import mock
 
+describe TestCase, "gregorian_week":
+    it "gives the same weeks as working it out with strptime and isocalendar":
+        def with_strptime(dt):
+            iso_week = dt.isocalendar()[1]
+            base_greg = datetime.strptime('{0}-1-1'.format(dt.year), "%Y-%W-%w")
+            return iso_week if base_greg.isocalendar()[1] == 1 else iso_week - 1
+
+        day = datetime(1900, 1, 1, 12)
+        while day.year <= 2100:
+            self.assertEqual(final.gregorian_week(day), with_strptime(day), day)
+            day += timedelta(days=1)
+
+    it "remembers the numbers for each year":
+        final.gregorian_years.pop(2016, None)
+        with mock.patch("timepiece.sections.final.year_weeks", side_effect=final.year_weeks) as year_weeks:
+            self.assertEqual(final.gregorian_week(datetime(2016, 1, 1)), 53)
+            self.assertEqual(final.gregorian_week(datetime(2016, 1, 4)), 1)
+            self.assertEqual(final.gregorian_week(datetime(2016, 12, 31)), 52)
+        year_weeks.assert_called_once_with(2016)
+
 describe TestCase, "is_filtered functionality":
     describe "FilterSpec":
         describe "filtering by minute":
@@ -181,3 +202,67 @@ describe TestCase, "is_filtered functionality":
                 spec = final.FilterSpec.using(day_numbers="4", months="1", minutes="1")
                 assert not spec.is_filtered(dt)
 
+
+        describe "compiled":
+            it "has a bitmask for each field that is specified":
+                spec = final.FilterSpec.using(minutes="0;59", hours="3", day_names="mon;sun", day_numbers="366", months="12")
+                compiled = spec.compiled
+                self.assertEqual(compiled.minutes, 1 | 1 << 59)
+                self.assertEqual(compiled.hours, 1 << 3)
+                self.assertEqual(compiled.day_names, 1 | 1 << 6)
+                self.assertEqual(compiled.day_numbers, 1 << 366)
+                self.assertEqual(compiled.months, 1 << 12)
+                self.assertIs(compiled.weeks, None)
+
+            it "ignores values that can never match":
+                spec = final.FilterSpec.using(minutes="75;100")
+                self.assertEqual(spec.compiled.minutes, 0)
+                assert not any(spec.is_filtered(datetime(2000, 1, 1, 1, minute)) for minute in range(60))
+
+            it "gives the same answers as checking the lists":
+                def checked(spec, at):
+                    tup = at.timetuple()
+                    for values, value in [(spec.minutes, tup.tm_min), (spec.hours, tup.tm_hour), (spec.weeks, final.gregorian_week(at)), (spec.months, tup.tm_mon), (spec.day_names, final.weekday_names[tup.tm_wday]), (spec.day_numbers, tup.tm_yday)]:
+                        if values not in (sb.NotSpecified, None) and value not in values:
+                            return False
+                    return True
+
+                specs = [
+                      final.FilterSpec.using(minutes="0;15;30;45", hours="9;17")
+                    , final.FilterSpec.using(weeks="0;1;52;53", day_names="mon;thur")
+                    , final.FilterSpec.using(day_numbers="1;59;60;365;366", months="2;12")
+                    , final.FilterSpec.using()
+                    ]
+                times = [datetime(1999, 12, 20) + timedelta(hours=h * 7, minutes=h * 13 % 60) for h in range(0, 24 * 400)]
+                for spec in specs:
+                    self.assertEqual([spec.is_filtered(t) for t in times], [checked(spec, t) for t in times])
+
+            it "is made once and made again if a field changes":
+                spec = final.FilterSpec.using(minutes="1")
+                compiled = spec.compiled
+                self.assertIs(spec.simplify(), spec)
+                self.assertIs(spec.compiled, compiled)
+                self.assertEqual(spec, final.FilterSpec.using(minutes="1"))
+
+                spec.minutes = [2]
+                self.assertEqual(spec.compiled.minutes, 1 << 2)
+                assert spec.is_filtered(datetime(2000, 1, 1, 1, 2))
+
+        describe "combine_with":
+            it "adds together the values for each field":
+                one = final.FilterSpec.using(minutes="1;2", day_names="mon")
+                two = final.FilterSpec.using(minutes="2;3", hours="4")
+
+                combined = one.combine_with(two)
+                self.assertEqual(combined, final.FilterSpec.using(minutes="1;2;3", hours="4", day_names="mon"))
+                self.assertIs(combined.weeks, sb.NotSpecified)
+                self.assertEqual(combined.compiled.minutes, 0b1110)
+
+            it "adds the filter to each spec of a ManyRepeatAndFiltersSpec":
+                repeat = final.RepeatSpec.using(start=final.DateTimeSpec.contain(datetime(2000, 1, 1)))
+                one = final.FilterSpec.using(minutes="1")
+                two = final.FilterSpec.using(hours="2")
+                many = final.ManyRepeatAndFiltersSpec(specs=[final.RepeatAndFiltersSpec(repeat=repeat, filters=[one])])
+
+                combined = two.combine_with(many)
+                self.assertEqual([list(rf.filters) for rf in combined.specs], [[one, two]])
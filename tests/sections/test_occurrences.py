@@ -0,0 +1,85 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.spec import make_timepiece
+from timepiece.sections import final
+
+from datetime import datetime
+import mock
+
+describe TestCase, "occurrences":
+    def following_loop(self, obj, at, count):
+        found = []
+        for _ in range(count):
+            at = obj.following(at)
+            if at is None:
+                break
+            found.append(at)
+        return found
+
+    describe "RepeatSpec":
+        it "gives the same times as calling following in a loop":
+            obj = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 100000)) & (interval(every: amount(num: 7, size: minute)) | interval(every: amount(num: 1, size: hour)) | interval(every: amount(num: 5, size: minute)))")
+            self.assertIs(type(obj), final.RepeatSpec)
+
+            for at in (datetime.fromtimestamp(-50), datetime.fromtimestamp(0), datetime.fromtimestamp(5000)):
+                expected = self.following_loop(obj, at, 100)
+                self.assertEqual(list(obj.occurrences(at, limit=100)), expected)
+
+        it "stops at the end of the window and the end of the repeat":
+            obj = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 7200)) & interval(every: amount(num: 30, size: minute))")
+            start = datetime.fromtimestamp(0)
+
+            self.assertEqual(list(obj.occurrences(start, datetime.fromtimestamp(3600))), [datetime.fromtimestamp(1800), datetime.fromtimestamp(3600)])
+            self.assertEqual(len(list(obj.occurrences(start))), 4)
+            self.assertEqual(list(obj.occurrences(datetime.fromtimestamp(8000))), [])
+
+        it "gives the start if the window begins before it":
+            obj = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 3600), end: epoch(epoch: 7200)) & interval(every: amount(num: 30, size: minute))")
+            self.assertEqual(list(obj.occurrences(datetime.fromtimestamp(0), limit=2)), [datetime.fromtimestamp(3600), datetime.fromtimestamp(5400)])
+            self.assertEqual(list(obj.occurrences(datetime.fromtimestamp(0), datetime.fromtimestamp(1000))), [])
+
+        it "only makes the interval generators once":
+            obj = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 100000)) & (interval(every: amount(num: 7, size: minute)) | interval(every: amount(num: 5, size: minute)))")
+            intervals = obj.every.intervals
+
+            with mock.patch.object(type(intervals[0]), "following", side_effect=type(intervals[0]).following, autospec=True) as following:
+                self.assertEqual(len(list(obj.occurrences(datetime.fromtimestamp(0), limit=50))), 50)
+            self.assertEqual(len(following.mock_calls), 2)
+
+    describe "IntervalsSpec":
+        it "merges intervals and drops repeated and out of range values":
+            at = datetime(2001, 1, 1)
+            start = datetime(2000, 1, 1)
+            end = datetime(2002, 1, 1)
+
+            def gen(*values):
+                return lambda a, s, e: iter(values)
+
+            interval1 = mock.Mock(name="interval1")
+            interval1.following.side_effect = gen(datetime(1999, 1, 1), datetime(2001, 1, 2), datetime(2001, 1, 4), datetime(2003, 1, 1), datetime(2001, 1, 5))
+
+            interval2 = mock.Mock(name="interval2")
+            interval2.following.side_effect = gen(datetime(2001, 1, 1), datetime(2001, 1, 2), datetime(2001, 1, 3))
+
+            spec = final.IntervalsSpec(intervals=[interval1, interval2])
+            self.assertEqual(list(spec.occurrences(at, start, end)), [datetime(2001, 1, 2), datetime(2001, 1, 3), datetime(2001, 1, 4)])
+
+    describe "RepeatAndFiltersSpec and ManyRepeatAndFiltersSpec":
+        it "only gives times that get through the filters":
+            repeat = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 100000)) & interval(every: amount(num: 20, size: minute))")
+            spec = final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(minutes="0")])
+
+            found = list(spec.occurrences(datetime.fromtimestamp(0), limit=5))
+            self.assertEqual(len(found), 5)
+            self.assertEqual([f.minute for f in found], [0] * 5)
+
+        it "merges all the specs in order without repeats":
+            timepiece = make_timepiece()
+            obj = timepiece.time_spec_to_object("(between(start: epoch(epoch: 0), end: epoch(epoch: 10000)) & interval(every: amount(num: 30, size: minute))) | (between(start: epoch(epoch: 0), end: epoch(epoch: 10000)) & interval(every: amount(num: 20, size: minute)))")
+            self.assertIs(type(obj), final.ManyRepeatAndFiltersSpec)
+
+            start = datetime.fromtimestamp(0)
+            self.assertEqual(list(obj.occurrences(start, limit=5)), [datetime.fromtimestamp(m * 60) for m in (20, 30, 40, 60, 80)])
+            self.assertEqual(list(obj.occurrences(start, datetime.fromtimestamp(2400))), [datetime.fromtimestamp(m * 60) for m in (20, 30, 40)])
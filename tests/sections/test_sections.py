@@ -4,6 +4,7 @@ from tests.helpers import TestCase
 
 from timepiece.sections import sections, final
 from timepiece.spec import make_timepiece
+from timepiece import clock
 
 from noseOfYeti.tokeniser.support import noy_sup_setUp
 from input_algorithms.errors import BadSpecValue
@@ -32,11 +33,7 @@ describe TestCase, "Sections":
         describe "now":
             it "simplifies into a DateTimeSpec":
                 now = datetime.utcnow() + timedelta(hours=1)
-                fake_datetime = mock.Mock(name="datetime")
-                fake_datetime.utcnow.return_value = now
-
-                with mock.patch("timepiece.sections.sections.datetime", fake_datetime):
-                    obj = self.parser.time_spec_to_object("now()")
+                obj = self.parser.time_spec_to_object("now()", clock=clock.FrozenClock(now))
 
                 self.assertIs(type(obj), final.DateTimeSpec)
                 self.assertIs(obj.datetime, now)
@@ -107,16 +104,16 @@ describe TestCase, "Sections":
         describe "between":
             it "does not provide enough on it's own":
                 with self.fuzzyAssertRaisesError(self.ErrorKls, "Time spec is invalid, .+", got=("duration", )):
-                    self.parser.time_spec_to_object("between(start: sunset())")
+                    self.parser.time_spec_to_object("between(start: sunset(latitude: 51.5074, longitude: -0.1278))")
 
             it "combines with intervals":
-                obj = self.parser.time_spec_to_object("between(start: sunset()) & interval(every: amount(num: 1, size: minute))")
+                obj = self.parser.time_spec_to_object("between(start: sunset(latitude: 51.5074, longitude: -0.1278)) & interval(every: amount(num: 1, size: minute))")
                 self.assertEqual(type(obj), final.RepeatSpec)
                 self.assertEqual(type(obj.every), final.IntervalsSpec)
                 self.assertEqual(len(obj.every.intervals), 1)
 
             it "combines with multiple intervals":
-                obj = self.parser.time_spec_to_object("between(start: sunset()) & (interval(every: amount(num: 1, size: minute)) | interval(every: amount(num:2, size: hour)))")
+                obj = self.parser.time_spec_to_object("between(start: sunset(latitude: 51.5074, longitude: -0.1278)) & (interval(every: amount(num: 1, size: minute)) | interval(every: amount(num:2, size: hour)))")
                 self.assertEqual(type(obj), final.RepeatSpec)
                 self.assertEqual(type(obj.every), final.IntervalsSpec)
                 self.assertEqual(len(obj.every.intervals), 2)
@@ -153,11 +150,26 @@ describe TestCase, "Sections":
                 obj = self.parser.time_spec_to_object("sunrise()", validate=False)
                 self.assertIs(type(obj), sections.SunRiseSpec)
 
+            it "takes a latitude and longitude":
+                obj = self.parser.time_spec_to_object("sunrise(latitude: 51.5074, longitude: -0.1278)")
+                self.assertIs(type(obj), sections.SunRiseSpec)
+                self.assertEqual((obj.latitude, obj.longitude), (51.5074, -0.1278))
+                self.assertEqual(obj.specifies, ("repeat", ))
+
+            it "complains about a latitude that isn't on earth":
+                with self.fuzzyAssertRaisesError(BadSpecValue):
+                    self.parser.time_spec_to_object("sunrise(latitude: 91, longitude: 0)")
+
         describe "sunset":
             it "does not simplify":
                 obj = self.parser.time_spec_to_object("sunset()", validate=False)
                 self.assertIs(type(obj), sections.SunSetSpec)
 
+            it "takes a latitude and longitude":
+                obj = self.parser.time_spec_to_object("sunset(latitude: -33.8688, longitude: 151.2093)")
+                self.assertIs(type(obj), sections.SunSetSpec)
+                self.assertEqual((obj.latitude, obj.longitude), (-33.8688, 151.2093))
+
         describe "iso8601":
             it "can represent a datetime":
                 spec = str(uuid.uuid1())
@@ -0,0 +1,47 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.cache import SpecCache
+
+describe TestCase, "SpecCache":
+    it "complains if it can't hold anything":
+        with self.fuzzyAssertRaisesError(ValueError, "Cache must be able to hold at least one item, got maxsize=0"):
+            SpecCache(0)
+
+    it "records hits and misses":
+        cache = SpecCache(2)
+        self.assertEqual(cache.get("one"), (False, None))
+
+        cache.put("one", 1)
+        self.assertEqual(cache.get("one"), (True, 1))
+        self.assertEqual(cache.get("one"), (True, 1))
+
+        self.assertEqual(cache.stats, {"hits": 2, "misses": 1, "evictions": 0, "size": 1, "maxsize": 2})
+
+    it "evicts the least recently used":
+        cache = SpecCache(2)
+        cache.put("one", 1)
+        cache.put("two", 2)
+
+        # Use one so that two is the oldest
+        self.assertEqual(cache.get("one"), (True, 1))
+
+        cache.put("three", 3)
+        self.assertEqual(len(cache), 2)
+        assert "one" in cache
+        assert "two" not in cache
+        assert "three" in cache
+        self.assertEqual(cache.evictions, 1)
+
+    it "can invalidate some or all keys":
+        cache = SpecCache(5)
+        cache.put("one", 1)
+        cache.put("two", 2)
+        cache.put("three", 3)
+
+        cache.invalidate("one", "three", "four")
+        self.assertEqual(list(cache.entries.items()), [("two", 2)])
+
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
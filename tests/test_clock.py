@@ -0,0 +1,105 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.scheduler import Scheduler
+from timepiece.spec import make_timepiece
+from timepiece import clock
+
+from datetime import datetime, timedelta
+import threading
+import mock
+
+describe TestCase, "clocks":
+    it "has a system clock":
+        before = datetime.utcnow()
+        now = clock.SystemClock().now()
+        self.assertLessEqual(before, now)
+        self.assertLessEqual(now, datetime.utcnow())
+
+    it "has a frozen clock that only moves when told":
+        frozen = clock.FrozenClock(datetime(2016, 1, 1))
+        self.assertEqual(frozen.now(), datetime(2016, 1, 1))
+        self.assertEqual(frozen.now(), datetime(2016, 1, 1))
+
+        frozen.advance(minutes=5)
+        self.assertEqual(frozen.now(), datetime(2016, 1, 1, 0, 5))
+        frozen.advance(timedelta(days=1))
+        self.assertEqual(frozen.now(), datetime(2016, 1, 2, 0, 5))
+        frozen.set(datetime(2000, 1, 1))
+        self.assertEqual(frozen.now(), datetime(2000, 1, 1))
+
+    it "has a clock that goes faster than real time":
+        monotonic = mock.Mock(name="monotonic", side_effect=[100, 100.5, 102])
+        fast = clock.FastForwardClock(datetime(2016, 1, 1), 3600, monotonic=monotonic)
+        self.assertEqual(fast.now(), datetime(2016, 1, 1, 0, 30))
+        self.assertEqual(fast.now(), datetime(2016, 1, 1, 2))
+
+    it "takes snapshots":
+        frozen = clock.FrozenClock(datetime(2016, 1, 1))
+        snapshot = clock.snapshot(frozen)
+        frozen.advance(hours=1)
+        self.assertEqual(snapshot.now(), datetime(2016, 1, 1))
+
+        with clock.using(frozen):
+            self.assertEqual(clock.snapshot().now(), datetime(2016, 1, 1, 1))
+
+describe TestCase, "using":
+    it "uses the system clock by default":
+        self.assertIs(clock.current(), clock.system)
+
+    it "uses a clock until the block is done":
+        first = clock.FrozenClock(datetime(2016, 1, 1))
+        second = clock.FrozenClock(datetime(2017, 1, 1))
+        with clock.using(first):
+            self.assertEqual(clock.now(), datetime(2016, 1, 1))
+            with clock.using(second):
+                self.assertEqual(clock.now(), datetime(2017, 1, 1))
+            self.assertEqual(clock.now(), datetime(2016, 1, 1))
+        self.assertIs(clock.current(), clock.system)
+
+    it "only changes the clock for this thread":
+        found = []
+        with clock.using(clock.FrozenClock(datetime(2016, 1, 1))):
+            thread = threading.Thread(target=lambda: found.append(clock.current()))
+            thread.start()
+            thread.join()
+        self.assertEqual(found, [clock.system])
+
+describe TestCase, "evaluating with a clock":
+    it "parses with the clock it's given":
+        timepiece = make_timepiece()
+        obj = timepiece.time_spec_to_object("between(start: now()) & interval(every: amount(num: 1, size: day))", clock=clock.FrozenClock(datetime(2016, 1, 1)))
+        self.assertEqual(obj.start.datetime, datetime(2016, 1, 1))
+        self.assertIs(clock.current(), clock.system)
+
+    it "gives everything in parse_many the same now":
+        monotonic = mock.Mock(name="monotonic", side_effect=[0, 1, 2, 3])
+        moving = clock.FastForwardClock(datetime(2016, 1, 1), 86400, monotonic=monotonic)
+
+        found = list(make_timepiece().parse_many(["now()"] * 20, clock=moving, validate=False))
+        self.assertEqual(set(obj.datetime for obj in found), set([datetime(2016, 1, 1, 0, 0) + timedelta(days=1)]))
+        self.assertEqual(len(monotonic.mock_calls), 2)
+
+    it "finds the following time from the clock":
+        obj = make_timepiece().time_spec_to_object("between(start: epoch(epoch: 0)) & interval(every: amount(num: 15, size: minute))")
+        with clock.using(clock.FrozenClock(datetime(2016, 1, 1, 10, 1))):
+            self.assertEqual(obj.following(), datetime(2016, 1, 1, 10, 15))
+
+    it "replays schedules with a frozen clock":
+        timepiece = make_timepiece()
+        frozen = clock.FrozenClock(datetime(2016, 1, 1))
+        with clock.using(frozen):
+            scheduler = Scheduler()
+            scheduler.add("daily", timepiece.time_spec_to_object("between(start: now()) & interval(every: amount(num: 1, size: day))"))
+
+            fired = []
+            for _ in range(366):
+                frozen.advance(days=1)
+                fired.extend(scheduler.pop_due(clock.now()))
+
+        # Without an end, between goes on for 365 days from now
+        self.assertEqual(len(fired), 365)
+        self.assertEqual(fired[0], (datetime(2016, 1, 2), "daily"))
+        self.assertEqual(fired[-1], (datetime(2016, 12, 31), "daily"))
+        self.assertIs(scheduler.next_time("daily"), None)
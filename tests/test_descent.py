@@ -0,0 +1,119 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.descent import tokenize, Parser
+from timepiece.spec import make_timepiece
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from input_algorithms.errors import BadSpecValue
+from delfick_error import DelfickError
+import random
+
+valid_specs = [
+      "between(start: epoch(epoch: 0), end: epoch(epoch: 100)) & interval(every: amount(num: 1, size: hour))"
+    , "between(start: epoch(epoch: 0), end: epoch(epoch: 100)) & (interval(every: amount(num: 1, size: hour)) | interval(every: amount(num: 2, size: minute)))"
+    , "between(start: epoch(epoch: 0), end: epoch(epoch: 100)) & interval(every: amount(num:1, size:minute)) | ( interval(every: amount(num:2, size: second)) | interval(every: amount(num:3, size: hour)))"
+    , "time(hour: 16, minute:20) & date(month:3, day:10, year:1980)"
+    , "day_name(name: mon;tues)"
+    , "day_number(number: 20)"
+    , "epoch(epoch: 1000.5)"
+    , "iso8601(type: duration, specification: P1D)"
+    , "iso8601(type: date, specification: 2000-01-01)"
+    , "sunrise()"
+    ]
+
+invalid_specs = [
+      "between(start: now()) | blah()"
+    , "abc("
+    , "a()"
+    , "(ab()"
+    , "ab(cd:)"
+    , "ab(cd:ef,)"
+    , "ab()cd()"
+    , "ab()|"
+    , "ab(c_d: 1)"
+    , "ab(cd: 1(2))"
+    , "ab(cd: ef)$"
+    , "amount(num: 1, size: fortnight)"
+    ]
+
+describe TestCase, "Descent parser":
+    describe "tokenize":
+        it "splits words and punctuation":
+            self.assertEqual(tokenize("ab(cd:e.f;g)|(h)"), [
+                  ("word", "ab", 0), ("(", "(", 2), ("word", "cd", 3), (":", ":", 5), ("word", "e.f;g", 6), (")", ")", 11)
+                , ("|", "|", 12), ("(", "(", 13), ("word", "h", 14), (")", ")", 15), ("end", "", 16)
+                ])
+
+        it "complains about characters it doesn't know":
+            with self.fuzzyAssertRaisesError(BadSpecValue, error="Unexpected character", position=3, got="$"):
+                tokenize("ab($")
+
+    describe "Parser":
+        it "makes nested tuples":
+            self.assertEqual(Parser(tokenize("(ab(cd:ef)|gh())&ij(kl:mn(op:1),qr:2)")).time_spec(),
+                  [ [("ab", [("cd", "ef")]), "OR", ("gh", [])]
+                  , "AND"
+                  , ("ij", [("kl", ("mn", [("op", "1")])), ("qr", "2")])
+                  ]
+                )
+
+        it "keeps chains of joiners flat":
+            self.assertEqual(Parser(tokenize("ab()|cd()&ef()")).time_spec(), [("ab", []), "OR", ("cd", []), "AND", ("ef", [])])
+
+        it "can parse very long chains":
+            spec = "|".join("ab(cd:{0})".format(i) for i in range(5000))
+            self.assertEqual(len(Parser(tokenize(spec)).time_spec()), 9999)
+
+    describe "compared to the parsimonious grammar":
+        before_each:
+            # Make our ErrorKls
+            class ErrorKls(DelfickError):
+                desc = "Something went wrong lol"
+            self.ErrorKls = ErrorKls
+            self.parsimonious = make_timepiece(ErrorKls)
+            self.descent = make_timepiece(ErrorKls, parser="descent")
+
+        def outcome(self, parser, spec, validate=True):
+            try:
+                return parser.time_spec_to_object(spec, validate=validate)
+            except (BadSpecValue, self.ErrorKls) as error:
+                return type(error), getattr(error, "message", None), getattr(error.kwargs.get("meta"), "path", None)
+
+        it "complains about unknown parsers":
+            with self.fuzzyAssertRaisesError(self.ErrorKls, "Unknown parser", wanted="yacc", available=["descent", "parsimonious"]):
+                make_timepiece(self.ErrorKls, parser="yacc")
+
+        it "makes the same objects":
+            for spec in valid_specs:
+                expected = self.parsimonious.time_spec_to_object(spec, validate=False)
+                got = self.descent.time_spec_to_object(spec, validate=False)
+                self.assertEqual(type(got), type(expected), spec)
+                self.assertEqual(got, expected, spec)
+
+        it "raises the same errors":
+            for spec in invalid_specs + [""]:
+                expected = self.outcome(self.parsimonious, spec)
+                got = self.outcome(self.descent, spec)
+                assert type(expected) is tuple, spec
+                self.assertEqual(got[0], expected[0], spec)
+
+                if "(error=" not in repr(expected):
+                    self.assertEqual(got, expected, spec)
+
+            for spec in ("day_name(name: mon)", "amount(num: 1, size: minute)"):
+                self.assertEqual(self.outcome(self.descent, spec), self.outcome(self.parsimonious, spec))
+
+        it "agrees on random specifications":
+            pieces = ["ab", "(", ")", ":", ",", "|", "&", "1", "cd", "day_name", "mon", "x.y", "amount(", "num:1", "size:hour", "now()"]
+            chooser = random.Random(42)
+            for _ in range(2000):
+                spec = "".join(chooser.choice(pieces) for _ in range(chooser.randrange(1, 12)))
+                expected = self.outcome(self.parsimonious, spec, validate=False)
+                got = self.outcome(self.descent, spec, validate=False)
+                if type(expected) is tuple:
+                    self.assertEqual(type(got), tuple, spec)
+                    self.assertEqual(got[0], expected[0], spec)
+                else:
+                    self.assertEqual(type(got), type(expected), spec)
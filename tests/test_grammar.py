@@ -2,13 +2,20 @@
 
 from tests.helpers import TestCase
 
-from timepiece.grammar import TimeSpecVisitor
+from timepiece.grammar import TimeSpecVisitor, ParseContext, parse_in_worker, worker_grammars
+from timepiece.sections.base import default_available_sections
 from timepiece.spec import make_timepiece
 
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from input_algorithms.errors import BadSpecValue
 from input_algorithms.dictobj import dictobj
 from input_algorithms import spec_base as sb
 from input_algorithms.meta import Meta
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import mock
+
 describe TestCase, "TimeSpecGrammar":
     describe "Parsing into nodes":
         it "works":
@@ -62,3 +69,191 @@ describe TestCase, "TimeSpecGrammar":
             self.assertEqual(result.first.first.attr2, "val2")
 
             self.assertEqual(result.first.second.something, 2)
+
+        it "validates sections made with a context from outside parse":
+            section = default_available_sections["sunrise"]
+            made = section.normalise(Meta({}, []), {})
+            with self.fuzzyAssertRaisesError(BadSpecValue, "Need a latitude and longitude.+"):
+                TimeSpecVisitor(default_available_sections).section_made(section, made, ParseContext(), Meta({}, []))
+
+    describe "Caching":
+        it "doesn't cache by default":
+            parser = make_timepiece()
+            self.assertIs(parser.cache, None)
+
+            spec = "between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: hour))"
+            self.assertIsNot(parser.time_spec_to_object(spec), parser.time_spec_to_object(spec))
+
+        it "caches on the stripped specification":
+            parser = make_timepiece(cache_size=10)
+
+            obj = parser.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))")
+            self.assertIs(parser.time_spec_to_object("between(start:epoch(epoch:0),end:epoch(epoch:1000))&interval(every:amount(num:1,size:hour))"), obj)
+            self.assertEqual(parser.cache.stats, {"hits": 1, "misses": 1, "evictions": 0, "size": 1, "maxsize": 10})
+
+        it "doesn't share time dependent specifications":
+            parser = make_timepiece(cache_size=10)
+
+            for spec in (
+                  "between(start: now()) & interval(every: amount(num: 1, size: hour))"
+                , "between(start: epoch(epoch: 0)) & interval(every: range(min: amount(num: 1, size: hour), max: amount(num: 2, size: hour)))"
+                , "between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: hour))"
+                ):
+                self.assertIsNot(parser.time_spec_to_object(spec, validate=False), parser.time_spec_to_object(spec, validate=False))
+
+            spec = "between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))"
+            self.assertIs(parser.time_spec_to_object(spec), parser.time_spec_to_object(spec))
+            self.assertEqual(len(parser.cache), 1)
+
+        it "can invalidate the cache":
+            parser = make_timepiece(cache_size=10)
+            spec = "between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))"
+            spec2 = "between(start: epoch(epoch: 1), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))"
+
+            obj = parser.time_spec_to_object(spec)
+            obj2 = parser.time_spec_to_object(spec2)
+
+            parser.invalidate(spec.replace(" ", ""))
+            self.assertIsNot(parser.time_spec_to_object(spec), obj)
+            self.assertIs(parser.time_spec_to_object(spec2), obj2)
+
+            parser.invalidate()
+            self.assertEqual(len(parser.cache), 0)
+            self.assertIsNot(parser.time_spec_to_object(spec2), obj2)
+
+        it "evicts old entries":
+            parser = make_timepiece(cache_size=2)
+            for epoch in range(5):
+                parser.time_spec_to_object("between(start: epoch(epoch: {0}), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))".format(epoch))
+            self.assertEqual(len(parser.cache), 2)
+            self.assertEqual(parser.cache.evictions, 3)
+
+    describe "Concurrency":
+        def assertParsesConcurrently(self, parser):
+            def spec_for(index):
+                # Every interval adds two sections before the broken one
+                count = index // 3 % 4 + 1
+                intervals = " | ".join("interval(every: amount(num: {0}, size: minute))".format(i + 1) for i in range(count))
+                if index % 3 == 0:
+                    return "between(start: epoch(epoch: {0}), end: epoch(epoch: 1000000000)) & ({1})".format(index, intervals), None
+                elif index % 3 == 1:
+                    return "{0} | blah()".format(intervals), "[{0}(blah)]".format(count * 2)
+                else:
+                    return "{0} | interval(every: amount(num: 1, size: fortnight))".format(intervals), "[{0}(amount)]".format(count * 2 + 1)
+
+            def parse(index):
+                spec, path = spec_for(index)
+                try:
+                    res = parser.time_spec_to_object(spec)
+                except BadSpecValue as error:
+                    return index, error.kwargs["meta"].path
+                else:
+                    return index, (res.start.datetime, len(res.every.intervals))
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(parse, range(1500)))
+
+            for index, got in results:
+                spec, path = spec_for(index)
+                if path is None:
+                    self.assertEqual(got, (datetime.fromtimestamp(index), index // 3 % 4 + 1))
+                else:
+                    self.assertEqual(got, path, spec)
+
+        it "can share a grammar between many threads":
+            self.assertParsesConcurrently(make_timepiece())
+
+        it "can share a descent parser between many threads":
+            self.assertParsesConcurrently(make_timepiece(parser="descent"))
+
+        it "can share a cache between many threads":
+            self.assertParsesConcurrently(make_timepiece(cache_size=100))
+
+    describe "parse_many":
+        before_each:
+            self.specs = []
+            for index in range(25):
+                if index % 4 == 0:
+                    self.specs.append("blah()")
+                else:
+                    self.specs.append("between(start: epoch(epoch: {0}), end: epoch(epoch: 1000000)) & interval(every: amount(num: 1, size: hour))".format(index))
+
+        def assertResults(self, results):
+            self.assertEqual(len(results), 25)
+            for index, res in enumerate(results):
+                if index % 4 == 0:
+                    self.assertIs(type(res), BadSpecValue)
+                    self.assertEqual(res.kwargs["wanted"], "blah")
+                else:
+                    self.assertEqual(res.start.datetime, datetime.fromtimestamp(index))
+
+        it "parses in this process if there aren't many specifications":
+            parser = make_timepiece()
+            with mock.patch("timepiece.grammar.futures.ProcessPoolExecutor") as FakeExecutor:
+                self.assertResults(list(parser.parse_many(iter(self.specs), workers=4)))
+            self.assertEqual(len(FakeExecutor.mock_calls), 0)
+
+        it "parses in this process without workers":
+            parser = make_timepiece()
+            with mock.patch("timepiece.grammar.futures.ProcessPoolExecutor") as FakeExecutor:
+                self.assertResults(list(parser.parse_many(iter(self.specs), serial_below=1)))
+            self.assertEqual(len(FakeExecutor.mock_calls), 0)
+
+        it "parses in order on a pool of processes":
+            parser = make_timepiece(parser="descent")
+            self.assertResults(list(parser.parse_many(iter(self.specs), workers=2, chunksize=3, serial_below=10)))
+
+        it "parses with the extra sections of a clone on a pool of processes":
+            parser = make_timepiece().clone({"seconds": default_available_sections["epoch"]})
+            specs = ["seconds(epoch: {0})".format(index) for index in range(12)]
+            expected = [parser.time_spec_to_object(spec).datetime for spec in specs]
+            found = list(parser.parse_many(iter(specs), workers=2, chunksize=3, serial_below=10))
+            self.assertEqual([res.datetime for res in found], expected)
+
+        it "only makes the grammar once in each worker":
+            made = []
+            def maker(**kwargs):
+                made.append(kwargs)
+                return make_timepiece(**kwargs)
+
+            parser = make_timepiece()
+            _, kwargs = parser.recipe()
+            with mock.patch.dict(worker_grammars, {}):
+                first = parse_in_worker("one", (maker, kwargs), True, None, self.specs[:10])
+                second = parse_in_worker("one", (maker, kwargs), True, None, self.specs[10:])
+            self.assertEqual(made, [kwargs])
+            self.assertResults(first + second)
+
+describe TestCase, "Class level caching":
+    it "compiles the grammar once for every visitor":
+        self.assertIs(TimeSpecVisitor().grammar, TimeSpecVisitor().grammar)
+
+        class Other(TimeSpecVisitor):
+            grammar_string = 'time_spec = "a"'
+        self.assertIsNot(Other().grammar, TimeSpecVisitor().grammar)
+        Other().grammar.parse("a")
+
+    it "works out the dispatch table once per class":
+        self.assertIs(TimeSpecVisitor().visiting_methods, TimeSpecVisitor().visiting_methods)
+        self.assertIs(TimeSpecVisitor.dispatch_table()["func"], TimeSpecVisitor.visit_func)
+
+        class Other(TimeSpecVisitor):
+            def visit_func(self, node, children, context):
+                return "other"
+        self.assertIs(Other.dispatch_table()["func"], Other.visit_func)
+        self.assertIs(TimeSpecVisitor.dispatch_table()["func"], TimeSpecVisitor.visit_func)
+
+    it "makes the same classes for the same options":
+        one = make_timepiece()
+        two = make_timepiece(cache_size=10)
+        self.assertIsNot(one, two)
+        self.assertIs(type(one), type(two))
+        self.assertIs(one.Visitor, two.Visitor)
+        self.assertEqual(two.cache.maxsize, 10)
+
+        self.assertIsNot(type(make_timepiece(parser="descent")), type(one))
+
+        class ErrorKls(Exception):
+            pass
+        self.assertIsNot(type(make_timepiece(ErrorKls=ErrorKls)), type(one))
+        self.assertIs(make_timepiece(ErrorKls=ErrorKls).Visitor.ErrorKls, ErrorKls)
@@ -2,7 +2,10 @@
 
 from tests.helpers import TestCase
 
-from timepiece.helpers import memoized_property
+from timepiece.helpers import memoized_property, lazy_module, optional_module
+
+import subprocess
+import sys
 
 describe TestCase, "memoized_property":
     it "stores the cached value on the instance":
@@ -82,3 +85,37 @@ describe TestCase, "memoized_property":
         self.assertEqual(thing.a_property, 42)
         self.assertEqual(info, {"called": 1})
 
+describe TestCase, "lazy_module":
+    it "only imports the module when something is used":
+        lazy = lazy_module("json")
+        self.assertIs(lazy._lazy_module, None)
+
+        import json
+        self.assertIs(lazy.dumps, json.dumps)
+        self.assertIs(lazy._lazy_module, json)
+
+    it "complains about attributes the module doesn't have":
+        lazy = lazy_module("json")
+        with self.assertRaises(AttributeError):
+            lazy.not_a_thing
+
+    it "doesn't import heavy dependencies when timepiece.spec is imported":
+        # delfick_error imports unittest, which imports concurrent.futures on newer pythons
+        # So we only look at what importing timepiece adds to what its dependencies import
+        script = "; ".join([
+              "import sys, delfick_error, input_algorithms.dictobj"
+            , "before = set(sys.modules)"
+            , "import timepiece.spec"
+            , "found = set(m for m in sys.modules if m not in before)"
+            , "print(','.join(sorted(set(m.split('.')[0] for m in found) & set(['aniso8601', 'dateutil', 'parsimonious', 'numpy']) | found & set(['concurrent.futures']))))"
+            ])
+        output = subprocess.check_output([sys.executable, "-c", script])
+        self.assertEqual(output.decode().strip(), "")
+
+describe TestCase, "optional_module":
+    it "returns the module if it can be imported":
+        import json
+        self.assertIs(optional_module("json"), json)
+
+    it "returns None if it can't be imported":
+        self.assertIs(optional_module("timepiece_not_a_module"), None)
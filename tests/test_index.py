@@ -0,0 +1,109 @@
+# coding: spec
+
+from tests.helpers import TestCase, random_filter
+
+from timepiece.index import FilterIndex, NotIndexed, AlreadyIndexed
+from timepiece.spec import make_timepiece
+from timepiece.sections import final
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from datetime import datetime, timedelta
+import random
+
+describe TestCase, "FilterIndex":
+    before_each:
+        self.timepiece = make_timepiece()
+        self.repeat = self.timepiece.time_spec_to_object("between(start: epoch(epoch: 0)) & interval(every: amount(num: 1, size: minute))")
+
+    def random_spec(self, r):
+        kind = r.randint(0, 4)
+        if kind == 0:
+            return random_filter(r)
+        elif kind == 1:
+            return final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[random_filter(r) for _ in range(r.randint(1, 3))])
+        elif kind == 2:
+            return final.ManyRepeatAndFiltersSpec(specs=[final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[random_filter(r)]) for _ in range(r.randint(1, 3))])
+        elif kind == 3:
+            return self.timepiece.time_spec_to_object("between(start: epoch(epoch: {0})) & interval(every: amount(num: 5, size: minute))".format(r.randint(0, 2000000000)))
+        else:
+            return self.timepiece.time_spec_to_object("epoch(epoch: {0})".format(r.choice([1451649600, 1451649630, 1451653200])))
+
+    def assertMatches(self, index, specs, times):
+        for at in times:
+            self.assertEqual(index.matching(at), set(ident for ident, spec in specs.items() if spec.is_filtered(at)), at)
+
+    it "finds the same specs as calling is_filtered on everything":
+        r = random.Random(42)
+        index = FilterIndex()
+        specs = {}
+        for ident in range(2000):
+            specs[ident] = self.random_spec(r)
+            index.add(ident, specs[ident])
+
+        times = [datetime.utcfromtimestamp(1451649600)] + [datetime(2016, 1, 1) + timedelta(minutes=r.randint(0, 60 * 24 * 366 * 2)) for _ in range(150)]
+        self.assertMatches(index, specs, times)
+
+    it "keeps up as specs are added, removed and updated":
+        r = random.Random(7)
+        index = FilterIndex()
+        specs = {}
+        for ident in range(300):
+            specs[ident] = self.random_spec(r)
+            index.add(ident, specs[ident])
+
+        for ident in r.sample(range(300), 100):
+            self.assertIs(index.remove(ident), specs.pop(ident))
+        for ident in r.sample(sorted(specs), 100):
+            specs[ident] = self.random_spec(r)
+            index.update(ident, specs[ident])
+
+        self.assertEqual(len(index), 200)
+        self.assertMatches(index, specs, [datetime(2016, 1, 1) + timedelta(minutes=r.randint(0, 60 * 24 * 366)) for _ in range(100)])
+
+        for ident in list(specs):
+            index.remove(ident)
+        self.assertEqual(index.stats, {"specs": 0, "units": 0, "groups": 0, "postings": 0, "checked": 0})
+
+    it "needs every filter of a RepeatAndFiltersSpec and one spec of a ManyRepeatAndFiltersSpec":
+        index = FilterIndex()
+        both = final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours="9;10"), final.FilterSpec.using(hours="10;11", minutes="0")])
+        either = final.ManyRepeatAndFiltersSpec(specs=[
+              final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours="9", minutes="0")])
+            , final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours="10", minutes="30")])
+            ])
+        index.add("both", both)
+        index.add("either", either)
+
+        self.assertEqual(index.matching(datetime(2016, 1, 1, 9, 0)), set(["either"]))
+        self.assertEqual(index.matching(datetime(2016, 1, 1, 9, 30)), set())
+        self.assertEqual(index.matching(datetime(2016, 1, 1, 10, 0)), set(["both"]))
+        self.assertEqual(index.matching(datetime(2016, 1, 1, 10, 30)), set(["either"]))
+
+    it "doesn't change anything when it can't index a spec":
+        index = FilterIndex()
+        old = final.FilterSpec.using(hours="1")
+        index.add("one", old)
+        stats = index.stats
+
+        broken = final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours="2"), None])
+        with self.assertRaises(AttributeError):
+            index.add("two", broken)
+        assert "two" not in index
+        self.assertEqual(index.stats, stats)
+
+        with self.assertRaises(AttributeError):
+            index.update("one", broken)
+        self.assertIs(index.remove("one"), old)
+        self.assertEqual(index.stats, {"specs": 0, "units": 0, "groups": 0, "postings": 0, "checked": 0})
+
+    it "complains about ids it doesn't know or already has":
+        index = FilterIndex()
+        index.add("one", final.FilterSpec.using(hours="1"))
+        assert "one" in index
+
+        with self.fuzzyAssertRaisesError(AlreadyIndexed, ident="one"):
+            index.add("one", final.FilterSpec.using(hours="2"))
+        with self.fuzzyAssertRaisesError(NotIndexed, ident="two"):
+            index.remove("two")
+        with self.fuzzyAssertRaisesError(NotIndexed, ident="two"):
+            index.update("two", final.FilterSpec.using(hours="2"))
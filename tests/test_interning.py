@@ -0,0 +1,129 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.sections.sections import AmountSpec, IntervalSpec
+from timepiece.sections.base import FrozenSpec
+from timepiece.interning import Interner
+from timepiece.sections import final
+from timepiece.spec import make_timepiece
+
+describe TestCase, "Interner":
+    it "shares identical objects":
+        interner = Interner()
+        one = IntervalSpec.using(every=AmountSpec.using(num=1, size="hour"))
+        two = IntervalSpec.using(every=AmountSpec.using(num=1, size="hour"))
+        self.assertIsNot(one, two)
+
+        self.assertIs(interner.intern(one), one)
+        self.assertIs(interner.intern(two), one)
+        self.assertIs(two.every, one.every)
+        self.assertEqual(interner.stats["nodes"], 2)
+        self.assertEqual(interner.deduplicated, 2)
+        assert interner.bytes_saved > 0
+
+    it "interns children before their parents":
+        interner = Interner()
+        amount = interner.intern(AmountSpec.using(num=1, size="hour"))
+        interval = IntervalSpec.using(every=AmountSpec.using(num=1, size="hour"))
+        intervals = final.IntervalsSpec.contain(interval, IntervalSpec.using(every=AmountSpec.using(num=2, size="hour")))
+
+        self.assertIs(interner.intern(intervals), intervals)
+        self.assertIs(intervals.intervals[0], interval)
+        self.assertIs(interval.every, amount)
+        self.assertEqual(interner.deduplicated, 1)
+
+    it "keeps different objects apart":
+        interner = Interner()
+        hour = interner.intern(AmountSpec.using(num=1, size="hour"))
+        minute = interner.intern(AmountSpec.using(num=1, size="minute"))
+        self.assertIsNot(hour, minute)
+        self.assertEqual(len(interner), 2)
+        self.assertEqual(interner.deduplicated, 0)
+
+    it "leaves things that aren't specifications alone":
+        interner = Interner()
+        self.assertEqual(interner.intern([1, 2]), [1, 2])
+        self.assertEqual(len(interner), 0)
+
+    it "freezes interned objects":
+        interner = Interner()
+        amount = interner.intern(AmountSpec.using(num=1, size="hour"))
+        with self.fuzzyAssertRaisesError(FrozenSpec, kls="AmountSpec", field="num"):
+            amount.num = 2
+        with self.fuzzyAssertRaisesError(FrozenSpec, kls="AmountSpec", field="size"):
+            amount["size"] = "minute"
+        self.assertEqual(amount.size, "hour")
+        self.assertEqual(amount.num, 1)
+
+        # Memoized values can still be stored
+        amount.other = 3
+        self.assertEqual(amount.other, 3)
+
+    it "turns lists into tuples so they can't be changed":
+        filt = final.FilterSpec.using(hours=["3"])
+        rf = final.RepeatAndFiltersSpec(repeat=None, filters=[filt])
+        many = Interner().intern(final.ManyRepeatAndFiltersSpec(specs=[rf]))
+        self.assertEqual(many.specs, (rf, ))
+        self.assertEqual(rf.filters, (filt, ))
+        self.assertEqual(filt.hours, (3, ))
+
+        with self.assertRaises(AttributeError):
+            many.specs[0].filters.append(final.FilterSpec.using(hours=["4"]))
+
+        # They are still equal to the same specification with lists
+        self.assertEqual(many, final.ManyRepeatAndFiltersSpec(specs=[final.RepeatAndFiltersSpec(repeat=None, filters=[final.FilterSpec.using(hours=["3"])])]))
+
+    it "can be cleared":
+        interner = Interner()
+        interner.intern(AmountSpec.using(num=1, size="hour"))
+        interner.clear()
+        self.assertEqual(len(interner), 0)
+
+describe TestCase, "hashing specifications":
+    it "hashes on the fields":
+        one = final.FilterSpec.using(minutes="1;2")
+        two = final.FilterSpec.using(minutes="1;2")
+        self.assertEqual(hash(one), hash(two))
+        self.assertEqual(len(set([one, two, final.FilterSpec.using(minutes="3")])), 2)
+
+describe TestCase, "interning grammar":
+    it "shares subtrees between specifications":
+        spec = "between(start: epoch(epoch: {0}), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))"
+        for parser in ("parsimonious", "descent"):
+            timepiece = make_timepiece(intern=True, parser=parser)
+            one = timepiece.time_spec_to_object(spec.format(1))
+            two = timepiece.time_spec_to_object(spec.format(2))
+            self.assertEqual(one, make_timepiece().time_spec_to_object(spec.format(1)))
+            self.assertIsNot(one, two)
+            self.assertIs(one.every, two.every)
+            self.assertIs(one.end, two.end)
+            self.assertIs(timepiece.time_spec_to_object(spec.format(1)), one)
+            assert timepiece.interner.stats["deduplicated"] > 0
+
+    it "doesn't intern time dependent specifications":
+        timepiece = make_timepiece(intern=True)
+        spec = "between(start: now()) & interval(every: amount(num: 1, size: hour))"
+        one = timepiece.time_spec_to_object(spec)
+        two = timepiece.time_spec_to_object(spec)
+        self.assertIsNot(one, two)
+        self.assertIs(one.every.intervals[0], two.every.intervals[0])
+
+    it "doesn't intern anything with a time dependent specification inside it":
+        spec = "between(start: now(), end: epoch(epoch: 99999999999)) & interval(every: amount(num: 1, size: hour))"
+        for parser in ("parsimonious", "descent"):
+            timepiece = make_timepiece(intern=True, parser=parser)
+            one = timepiece.time_spec_to_object(spec)
+            size = len(timepiece.interner)
+
+            for _ in range(3):
+                two = timepiece.time_spec_to_object(spec)
+                self.assertEqual(len(timepiece.interner), size)
+
+            self.assertIsNot(one.start, two.start)
+            self.assertIs(one.start._interned, False)
+            self.assertIs(one.end, two.end)
+            self.assertIs(one.every.intervals[0], two.every.intervals[0])
+
+    it "isn't on by default":
+        self.assertIs(make_timepiece().interner, None)
@@ -0,0 +1,85 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.loader import read_rows, load, LoadStats, BadRow
+from timepiece.spec import make_timepiece
+from timepiece.cli import main
+
+from delfick_error import DelfickError
+
+import tempfile
+import json
+import io
+import os
+
+good = "between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & interval(every: amount(num: 1, size: hour))"
+
+describe TestCase, "read_rows":
+    it "reads id tab spec lines":
+        fle = io.StringIO("one\t{0}\n\ntwo\t{0}\r\nno_tab\n".format(good))
+        self.assertEqual(list(read_rows(fle)), [("one", good), ("two", good), (4, "no_tab")])
+
+    it "reads json lines":
+        fle = io.StringIO("\n".join([json.dumps({"id": 1, "spec": good}), "{not json", json.dumps({"id": 3}), json.dumps({"spec": good})]))
+        rows = list(read_rows(fle, format="jsonl"))
+        self.assertEqual(rows[0], (1, good))
+        self.assertEqual(rows[1][0], 2)
+        self.assertIsInstance(rows[1][1], BadRow)
+        self.assertEqual(rows[2][0], 3)
+        self.assertIsInstance(rows[2][1], BadRow)
+        self.assertEqual(rows[3], (4, good))
+
+    it "complains about unknown formats":
+        with self.fuzzyAssertRaisesError(DelfickError, "Unknown format", wanted="csv"):
+            list(read_rows(io.StringIO(""), format="csv"))
+
+describe TestCase, "load":
+    it "yields ids with objects or errors in order":
+        timepiece = make_timepiece()
+        lines = [json.dumps({"id": 1, "spec": good}), "{bad", json.dumps({"id": 3, "spec": "blah()"}), json.dumps({"id": 4, "spec": good}), "{bad"]
+
+        stats = LoadStats()
+        result = list(load(io.StringIO("\n".join(lines)), timepiece=timepiece, format="jsonl", stats=stats))
+
+        self.assertEqual([ident for ident, _ in result], [1, 2, 3, 4, 5])
+        self.assertEqual(result[0][1], timepiece.time_spec_to_object(good))
+        self.assertIsInstance(result[1][1], BadRow)
+        self.assertIsInstance(result[2][1], Exception)
+        self.assertNotIsInstance(result[2][1], BadRow)
+        self.assertEqual(result[3][1], timepiece.time_spec_to_object(good))
+        self.assertIsInstance(result[4][1], BadRow)
+
+        counts = stats.as_dict()
+        self.assertEqual((counts["rows"], counts["parsed"], counts["errors"], counts["bad_rows"]), (5, 2, 1, 2))
+
+    it "reads lazily":
+        def lines():
+            for i in range(5000):
+                yield "{0}\t{1}\n".format(i, good)
+                consumed.append(i)
+
+        consumed = []
+        rows = load(lines(), timepiece=make_timepiece(cache_size=10))
+        self.assertEqual(next(rows)[0], "0")
+        assert len(consumed) < 5000
+
+describe TestCase, "cli":
+    it "prints a line for each row and counts to stderr":
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as fle:
+            fle.write("one\t{0}\ntwo\tblah()\n".format(good))
+
+        try:
+            out = io.StringIO()
+            err = io.StringIO()
+            self.assertEqual(main(["check", fle.name], out=out, err=err), 1)
+            lines = out.getvalue().splitlines()
+            self.assertEqual(lines[0], "one\tok")
+            assert lines[1].startswith("two\terror\t"), lines[1]
+            assert err.getvalue().startswith("rows=2 parsed=1 errors=1 bad_rows=0"), err.getvalue()
+
+            out = io.StringIO()
+            main(["check", fle.name, "--errors-only"], out=out, err=io.StringIO())
+            self.assertEqual(len(out.getvalue().splitlines()), 1)
+        finally:
+            os.remove(fle.name)
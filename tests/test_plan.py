@@ -0,0 +1,102 @@
+# coding: spec
+
+from tests.helpers import TestCase, random_filter
+
+from timepiece.plan import compile, FrozenPlan, OncePlan, RepeatPlan, FilteredPlan, ManyPlan
+from timepiece.spec import make_timepiece
+from timepiece.sections import final
+from timepiece import clock
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from datetime import datetime, timedelta
+import random
+
+sizes = [("second", 1, 90), ("minute", 1, 90), ("hour", 1, 30), ("day", 1, 10), ("week", 1, 3), ("month", 1, 5), ("year", 1, 2)]
+
+describe TestCase, "compile":
+    before_each:
+        self.timepiece = make_timepiece()
+
+    def random_repeat(self, r):
+        start = r.randint(1400000000, 1500000000)
+        end = start + r.randint(0, 60 * 60 * 24 * 365 * 3)
+        intervals = []
+        for _ in range(r.randint(0, 3)):
+            size, low, high = r.choice(sizes)
+            spec = self.timepiece.time_spec_to_object("interval(every: amount(num: {0}, size: {1}))".format(r.randint(low, high), size), validate=False)
+            intervals.append(spec)
+
+        spec = self.timepiece.time_spec_to_object("between(start: epoch(epoch: {0}), end: epoch(epoch: {1}))".format(start, end), validate=False)
+        if intervals:
+            spec = final.RepeatSpec.using(start=spec.start, end=spec.end, every=final.IntervalsSpec.contain(*intervals))
+        return spec
+
+    def random_spec(self, r):
+        parts = []
+        for _ in range(r.randint(1, 3)):
+            filters = [random_filter(r) for _ in range(r.randint(0, 1))]
+            parts.append(final.RepeatAndFiltersSpec(repeat=self.random_repeat(r), filters=filters))
+        return final.ManyRepeatAndFiltersSpec(specs=parts)
+
+    def random_times(self, r, spec):
+        times = []
+        for rf in spec.specs:
+            start = rf.repeat.start.datetime
+            end = rf.repeat.end.datetime
+            times.extend([start, end, start - timedelta(seconds=1), end + timedelta(microseconds=1)])
+            for _ in range(4):
+                times.append(start + timedelta(seconds=r.randint(-86400, int((end - start).total_seconds()) + 86400), microseconds=r.choice([0, 0, 500000])))
+        return times
+
+    it "gives the same answers as the specs it was made from":
+        r = random.Random(1)
+        for _ in range(30):
+            spec = self.random_spec(r)
+            plan = compile(spec)
+            self.assertIs(type(plan), ManyPlan)
+            for at in self.random_times(r, spec):
+                self.assertEqual(plan.following(at), spec.following(at), (spec, at))
+                self.assertEqual(plan.is_filtered(at), spec.is_filtered(at), (spec, at))
+
+    it "makes plans from each kind of spec":
+        once = self.timepiece.time_spec_to_object("epoch(epoch: 1451649600)")
+        plan = compile(once)
+        self.assertIs(type(plan), OncePlan)
+        for at in (datetime(2016, 1, 1, 12), datetime(2016, 1, 1, 12, 0, 29), datetime(2016, 1, 1, 12, 0, 30), datetime(2016, 1, 1, 11, 59, 59, 500)):
+            self.assertEqual(plan.following(at), once.following(at))
+            self.assertEqual(plan.is_filtered(at), once.is_filtered(at))
+
+        repeat = self.timepiece.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 15, size: minute))")
+        self.assertIs(type(compile(repeat)), RepeatPlan)
+        self.assertEqual(compile(repeat).following(datetime(2016, 1, 1, 10, 1)), datetime(2016, 1, 1, 10, 15))
+
+        rf = final.RepeatAndFiltersSpec(repeat=repeat, filters=[final.FilterSpec.using(hours=["3"])])
+        self.assertIs(type(compile(rf)), FilteredPlan)
+        self.assertEqual(compile(rf).following(datetime(2016, 1, 1, 10, 1)), datetime(2016, 1, 2, 3))
+
+        f = final.FilterSpec.using(hours=["3"])
+        self.assertIs(compile(f), f.compiled)
+
+    it "uses the clock when there's no time":
+        plan = compile(self.timepiece.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 15, size: minute))"))
+        with clock.using(clock.FrozenClock(datetime(2016, 1, 1, 10, 1))):
+            self.assertEqual(plan.following(), datetime(2016, 1, 1, 10, 15))
+
+    it "keeps specs it can't make a plan for":
+        sunrise = self.timepiece.time_spec_to_object("between(start: sunrise(latitude: 51.5074, longitude: -0.1278), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 1, size: hour))")
+        self.assertIs(compile(sunrise), sunrise)
+
+        rf = final.RepeatAndFiltersSpec(repeat=sunrise, filters=[])
+        plan = compile(final.ManyRepeatAndFiltersSpec(specs=[rf]))
+        self.assertIs(plan.plans[0], rf)
+
+    it "can't be changed":
+        plan = compile(self.timepiece.time_spec_to_object("epoch(epoch: 1451649600)"))
+        with self.fuzzyAssertRaisesError(FrozenPlan, kls="OncePlan", attribute="at"):
+            plan.at = datetime(2016, 1, 1)
+        with self.fuzzyAssertRaisesError(FrozenPlan, kls="OncePlan", attribute="other"):
+            plan.other = 1
+        with self.fuzzyAssertRaisesError(FrozenPlan):
+            del plan.at
+        self.assertEqual(plan.at, datetime(2016, 1, 1, 12))
+        self.assertFalse(hasattr(plan, "__dict__"))
@@ -0,0 +1,108 @@
+# coding: spec
+
+from tests.helpers import TestCase, random_filter
+
+from timepiece.interning import Interner
+from timepiece.spec import make_timepiece
+from timepiece.sections import final
+from timepiece import predicate
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from datetime import datetime, timedelta
+import random
+
+describe TestCase, "for_spec":
+    before_each:
+        self.timepiece = make_timepiece()
+        self.repeat = self.timepiece.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 1, size: minute))")
+
+    def random_spec(self, r):
+        kind = r.randint(0, 2)
+        if kind == 0:
+            return random_filter(r)
+        elif kind == 1:
+            return final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[random_filter(r) for _ in range(r.randint(0, 3))])
+        else:
+            return final.ManyRepeatAndFiltersSpec(specs=[final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[random_filter(r) for _ in range(r.randint(0, 2))]) for _ in range(r.randint(1, 4))])
+
+    it "gives the same answers as is_filtered":
+        r = random.Random(25)
+        times = [datetime(2016, 1, 1) + timedelta(minutes=r.randint(0, 60 * 24 * 366 * 3), seconds=r.randint(0, 59)) for _ in range(300)]
+        for _ in range(400):
+            spec = self.random_spec(r)
+            func = predicate.for_spec(spec)
+            for at in times:
+                self.assertEqual(func(at), spec.is_filtered(at), (spec, at, func.source))
+
+    it "inlines the allowed values":
+        spec = final.ManyRepeatAndFiltersSpec(specs=[
+              final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours=["3", "4"]), final.FilterSpec.using(hours=["4", "5"], day_names=["sun"])])
+            , final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(minutes=["5"], weeks=["2"])])
+            ])
+        func = predicate.for_spec(spec)
+        self.assertEqual(func.source, "\n".join([
+              "def is_filtered(at):"
+            , "    minute = at.minute"
+            , "    hour = at.hour"
+            , "    if hour in allowed_0 and at.weekday() in allowed_1:"
+            , "        return True"
+            , "    if minute in allowed_2 and gregorian_week(at) in allowed_3:"
+            , "        return True"
+            , "    return False"
+            ]) + "\n")
+        self.assertEqual(func.__globals__["allowed_0"], frozenset([4]))
+        self.assertIs(func(datetime(2016, 1, 3, 4, 30)), True)
+        self.assertIs(func(datetime(2016, 1, 4, 4, 30)), False)
+
+    it "stops at something that always gets through and skips what never does":
+        spec = final.ManyRepeatAndFiltersSpec(specs=[
+              final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours=["3"]), final.FilterSpec.using(hours=["4"])])
+            , final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[])
+            , final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(minutes=["5"])])
+            ])
+        self.assertEqual(predicate.for_spec(spec).source, "def is_filtered(at):\n    return True\n")
+
+    it "is remembered for interned specs":
+        spec = Interner().intern(final.FilterSpec.using(hours=["3"]))
+        func = predicate.for_spec(spec)
+        self.assertIs(predicate.for_spec(spec), func)
+        self.assertIs(func(datetime(2016, 1, 1, 3)), True)
+
+    it "gives the same answers as is_filtered for interned specs":
+        filt = final.FilterSpec.using(hours=["3"])
+        spec = Interner().intern(final.ManyRepeatAndFiltersSpec(specs=[final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[filt])]))
+        func = predicate.for_spec(spec)
+
+        with self.assertRaises(AttributeError):
+            spec.specs[0].filters.append(final.FilterSpec.using(hours=["4"]))
+
+        at = datetime(2016, 1, 1, 3)
+        self.assertIs(predicate.for_spec(spec), func)
+        self.assertIs(func(at), spec.is_filtered(at))
+        self.assertIs(func(at), True)
+
+    it "sees changes to specs that aren't interned":
+        spec = final.FilterSpec.using(hours=["3"])
+        func = predicate.for_spec(spec)
+        self.assertIs(func(datetime(2016, 1, 1, 3)), True)
+
+        spec.hours = [4]
+        changed = predicate.for_spec(spec)
+        self.assertIsNot(changed, func)
+        self.assertIs(changed(datetime(2016, 1, 1, 3)), False)
+        self.assertIs(changed(datetime(2016, 1, 1, 4)), True)
+
+    it "sees changes to filters inside a spec":
+        spec = final.RepeatAndFiltersSpec(repeat=self.repeat, filters=[final.FilterSpec.using(hours=["3", "4"])])
+        self.assertIs(predicate.for_spec(spec)(datetime(2016, 1, 1, 3)), True)
+
+        spec.filters[0].hours = [4]
+        self.assertIs(predicate.for_spec(spec)(datetime(2016, 1, 1, 3)), False)
+
+        spec.filters.append(final.FilterSpec.using(day_names=["sun"]))
+        self.assertIs(predicate.for_spec(spec)(datetime(2016, 1, 1, 4)), False)
+        self.assertIs(predicate.for_spec(spec)(datetime(2016, 1, 3, 4)), True)
+
+    it "uses is_filtered for other specs":
+        spec = self.timepiece.time_spec_to_object("epoch(epoch: 1451649600)")
+        self.assertEqual(predicate.for_spec(spec), spec.is_filtered)
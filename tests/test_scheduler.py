@@ -0,0 +1,125 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.scheduler import Scheduler, NotScheduled, AlreadyScheduled
+from timepiece.spec import make_timepiece
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from datetime import datetime, timedelta
+import mock
+
+describe TestCase, "Scheduler":
+    before_each:
+        self.timepiece = make_timepiece()
+        self.start = datetime.utcfromtimestamp(0)
+
+    def every(self, minutes, start=0):
+        return self.timepiece.time_spec_to_object("between(start: epoch(epoch: {0})) & interval(every: amount(num: {1}, size: minute))".format(start, minutes))
+
+    def minutes(self, *minutes):
+        return [self.start + timedelta(minutes=m) for m in minutes]
+
+    it "says what fires next":
+        scheduler = Scheduler()
+        self.assertIs(scheduler.peek(), None)
+
+        scheduler.add("seven", self.every(7), after=self.start)
+        scheduler.add("five", self.every(5), after=self.start)
+        self.assertEqual(len(scheduler), 2)
+        assert "five" in scheduler
+
+        self.assertEqual(scheduler.peek(), (self.start + timedelta(minutes=5), "five"))
+        self.assertEqual(scheduler.next_time("seven"), self.start + timedelta(minutes=7))
+
+    it "pops everything that is due in order":
+        scheduler = Scheduler()
+        scheduler.add("seven", self.every(7), after=self.start)
+        scheduler.add("five", self.every(5), after=self.start)
+
+        due = scheduler.pop_due(self.start + timedelta(minutes=15))
+        self.assertEqual(due, list(zip(self.minutes(5, 7, 10, 14, 15), ["five", "seven", "five", "seven", "five"])))
+        self.assertEqual(scheduler.pop_due(self.start + timedelta(minutes=15)), [])
+        self.assertEqual(scheduler.peek(), (self.start + timedelta(minutes=20), "five"))
+        self.assertEqual(scheduler.stats["fired"], 5)
+
+    it "leaves what is past the limit for next time":
+        scheduler = Scheduler()
+        scheduler.add("five", self.every(5), after=self.start)
+
+        now = self.start + timedelta(minutes=30)
+        self.assertEqual(scheduler.pop_due(now, limit=2), list(zip(self.minutes(5, 10), ["five"] * 2)))
+        self.assertEqual(len(scheduler.pop_due(now)), 4)
+
+    it "only asks a specification when it next fires after it fires":
+        spec = mock.Mock(name="spec")
+        spec.following.side_effect = lambda at: at + timedelta(minutes=10)
+
+        other = mock.Mock(name="other")
+        other.following.side_effect = lambda at: at + timedelta(minutes=1)
+
+        scheduler = Scheduler()
+        scheduler.add("spec", spec, after=self.start)
+        scheduler.add("other", other, after=self.start)
+
+        scheduler.pop_due(self.start + timedelta(minutes=5))
+        self.assertEqual(spec.following.mock_calls, [mock.call(self.start)])
+        self.assertEqual(len(other.following.mock_calls), 6)
+
+    it "forgets specifications that don't fire again":
+        once = self.timepiece.time_spec_to_object("epoch(epoch: 600)")
+        scheduler = Scheduler()
+        scheduler.add("once", once, after=self.start)
+        scheduler.add("never", self.timepiece.time_spec_to_object("epoch(epoch: 0)"), after=self.start + timedelta(minutes=1))
+
+        self.assertEqual(scheduler.next_time("never"), None)
+        self.assertEqual(scheduler.pop_due(self.start + timedelta(days=1)), [(self.start + timedelta(minutes=10), "once")])
+        self.assertEqual(scheduler.peek(), None)
+        self.assertEqual(len(scheduler), 2)
+
+    it "can remove and update specifications":
+        five = self.every(5)
+        scheduler = Scheduler()
+        scheduler.add("five", five, after=self.start)
+        scheduler.add("seven", self.every(7), after=self.start)
+
+        self.assertIs(scheduler.remove("five"), five)
+        assert "five" not in scheduler
+        self.assertEqual(scheduler.peek(), (self.start + timedelta(minutes=7), "seven"))
+
+        scheduler.update("seven", self.every(3), after=self.start)
+        self.assertEqual(scheduler.pop_due(self.start + timedelta(minutes=7)), list(zip(self.minutes(3, 6), ["seven"] * 2)))
+
+    it "complains about ids it doesn't know or already has":
+        scheduler = Scheduler()
+        scheduler.add("five", self.every(5), after=self.start)
+
+        with self.fuzzyAssertRaisesError(AlreadyScheduled, ident="five"):
+            scheduler.add("five", self.every(5))
+
+        for action in (scheduler.remove, scheduler.next_time, lambda ident: scheduler.update(ident, self.every(1))):
+            with self.fuzzyAssertRaisesError(NotScheduled, ident="nope"):
+                action("nope")
+
+    it "throws away removed entries when there are more of them than live ones":
+        scheduler = Scheduler()
+        for index in range(10):
+            scheduler.add(index, self.every(index + 1), after=self.start)
+
+        for index in range(5):
+            scheduler.update(index, self.every(60), after=self.start)
+        self.assertEqual(scheduler.stats["heap"], 15)
+
+        # The third remove leaves 8 removed entries and 7 live ones
+        for index in range(5, 8):
+            scheduler.remove(index)
+        self.assertEqual(scheduler.stats["heap"], 7)
+        self.assertEqual(scheduler.stats["stale"], 0)
+
+        for index in range(8, 10):
+            scheduler.remove(index)
+        self.assertEqual(scheduler.stats["heap"], 7)
+        self.assertEqual(scheduler.stats["stale"], 2)
+
+        due = scheduler.pop_due(self.start + timedelta(hours=1))
+        self.assertEqual(due, [(self.start + timedelta(hours=1), index) for index in range(5)])
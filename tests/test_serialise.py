@@ -0,0 +1,97 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.serialise import dumps, loads, SerialiseError, DeserialiseError, HEADER, VERSION
+from timepiece.sections import final
+from timepiece.spec import make_timepiece
+
+from input_algorithms import spec_base as sb
+from dateutil.relativedelta import relativedelta
+from datetime import datetime, timedelta, timezone
+
+describe TestCase, "serialise":
+    def assertRoundTrip(self, obj):
+        dumped = dumps(obj)
+        loaded = loads(dumped)
+        self.assertIs(type(loaded), type(obj))
+        self.assertEqual(loaded, obj)
+        self.assertEqual(dumps(loaded), dumped)
+        return loaded
+
+    it "round trips parsed specifications":
+        grammar = make_timepiece()
+        for spec in (
+              "between(start: epoch(epoch: 0), end: epoch(epoch: 100)) & (interval(every: amount(num: 1, size: hour)) | interval(every: amount(num: 2, size: minute)))"
+            , "between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & interval(every: iso8601(type: duration, specification: P1Y2M3DT4H5M6.5S))"
+            , "between(start: epoch(epoch: 0), end: epoch(epoch: 1000)) & day_name(name: mon;tues)"
+            , "between(start: sunset(), end: epoch(epoch: 1000))"
+            , "iso8601(type: date, specification: 2016-01-01)"
+            , "interval(every: amount(num: 3, size: day))"
+            ):
+            self.assertRoundTrip(grammar.time_spec_to_object(spec, validate=False))
+
+    it "round trips filters and datetimes":
+        self.assertRoundTrip(final.FilterSpec.using(minutes="1;2", day_names="mon"))
+        self.assertRoundTrip(final.DateTimeSpec.contain(datetime(2016, 2, 29, 23, 59, 58, 123456)))
+
+        aware = datetime(2016, 1, 1, 10, 30, tzinfo=timezone(timedelta(hours=-5, minutes=-30)))
+        loaded = self.assertRoundTrip(final.DateTimeSpec.contain(aware))
+        self.assertEqual(loaded.datetime.utcoffset(), timedelta(hours=-5, minutes=-30))
+
+    it "round trips values that aren't specifications":
+        for val in (None, sb.NotSpecified, True, False, 0, -1, 2 ** 40, -2 ** 40, 1.5, "", "héllo", [1, [None, "a"]], relativedelta(years=1, seconds=6.5)):
+            self.assertEqual(loads(dumps(val)), val)
+
+    it "makes objects that still work":
+        grammar = make_timepiece()
+        obj = grammar.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 100000)) & interval(every: amount(num: 1, size: hour))")
+        loaded = loads(dumps(obj))
+        at = datetime.fromtimestamp(5000)
+        self.assertEqual(loaded.following(at), obj.following(at))
+        self.assertEqual(loaded.specifies, ("repeat", "duration"))
+
+    it "is smaller than the specification":
+        spec = "between(start: epoch(epoch: 0), end: epoch(epoch: 100)) & interval(every: amount(num: 1, size: hour))"
+        self.assertLess(len(dumps(make_timepiece().time_spec_to_object(spec))), len(spec) / 2)
+
+    it "loads data from version 1":
+        grammar = make_timepiece()
+        obj = grammar.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 100000)) & interval(every: amount(num: 1, size: hour))")
+        self.assertEqual(dumps(loads(HEADER + bytes([1]) + dumps(obj)[3:])), dumps(obj))
+
+        # Sunrise and sunset didn't have a latitude or longitude in version 1
+        obj = grammar.time_spec_to_object("between(start: sunrise(), end: epoch(epoch: 1000))", validate=False)
+        loaded = loads(HEADER + bytes([1, 34]) + dumps(obj.end)[3:] + bytes([0, 40]))
+        self.assertEqual(loaded, obj)
+        self.assertIs(loaded.start.latitude, None)
+
+    it "complains about things it can't serialise":
+        with self.fuzzyAssertRaisesError(SerialiseError, "Don't know how to serialise this kind of object", got=dict):
+            dumps({})
+
+        with self.fuzzyAssertRaisesError(SerialiseError, "Integer is too large to serialise"):
+            dumps(2 ** 64)
+
+        with self.fuzzyAssertRaisesError(SerialiseError, "Can only serialise relative relativedeltas"):
+            dumps(relativedelta(year=2016))
+
+    it "complains about bad data":
+        with self.fuzzyAssertRaisesError(DeserialiseError, "Data isn't a serialised specification"):
+            loads(b"nope")
+
+        with self.fuzzyAssertRaisesError(DeserialiseError, "Unknown version", got=VERSION + 1, supported=[1, 2]):
+            loads(HEADER + bytes([VERSION + 1, 0]))
+
+        with self.fuzzyAssertRaisesError(DeserialiseError, "Unknown tag", tag=20, position=3):
+            loads(HEADER + bytes([VERSION, 20]))
+
+        with self.fuzzyAssertRaisesError(DeserialiseError, "Unknown specification", tag=200, position=3):
+            loads(HEADER + bytes([VERSION, 200]))
+
+        for truncated in (b"", bytes([VERSION]), bytes([VERSION, 4, 1]), bytes([VERSION, 2, 0x80]), bytes([VERSION, 3, 5, 97]), bytes([VERSION, 8, 0])):
+            with self.fuzzyAssertRaisesError(DeserialiseError, "Ran out of data"):
+                loads(HEADER + truncated)
+
+        with self.fuzzyAssertRaisesError(DeserialiseError, "Found extra data after the specification", position=4, length=5):
+            loads(dumps(None) + b"\x00")
@@ -3,8 +3,10 @@
 from tests.helpers import TestCase
 
 from timepiece.sizing import common_size, convert_amount, valid_sizes, Sizes
+from timepiece import clock
 
 from input_algorithms.errors import BadSpecValue
+from datetime import datetime
 import mock
 
 describe TestCase, "valid_sizes":
@@ -55,3 +57,62 @@ describe TestCase, "convert_amount":
     it "works with seconds to hours":
         self.assertAlmostEqual(convert_amount(Sizes.SECOND.value, Sizes.HOUR.value, 28795), 7.998611111)
 
+
+    it "gives the same as it always has for fixed sizes":
+        # These were worked out by adding relativedeltas to the time now
+        examples = [
+              (Sizes.SECOND.value, Sizes.SECOND.value, 59, 59)
+            , (Sizes.SECOND.value, Sizes.WEEK.value, 302400, 0.5)
+            , (Sizes.MINUTE.value, Sizes.SECOND.value, 90, 5400)
+            , (Sizes.HOUR.value, Sizes.MINUTE.value, 5, 300.0)
+            , (Sizes.HOUR.value, Sizes.DAY.value, 36, 1.5)
+            , (Sizes.DAY.value, Sizes.SECOND.value, 20, 1728000)
+            , (Sizes.DAY.value, Sizes.HOUR.value, 3, 72.0)
+            , (Sizes.WEEK.value, Sizes.DAY.value, 3, 21.0)
+            , (Sizes.WEEK.value, Sizes.MINUTE.value, 2, 20160.0)
+            ]
+        for old_size, new_size, num, expected in examples:
+            found = convert_amount(old_size, new_size, num)
+            self.assertEqual(found, expected)
+            self.assertIs(type(found), type(expected))
+
+    it "keeps counting multiples of 52 weeks as years":
+        for weeks, years in [(0, 0), (51, 0), (52, 1), (53, 1), (104, 2), (105, 2), (156, 3), (364, 6), (365, 6)]:
+            self.assertEqual(convert_amount(Sizes.WEEK.value, Sizes.YEAR.value, weeks), years)
+
+    it "keeps counting 365 days as a year":
+        for days, years in [(0, 0), (364, 0), (365, 1), (729, 1), (730, 2), (1825, 5), (1826, 5), (3650, 10)]:
+            self.assertEqual(convert_amount(Sizes.DAY.value, Sizes.YEAR.value, days), years)
+
+    it "counts 365 days as a year for the other fixed sizes too":
+        day = 24 * 60 * 60
+        for size, per_day in [(Sizes.SECOND.value, day), (Sizes.MINUTE.value, day // 60), (Sizes.HOUR.value, 24)]:
+            for days, years in [(364, 0), (365, 1), (729, 1), (730, 2), (1826, 5)]:
+                self.assertEqual(convert_amount(size, Sizes.YEAR.value, days * per_day), years)
+                self.assertEqual(convert_amount(size, Sizes.YEAR.value, days * per_day - 1), years - 1 if days % 365 == 0 else years)
+
+        self.assertEqual(convert_amount(Sizes.HOUR.value, Sizes.YEAR.value, 8760), 1)
+        self.assertEqual(convert_amount(Sizes.MINUTE.value, Sizes.YEAR.value, 525600), 1)
+        self.assertEqual(convert_amount(Sizes.SECOND.value, Sizes.YEAR.value, 31536000), 1)
+
+    it "converts between months and years":
+        self.assertEqual(convert_amount(Sizes.YEAR.value, Sizes.MONTH.value, 2), 24)
+        self.assertEqual(convert_amount(Sizes.MONTH.value, Sizes.YEAR.value, 23), 1)
+        self.assertEqual(convert_amount(Sizes.MONTH.value, Sizes.YEAR.value, 24), 2)
+        self.assertEqual(convert_amount(Sizes.MONTH.value, Sizes.MONTH.value, 14), 14)
+
+    it "uses the average month and year for the fixed sizes":
+        self.assertEqual(convert_amount(Sizes.MONTH.value, Sizes.SECOND.value, 1), 2629746)
+        self.assertEqual(convert_amount(Sizes.YEAR.value, Sizes.DAY.value, 4), 1460.97)
+        self.assertEqual([convert_amount(Sizes.DAY.value, Sizes.MONTH.value, n) for n in (30, 31, 60, 61)], [0, 1, 1, 2])
+        self.assertEqual([convert_amount(Sizes.DAY.value, Sizes.YEAR.value, n) for n in (364, 365, 366, 730, 731, 1461)], [0, 1, 1, 2, 2, 4])
+
+    it "doesn't depend on the time now":
+        for now in (datetime(2015, 2, 1), datetime(2016, 1, 31), datetime(2016, 7, 15)):
+            with clock.using(clock.FrozenClock(now)):
+                self.assertEqual(convert_amount(Sizes.DAY.value, Sizes.MONTH.value, 29), 0)
+                self.assertEqual(convert_amount(Sizes.DAY.value, Sizes.SECOND.value, 60), 5184000)
+
+    it "complains about sizes it doesn't know":
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Sorry, can't convert amount", have="fortnight", want="day"):
+            convert_amount("fortnight", Sizes.DAY.value, 1)
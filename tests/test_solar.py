@@ -0,0 +1,168 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.helpers import optional_module
+from timepiece.spec import make_timepiece
+from timepiece import solar, clock
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from input_algorithms.errors import BadSpecValue
+
+from datetime import datetime, date, timedelta, timezone
+from unittest import SkipTest
+import mock
+
+numpy = optional_module("numpy")
+
+london = (51.5074, -0.1278)
+sydney = (-33.8688, 151.2093)
+longyearbyen = (78.2232, 15.6267)
+
+def skip_without_numpy():
+    if numpy is None:
+        raise SkipTest("numpy isn't installed")
+
+describe TestCase, "solar":
+    before_each:
+        solar.cache.clear()
+
+    def assertClose(self, found, expected, minutes=2):
+        self.assertIsNotNone(found)
+        self.assertLess(abs(found - expected), timedelta(minutes=minutes), (found, expected))
+
+    it "knows when the sun rises and sets":
+        self.assertClose(solar.sunrise(date(2016, 6, 21), *london), datetime(2016, 6, 21, 3, 43))
+        self.assertClose(solar.sunset(date(2016, 6, 21), *london), datetime(2016, 6, 21, 20, 21))
+        self.assertClose(solar.sunrise(date(2016, 12, 21), *london), datetime(2016, 12, 21, 8, 4))
+        self.assertClose(solar.sunset(date(2016, 12, 21), *london), datetime(2016, 12, 21, 15, 54))
+
+    it "gives times on the utc day before for places far to the east":
+        self.assertClose(solar.sunrise(date(2016, 12, 21), *sydney), datetime(2016, 12, 20, 18, 41))
+        self.assertClose(solar.sunset(date(2016, 12, 21), *sydney), datetime(2016, 12, 21, 9, 5))
+
+    it "gives None when the sun doesn't rise or set":
+        self.assertIs(solar.sunrise(date(2016, 6, 21), *longyearbyen), None)
+        self.assertIs(solar.sunset(date(2016, 12, 21), *longyearbyen), None)
+        self.assertIs(solar.sunrise(date(2016, 6, 21), 90, 0), None)
+
+    it "remembers each day and location":
+        with mock.patch.object(solar, "event_minutes", wraps=solar.event_minutes) as event_minutes:
+            first = solar.sunrise(date(2016, 6, 21), *london)
+            self.assertIs(solar.sunrise(date(2016, 6, 21), *london), first)
+            self.assertEqual(len(event_minutes.mock_calls), 1)
+
+            solar.sunrise(date(2016, 6, 22), *london)
+            solar.sunrise(date(2016, 6, 21), *sydney)
+            solar.sunset(date(2016, 6, 21), *london)
+            self.assertEqual(len(event_minutes.mock_calls), 4)
+
+        self.assertEqual(solar.cache[("sunrise", date(2016, 6, 21), london[0], london[1])], first)
+
+    it "empties the cache when it gets too big":
+        with mock.patch.object(solar, "max_cached", 3):
+            for day in range(1, 5):
+                solar.sunrise(date(2016, 6, day), *london)
+            self.assertEqual(list(solar.cache), [("sunrise", date(2016, 6, 4), london[0], london[1])])
+
+    it "finds the next and previous times":
+        rise = solar.sunrise(date(2016, 6, 21), *london)
+        self.assertEqual(solar.following("sunrise", rise - timedelta(seconds=1), *london), rise)
+        self.assertEqual(solar.following("sunrise", rise, *london), solar.sunrise(date(2016, 6, 22), *london))
+        self.assertEqual(solar.preceding("sunrise", rise, *london), rise)
+        self.assertEqual(solar.preceding("sunrise", rise - timedelta(seconds=1), *london), solar.sunrise(date(2016, 6, 20), *london))
+
+        rise = solar.sunrise(date(2016, 12, 21), *sydney)
+        self.assertEqual(solar.following("sunrise", datetime(2016, 12, 20, 12), *sydney), rise)
+
+    it "skips days without the event":
+        after = solar.following("sunrise", datetime(2016, 6, 21), *longyearbyen)
+        self.assertEqual(after.date(), date(2016, 8, 25))
+        self.assertIs(solar.sunrise(after.date() - timedelta(days=1), *longyearbyen), None)
+
+    it "gives times in utc for datetimes with a timezone":
+        rise = solar.sunrise(date(2016, 6, 21), *london)
+        at = datetime(2016, 6, 21, 1, tzinfo=timezone(timedelta(hours=1)))
+        self.assertEqual(solar.following("sunrise", at, *london), rise.replace(tzinfo=timezone.utc))
+
+    it "gives the same whole year with and without numpy":
+        skip_without_numpy()
+        for location in (london, sydney, longyearbyen, (64.5, 179.9), (-70.1, -170.3)):
+            for event in solar.events:
+                found = solar.year_of(event, 2016, *location)
+                self.assertEqual(len(found), 366)
+
+                remembered = [solar.cache[(event, date(2016, 1, 1) + timedelta(days=offset), location[0], location[1])] for offset in range(366)]
+                solar.cache.clear()
+                expected = [solar.event_on(event, date(2016, 1, 1) + timedelta(days=offset), *location) for offset in range(366)]
+
+                self.assertEqual(found.tolist(), expected)
+                self.assertEqual(remembered, expected)
+
+    it "gives a whole year as a list without numpy":
+        with mock.patch("timepiece.solar.optional_module", lambda name: None):
+            found = solar.year_of("sunset", 2015, *london)
+        self.assertEqual(len(found), 365)
+        self.assertEqual(found[0], solar.sunset(date(2015, 1, 1), *london))
+
+describe TestCase, "SunRiseSpec and SunSetSpec":
+    before_each:
+        solar.cache.clear()
+        self.timepiece = make_timepiece()
+        self.sunrise = self.timepiece.time_spec_to_object("sunrise(latitude: 51.5074, longitude: -0.1278)")
+        self.sunset = self.timepiece.time_spec_to_object("sunset(latitude: -33.8688, longitude: 151.2093)")
+
+    it "follows each day":
+        at = datetime(2016, 6, 21)
+        self.assertEqual(self.sunrise.following(at), solar.sunrise(at.date(), *london))
+        self.assertEqual(self.sunset.following(at), solar.sunset(at.date(), *sydney))
+
+        found = list(self.sunrise.occurrences(at, datetime(2016, 6, 30)))
+        self.assertEqual(found, [solar.sunrise(date(2016, 6, day), *london) for day in range(21, 30)])
+        self.assertEqual(len(list(self.sunrise.occurrences(at, limit=3))), 3)
+
+    it "is filtered just after the event":
+        rise = solar.sunrise(date(2016, 6, 21), *london)
+        self.assertEqual(self.sunrise.is_filtered(rise), True)
+        self.assertEqual(self.sunrise.is_filtered(rise + timedelta(seconds=29)), True)
+        self.assertEqual(self.sunrise.is_filtered(rise + timedelta(seconds=30)), False)
+        self.assertEqual(self.sunrise.is_filtered(rise - timedelta(seconds=1)), False)
+
+    it "starts today":
+        with clock.using(clock.FrozenClock(datetime(2016, 6, 21, 10))):
+            self.assertEqual(self.sunrise.datetime, solar.sunrise(date(2016, 6, 21), *london))
+
+    it "can start a repeat":
+        spec = self.timepiece.time_spec_to_object("between(start: sunrise(latitude: 51.5074, longitude: -0.1278)) & interval(every: amount(num: 1, size: hour))")
+        start = spec.start.datetime
+        self.assertEqual(spec.following(start), start + timedelta(hours=1))
+
+    it "makes arrays of occurrences":
+        skip_without_numpy()
+        start = datetime(2016, 1, 1)
+        end = datetime(2017, 1, 1)
+        for spec in (self.sunrise, self.sunset):
+            found = spec.occurrences_array(start, end)
+            self.assertEqual(found.tolist(), list(spec.occurrences(start, end)))
+
+    it "complains without a location":
+        for spec in ("sunrise()", "sunset(latitude: 51.5074)", "between(start: sunrise(longitude: -0.1278)) & interval(every: amount(num: 1, size: hour))"):
+            with self.fuzzyAssertRaisesError(BadSpecValue, "Need a latitude and longitude.+"):
+                self.timepiece.time_spec_to_object(spec)
+
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Need a latitude and longitude.+"):
+            make_timepiece(parser="descent").time_spec_to_object("sunrise()")
+
+        spec = self.timepiece.time_spec_to_object("sunrise()", validate=False)
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Need a latitude and longitude.+"):
+            spec.following(datetime(2016, 1, 1))
+
+    it "doesn't complain about joined or nested specs without a location when not validating":
+        for parser in ("parsimonious", "descent"):
+            timepiece = make_timepiece(parser=parser)
+            joined = timepiece.time_spec_to_object("(between(start: sunrise()) & interval(every: amount(num: 1, size: hour))) | (between(start: sunset()) & interval(every: amount(num: 1, size: hour)))", validate=False)
+            self.assertEqual(len(joined.specs), 2)
+
+            nested = timepiece.time_spec_to_object("between(start: sunrise(), end: sunset()) & interval(every: amount(num: 1, size: hour))", validate=False)
+            with self.fuzzyAssertRaisesError(BadSpecValue, "Need a latitude and longitude.+"):
+                nested.following(datetime(2016, 1, 1))
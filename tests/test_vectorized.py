@@ -0,0 +1,169 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+from timepiece.sections.final import gregorian_week
+from timepiece.helpers import optional_module
+from timepiece.spec import make_timepiece
+from timepiece.sections import sections, final
+from timepiece import vectorized
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+
+from datetime import datetime, timedelta, timezone
+from unittest import SkipTest
+from array import array
+import mock
+
+numpy = optional_module("numpy")
+
+def make_specs(timepiece):
+    repeat1 = timepiece.time_spec_to_object("between(start: epoch(epoch: 0), end: epoch(epoch: 2000000000)) & interval(every: amount(num: 7, size: minute))")
+    repeat2 = timepiece.time_spec_to_object("between(start: epoch(epoch: 1000000000)) & interval(every: amount(num: 1, size: day))")
+
+    return [
+          final.FilterSpec.using(minutes="0;15;30", hours="9;17")
+        , final.FilterSpec.using(day_names="mon;wed;sat", months="2;7;12")
+        , final.FilterSpec.using(weeks="0;1;2;52;53", day_numbers="1;59;60;366")
+        , repeat1
+        , final.RepeatAndFiltersSpec(repeat=repeat1, filters=[final.FilterSpec.using(hours="3;4")])
+        , final.ManyRepeatAndFiltersSpec(specs=[
+              final.RepeatAndFiltersSpec(repeat=repeat2, filters=[final.FilterSpec.using(minutes="5")])
+            , final.RepeatAndFiltersSpec(repeat=repeat1, filters=[final.FilterSpec.using(day_names="sun")])
+            ])
+        , timepiece.time_spec_to_object("(between(start: epoch(epoch: 0), end: epoch(epoch: 1500000000)) & interval(every: amount(num: 1, size: hour))) & day_name(name: sun)")
+        , timepiece.time_spec_to_object("epoch(epoch: 1000000000)")
+        ]
+
+def skip_without_numpy():
+    if numpy is None:
+        raise SkipTest("numpy isn't installed")
+
+def lots_of_times():
+    start = datetime(1969, 12, 1)
+    return [start + timedelta(days=d * 3, hours=d % 24, minutes=d * 7 % 60, seconds=d % 50) for d in range(0, 365 * 20)] + [datetime.fromtimestamp(1000000000) + timedelta(seconds=s) for s in range(0, 40, 5)]
+
+describe TestCase, "vectorized with numpy":
+    before_each:
+        skip_without_numpy()
+        self.timepiece = make_timepiece()
+        self.times = lots_of_times()
+
+    it "works out the same fields as the datetimes":
+        times = [datetime(1899, 12, 25) + timedelta(days=d, hours=d % 24, minutes=d % 60) for d in range(0, 366 * 202)]
+        fields = vectorized.fields(times)
+
+        tuples = [t.timetuple() for t in times]
+        self.assertEqual(fields.get("minute").tolist(), [t.tm_min for t in tuples])
+        self.assertEqual(fields.get("hour").tolist(), [t.tm_hour for t in tuples])
+        self.assertEqual(fields.get("month").tolist(), [t.tm_mon for t in tuples])
+        self.assertEqual(fields.get("weekday").tolist(), [t.tm_wday for t in tuples])
+        self.assertEqual(fields.get("day_of_year").tolist(), [t.tm_yday for t in tuples])
+        self.assertEqual(fields.get("week").tolist(), [gregorian_week(t) for t in times])
+
+    it "gives the same answers as is_filtered for each time":
+        array = numpy.array(self.times, dtype="datetime64[s]")
+        for obj in make_specs(self.timepiece):
+            found = obj.is_filtered_many(array)
+            self.assertEqual(found.dtype, numpy.bool_)
+            self.assertEqual(found.tolist(), [obj.is_filtered(t) for t in self.times], obj)
+
+    it "doesn't call is_filtered for each time for the specs we know about":
+        array = numpy.array(self.times, dtype="datetime64[us]")
+        with mock.patch.object(vectorized.Fields, "each", side_effect=AssertionError("Shouldn't call each")):
+            for obj in make_specs(self.timepiece):
+                obj.is_filtered_many(array)
+
+    it "takes lists of datetimes":
+        obj = make_specs(self.timepiece)[0]
+        found = obj.is_filtered_many(self.times)
+        self.assertEqual(found.tolist(), [obj.is_filtered(t) for t in self.times])
+
+    it "shares the fields between filters":
+        obj = make_specs(self.timepiece)[5]
+        fields = vectorized.fields(self.times)
+        obj.is_filtered_many(fields)
+        self.assertEqual(sorted(fields.found), ["days", "minute", "weekday"])
+
+    it "calls is_filtered for specs that don't know how to use the array":
+        spec = final.RepeatAndFiltersSpec(repeat=None, filters=[mock.Mock(name="filter", spec=["is_filtered", "filtered_fields"])])
+        spec.filters[0].filtered_fields.side_effect = lambda fields: fields.each(lambda t: t.minute == 3)
+        times = [datetime(2000, 1, 1, 1, m) for m in range(5)]
+        self.assertEqual(spec.is_filtered_many(times).tolist(), [False, False, False, True, False])
+
+    it "uses is_filtered for times with a timezone":
+        obj = make_specs(self.timepiece)[0]
+        times = [datetime(2000, 1, 1, 9, 15, tzinfo=timezone(timedelta(hours=10)))]
+        self.assertEqual(obj.is_filtered_many(times), [True])
+
+describe TestCase, "occurrences_array with numpy":
+    before_each:
+        skip_without_numpy()
+        self.timepiece = make_timepiece()
+
+        repeat = "between(start: epoch(epoch: 1000000000), end: epoch(epoch: 1100000000)) & (interval(every: amount(num: 7, size: minute)) | interval(every: amount(num: 1, size: hour)) | interval(every: amount(num: 5, size: minute)))"
+        calendar = "between(start: epoch(epoch: 1000000000)) & (interval(every: amount(num: 1, size: month)) | interval(every: amount(num: 3, size: day)))"
+        minutely = "between(start: epoch(epoch: 1000000000)) & interval(every: amount(num: 1, size: minute))"
+
+        self.specs = [self.timepiece.time_spec_to_object(repeat), self.timepiece.time_spec_to_object(calendar)]
+        self.specs.append(final.RepeatAndFiltersSpec(repeat=self.timepiece.time_spec_to_object(minutely), filters=[final.FilterSpec.using(hours="9;17", day_names="mon")]))
+        self.specs.append(final.ManyRepeatAndFiltersSpec(specs=[self.specs[2], final.RepeatAndFiltersSpec(repeat=self.specs[0], filters=[])]))
+
+        self.windows = [
+              (datetime(2001, 10, 1), datetime(2002, 1, 1))
+            , (datetime(1990, 1, 1), datetime(2001, 9, 20, 1, 47))
+            , (datetime(2001, 9, 9, 1, 46, 40), datetime(2001, 9, 9, 5, 0, 0, 500))
+            , (datetime(2003, 6, 1, 0, 0, 1), datetime(2003, 6, 30, 23, 59, 59))
+            , (datetime(2010, 1, 1), datetime(2010, 2, 1))
+            ]
+
+    it "gives the same times as occurrences":
+        for obj in self.specs:
+            for start, end in self.windows:
+                found = obj.occurrences_array(start, end)
+                self.assertEqual(found.dtype, numpy.dtype("datetime64[us]"))
+                self.assertEqual(found.astype(datetime).tolist(), list(obj.occurrences(start, end)), (type(obj).__name__, start, end))
+
+    it "makes fixed size intervals without stepping through them":
+        start = datetime(2000, 1, 1, 0, 0, 0, 250)
+        for size in ("second", "minute", "hour", "day", "week"):
+            for num in (1, 7, 45):
+                amount = sections.AmountSpec(num=num, size=size)
+                for at, end in [(start, datetime(2000, 1, 1, 5)), (datetime(2000, 1, 5, 3, 2, 1, 999999), datetime(2000, 1, 5, 9, 0, 0, 100)), (datetime(1999, 1, 1), datetime(2001, 1, 1))]:
+                    with mock.patch.object(sections.AmountSpec, "interval", side_effect=AssertionError("Shouldn't step")):
+                        found = amount.interval_array(numpy, start, at, end).astype(datetime).tolist()
+                    self.assertEqual(found, list(amount.interval(start, at, end)), (num, size, at, end))
+
+    it "gives times with a timezone in UTC":
+        tz = timezone(timedelta(hours=10))
+        every = final.IntervalsSpec.contain(sections.IntervalSpec(every=sections.AmountSpec(num=20, size="minute")))
+        obj = final.RepeatSpec.using(start=final.DateTimeSpec.contain(datetime(2001, 1, 1, tzinfo=tz)), every=every)
+
+        start = datetime(2001, 10, 1, tzinfo=tz)
+        end = datetime(2001, 10, 2, tzinfo=tz)
+        found = obj.occurrences_array(start, end).astype(datetime).tolist()
+
+        self.assertEqual(len(found), 72)
+        self.assertEqual(found[0], datetime(2001, 9, 30, 14, 20))
+        self.assertEqual(found, [t.astimezone(timezone.utc).replace(tzinfo=None) for t in obj.occurrences(start, end)])
+
+describe TestCase, "vectorized without numpy":
+    before_each:
+        self.timepiece = make_timepiece()
+        self.times = lots_of_times()
+
+    it "calls is_filtered on each time":
+        with mock.patch("timepiece.vectorized.optional_module", return_value=None):
+            for obj in make_specs(self.timepiece):
+                self.assertEqual(obj.is_filtered_many(self.times), [obj.is_filtered(t) for t in self.times], obj)
+
+    it "gives an array of seconds since the epoch for occurrences_array":
+        obj = self.timepiece.time_spec_to_object("between(start: epoch(epoch: 1000000000)) & interval(every: amount(num: 30, size: minute))")
+        start = datetime(2010, 1, 1)
+        end = datetime(2010, 1, 2)
+        with mock.patch("timepiece.vectorized.optional_module", return_value=None):
+            found = obj.occurrences_array(start, end)
+
+        self.assertIsInstance(found, array)
+        self.assertEqual(found.typecode, "q")
+        self.assertEqual([datetime.utcfromtimestamp(t) for t in found], list(obj.occurrences(start, end)))
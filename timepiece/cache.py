@@ -0,0 +1,63 @@
+from collections import OrderedDict
+import threading
+
+class SpecCache(object):
+    """
+    A size bounded, least recently used cache of parsed specifications.
+
+    Keys are whatever the grammar gives us (the whitespace stripped
+    specification) and values are the objects that were made from them.
+
+    We keep count of ``hits``, ``misses`` and ``evictions`` so that it's
+    possible to tell if the cache is sized appropriately.
+    """
+    def __init__(self, maxsize):
+        if maxsize < 1:
+            raise ValueError("Cache must be able to hold at least one item, got maxsize={0}".format(maxsize))
+        self.maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries), "maxsize": self.maxsize}
+
+    def get(self, key):
+        """Return (found, value) for this key and mark it as recently used"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return False, None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return True, self.entries[key]
+
+    def put(self, key, value):
+        """Add this value to the cache, evicting the least recently used entries if we are full"""
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """Forget these keys, or everything if no keys are given"""
+        with self.lock:
+            if not keys:
+                self.entries.clear()
+            else:
+                for key in keys:
+                    self.entries.pop(key, None)
@@ -0,0 +1,64 @@
+"""
+The ``timepiece`` console script
+
+``timepiece check <file>`` parses every row in a file of specifications and
+prints ``<id><TAB>ok`` or ``<id><TAB>error<TAB><error>`` for each row, followed
+by counts of what it found on stderr. Use ``-`` to read from stdin.
+"""
+from timepiece.loader import load, formats, LoadStats
+from timepiece.spec import make_timepiece, parsers
+
+import argparse
+import sys
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Parse files of timepiece specifications")
+    commands = parser.add_subparsers(dest="command")
+
+    check = commands.add_parser("check", help="Parse every row in a file and report errors")
+    check.add_argument("filename", help="The file to read, or - for stdin")
+    check.add_argument("--format", choices=formats, default="lines", help="lines is <id><TAB><spec> and jsonl is {\"id\": ..., \"spec\": ...}")
+    check.add_argument("--parser", choices=sorted(parsers), default="parsimonious")
+    check.add_argument("--workers", type=int, default=None, help="Parse on this many processes")
+    check.add_argument("--cache-size", type=int, default=None, help="Remember this many parsed specifications")
+    check.add_argument("--errors-only", action="store_true", help="Only print rows that failed")
+    check.add_argument("--progress", type=int, default=0, help="Print counts to stderr every this many rows")
+    return parser
+
+def check(args, out, err):
+    timepiece = make_timepiece(parser=args.parser, cache_size=args.cache_size)
+    stats = LoadStats()
+
+    def report():
+        err.write("rows={rows} parsed={parsed} errors={errors} bad_rows={bad_rows} elapsed={elapsed:.2f}s per_second={per_second:.0f}\n".format(**stats.as_dict()))
+
+    fle = sys.stdin if args.filename == "-" else open(args.filename)
+    try:
+        for ident, res in load(fle, timepiece=timepiece, format=args.format, stats=stats, workers=args.workers):
+            if isinstance(res, Exception):
+                out.write("{0}\terror\t{1}\n".format(ident, str(res).replace("\n", " ").replace("\t", " ")))
+            elif not args.errors_only:
+                out.write("{0}\tok\n".format(ident))
+
+            if args.progress and stats.rows % args.progress == 0:
+                report()
+    finally:
+        if fle is not sys.stdin:
+            fle.close()
+
+    report()
+    return 1 if stats.errors or stats.bad_rows else 0
+
+def main(argv=None, out=None, err=None):
+    args = make_parser().parse_args(argv)
+    out = out or sys.stdout
+    err = err or sys.stderr
+
+    if args.command == "check":
+        return check(args, out, err)
+
+    make_parser().print_help(err)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
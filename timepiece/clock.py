@@ -0,0 +1,97 @@
+"""
+Where timepiece gets the time from when it needs to know what time it is now.
+
+Things like ``now()``, ``following()`` without a time and converting months
+to seconds ask ``clock.now()``, which asks the clock for this thread. That is
+the system clock unless something else is being used:
+
+.. code-block:: python
+
+    from timepiece import clock
+
+    with clock.using(clock.FrozenClock(datetime(2016, 1, 1))):
+        obj = timepiece.time_spec_to_object("between(start: now()) & interval(every: amount(num: 1, size: day))")
+        obj.following()
+
+``time_spec_to_object`` and ``parse_many`` take a ``clock`` and ``parse_many``
+takes one snapshot of it for all the specifications it parses, so they all
+agree on when now is.
+
+All times are UTC without a timezone, like ``datetime.utcnow()``.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import threading
+import time
+
+class SystemClock(object):
+    """The real time"""
+    def now(self):
+        return datetime.utcnow()
+
+    def __repr__(self):
+        return "<SystemClock>"
+
+class FrozenClock(object):
+    """Always the same time until it's moved with ``set`` or ``advance``"""
+    def __init__(self, at):
+        self.at = at
+
+    def now(self):
+        return self.at
+
+    def set(self, at):
+        self.at = at
+
+    def advance(self, delta=None, **kwargs):
+        """Move forward by a timedelta or the timedelta made from kwargs"""
+        self.at += delta if delta is not None else timedelta(**kwargs)
+
+    def __repr__(self):
+        return "<FrozenClock {0}>".format(self.at)
+
+class FastForwardClock(object):
+    """
+    Time that starts at ``start`` and goes ``speed`` times faster than real
+    time, so a year goes by in a few seconds with a big enough speed
+    """
+    def __init__(self, start, speed, monotonic=time.monotonic):
+        self.start = start
+        self.speed = speed
+        self.monotonic = monotonic
+        self.started = monotonic()
+
+    def now(self):
+        return self.start + timedelta(seconds=(self.monotonic() - self.started) * self.speed)
+
+    def __repr__(self):
+        return "<FastForwardClock {0} x{1}>".format(self.start, self.speed)
+
+system = SystemClock()
+
+local = threading.local()
+
+def current():
+    """Return the clock for this thread"""
+    return getattr(local, "clock", system)
+
+def now():
+    """Return the time now according to the clock for this thread"""
+    return current().now()
+
+def snapshot(clock=None):
+    """Return a FrozenClock at what this clock, or the current one, says now is"""
+    return FrozenClock((clock or current()).now())
+
+@contextmanager
+def using(clock):
+    """Use this clock in this thread until the block is done"""
+    previous = getattr(local, "clock", None)
+    local.clock = clock
+    try:
+        yield clock
+    finally:
+        if previous is None:
+            del local.clock
+        else:
+            local.clock = previous
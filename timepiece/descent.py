@@ -0,0 +1,168 @@
+"""
+A hand written recursive descent parser for time specifications.
+
+It understands exactly the same language as the parsimonious grammar in
+``timepiece.grammar`` but avoids creating a tree of parsimonious nodes and
+walking it with a generic visitor.
+
+Parsing happens in two steps:
+
+* We tokenize the specification and turn it into nested tuples. Sections are
+  ``(name, [(key, value), ...])`` and joined groups are a list of
+  ``[first, "OR" or "AND", second, ...]``. Any syntax error is found here
+  before we make any objects, just like with the parsimonious grammar.
+* We then walk those tuples and normalise them with the Section and Joiner
+  specs in the same order as the visitor does.
+"""
+from timepiece.grammar import TimeSpecVisitor, ParseContext
+
+from input_algorithms.errors import BadSpecValue
+
+import re
+
+token_regex = re.compile(r"(?P<word>[\s\.a-zA-Z0-9;_-]+)|(?P<punctuation>[(),:&|])|(?P<unknown>.)", re.DOTALL)
+func_name_regex = re.compile(r"[a-zA-Z][a-zA-Z0-9_]+$")
+key_name_regex = re.compile(r"[a-zA-Z][a-zA-Z0-9]+$")
+
+joiners = {"|": "OR", "&": "AND"}
+
+def tokenize(text):
+    """
+    Return a list of ``(kind, value, position)`` for this text
+
+    Where kind is ``word`` for anything that could be a name or a value and is
+    otherwise the punctuation character itself.
+    """
+    tokens = []
+    for match in token_regex.finditer(text):
+        kind = match.lastgroup
+        if kind == "unknown":
+            raise BadSpecValue(error="Unexpected character", position=match.start(), got=match.group())
+        elif kind == "word":
+            tokens.append(("word", match.group(), match.start()))
+        else:
+            tokens.append((match.group(), match.group(), match.start()))
+    tokens.append(("end", "", len(text)))
+    return tokens
+
+class Parser(object):
+    """Turn a list of tokens into the nested tuples described in the module docstring"""
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.index + offset][0]
+
+    def take(self, kind):
+        token = self.tokens[self.index]
+        if token[0] != kind:
+            raise BadSpecValue(error="Failed to parse specification", wanted=kind, got=token[1], position=token[2])
+        self.index += 1
+        return token[1]
+
+    def time_spec(self):
+        res = self.grouped_funcs()
+        self.take("end")
+        return res
+
+    def grouped_funcs(self):
+        group = [self.grouped_funcs_first()]
+        while self.peek() in joiners:
+            group.append(joiners[self.take(self.peek())])
+            group.append(self.grouped_funcs_first())
+
+        if len(group) == 1:
+            return group[0]
+        return group
+
+    def grouped_funcs_first(self):
+        if self.peek() == "(":
+            self.take("(")
+            group = self.grouped_funcs()
+            self.take(")")
+            return group
+        return self.func()
+
+    def func(self):
+        name = self.name(func_name_regex)
+        self.take("(")
+
+        pairs = []
+        if self.peek() != ")":
+            pairs.append(self.key_pair())
+            while self.peek() == ",":
+                self.take(",")
+                pairs.append(self.key_pair())
+
+        self.take(")")
+        return (name, pairs)
+
+    def key_pair(self):
+        key = self.name(key_name_regex)
+        self.take(":")
+
+        if self.peek() == "word" and self.peek(1) == "(":
+            return (key, self.func())
+        return (key, self.take("word").strip())
+
+    def name(self, regex):
+        token = self.tokens[self.index]
+        if token[0] != "word" or not regex.match(token[1]):
+            raise BadSpecValue(error="Failed to parse specification", wanted="name", got=token[1], position=token[2])
+        self.index += 1
+        return token[1]
+
+class DescentVisitor(TimeSpecVisitor):
+    """
+    A drop in replacement for TimeSpecVisitor that uses a recursive descent
+    parser instead of parsimonious.
+    """
+    def parse(self, text, validate=True, context=None):
+        if context is None:
+            context = ParseContext()
+        context.validate = validate
+
+        if text == "":
+            raise self.ErrorKls("No specification was given")
+
+        tree = Parser(tokenize(text)).time_spec()
+        res = self.make(tree, context).simplify()
+        return self.validated(res, validate)
+
+    def make(self, tree, context):
+        if type(tree) is list:
+            return self.make_joined(tree, context)
+        return self.make_section(tree, context)
+
+    def make_joined(self, group, context):
+        made = [self.make(group[0], context)]
+        for index in range(1, len(group), 2):
+            context.joiner_count += 1
+            made.append(self.make(group[index + 1], context))
+
+        # Joiners are right associative, so ``a | b & c`` is ``a | (b & c)``
+        second = made.pop()
+        for index in range(len(group) - 2, 0, -2):
+            joiner = group[index]
+            meta = context.meta.indexed_at("{0}({1})".format(context.joiner_count, joiner))
+            second = self.Joiner().normalise(meta, (joiner, made.pop(), second))
+        return second
+
+    def make_section(self, tree, context):
+        context.count += 1
+        outer = context.start_section()
+        name, pairs = tree
+
+        kwargs = {}
+        for key, val in pairs:
+            if type(val) is tuple:
+                val = self.make_section(val, context)
+            kwargs[key] = val
+
+        section = self.Section(self.available_sections)
+        meta = context.meta.indexed_at("{0}({1})".format(context.count, name))
+        made = section.normalise(meta, (name, kwargs))
+        made = self.section_made(section, made, context, meta)
+        context.finish_section(outer)
+        return made
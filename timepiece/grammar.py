@@ -1,42 +1,214 @@
 from timepiece.sections.base import default_available_sections
-from timepiece.helpers import memoized_property
+from timepiece.helpers import memoized_property, lazy_module
+from timepiece.clock import using, snapshot
+from timepiece.interning import Interner
+from timepiece.cache import SpecCache
 
 from input_algorithms.errors import BadSpecValue
 from input_algorithms.meta import Meta
 from delfick_error import DelfickError
 
-from parsimonious.nodes import Node, NodeVisitor
-from parsimonious.grammar import Grammar
-import parsimonious
+from collections import deque
+import itertools
+
+# Only the parsimonious parser needs parsimonious and only parse_many needs a
+# process pool, so these are imported when they are first used
+parsimonious = lazy_module("parsimonious")
+futures = lazy_module("concurrent.futures")
+uuid = lazy_module("uuid")
 
 EmptyMeta = Meta({}, [])
 
+# Grammars made inside parse_many worker processes
+worker_grammars = {}
+
+# Compiled parsimonious grammars, keyed by the grammar string
+compiled_grammars = {}
+
+def parse_in_worker(token, recipe, validate, clock, time_specs):
+    """Used by parse_many to parse a chunk of specifications in a worker process"""
+    if token not in worker_grammars:
+        maker, kwargs = recipe
+        worker_grammars.clear()
+        worker_grammars[token] = maker(**kwargs)
+    grammar = worker_grammars[token]
+    return [grammar.parse_or_error(time_spec, validate=validate, clock=clock) for time_spec in time_specs]
+
+class ParseContext(object):
+    """
+    The state for parsing one specification
+
+    This is kept separate from the visitor so that one visitor can parse many
+    specifications at the same time.
+    """
+    def __init__(self, meta=EmptyMeta, interner=None):
+        self.meta = meta
+        self.count = -1
+        self.interner = interner
+        self.joiner_count = -1
+        self.time_dependent = False
+
+        # Whether something inside the section we're making is time dependent
+        self.time_dependent_inside = False
+
+        # Set by the visitor from the validate it was given
+        self.validate = True
+
+    def start_section(self):
+        """Start making a section and return what finish_section needs for the section around it"""
+        outer = self.time_dependent_inside
+        self.time_dependent_inside = False
+        return outer
+
+    def finish_section(self, outer):
+        """Finished a section, so the section around it is time dependent inside if this one was"""
+        self.time_dependent_inside = outer or self.time_dependent_inside
+
 class TimeSpecGrammar(object):
     Visitor = NotImplemented
 
-    def __init__(self, available_sections=None):
+    # A (callable, kwargs) for making this kind of grammar in another process
+    maker = None
+
+    def __init__(self, available_sections=None, cache_size=None, intern=False):
+        self.intern = intern
+        self.cache_size = cache_size
         self.available_sections = available_sections
 
+        self.cache = None
+        if cache_size:
+            self.cache = SpecCache(cache_size)
+
+        self.interner = None
+        if intern:
+            self.interner = Interner()
+
     @memoized_property
     def visitor(self):
         return self.Visitor(self.available_sections)
 
-    def time_spec_to_object(self, time_spec, validate=True):
-        return self.visitor.parse(time_spec.replace(" ", "").replace("\t", ""), validate=validate)
+    def time_spec_to_object(self, time_spec, validate=True, clock=None):
+        """
+        Return the object for this time_spec
+
+        If a clock is given then things like ``now()`` use it rather than the
+        clock from ``timepiece.clock.current()``.
+        """
+        if clock is not None:
+            with using(clock):
+                return self.time_spec_to_object(time_spec, validate=validate)
+
+        time_spec = self.strip(time_spec)
+        if self.cache is None and self.interner is None:
+            return self.visitor.parse(time_spec, validate=validate)
+
+        key = (time_spec, validate)
+        if self.cache is not None:
+            found, res = self.cache.get(key)
+            if found:
+                return res
+
+        context = ParseContext(interner=self.interner)
+        res = self.visitor.parse(time_spec, validate=validate, context=context)
+
+        # Things like now() and range() must be evaluated every time
+        if not context.time_dependent:
+            if self.interner is not None:
+                res = self.interner.intern(res)
+            if self.cache is not None:
+                self.cache.put(key, res)
+
+        return res
+
+    def parse_or_error(self, time_spec, validate=True, clock=None):
+        """Return the object for this time_spec, or the exception we got from trying to make it"""
+        try:
+            return self.time_spec_to_object(time_spec, validate=validate, clock=clock)
+        except Exception as error:
+            return error
+
+    def parse_many(self, time_specs, workers=None, chunksize=200, validate=True, serial_below=1000, clock=None):
+        """
+        Yield an object or an error for each time_spec, in the order they were given
+
+        We take one snapshot of ``clock``, or the current clock, before we
+        start so that everything agrees on when ``now()`` is.
+
+        If workers is more than one, then the specifications are parsed in
+        chunks of ``chunksize`` on a pool of that many processes. Each process
+        makes the grammar only once.
+
+        We parse in this process if there are less than ``serial_below``
+        specifications, as starting the processes would take longer than
+        parsing them here.
+        """
+        clock = snapshot(clock)
+        time_specs = iter(time_specs)
+        first = list(itertools.islice(time_specs, serial_below))
+
+        if not workers or workers < 2 or len(first) < serial_below:
+            for time_spec in itertools.chain(first, time_specs):
+                yield self.parse_or_error(time_spec, validate=validate, clock=clock)
+            return
+
+        token = uuid.uuid4().hex
+        recipe = self.recipe()
+        chunks = iter(lambda: list(itertools.islice(time_specs, chunksize)), [])
+        chunks = itertools.chain([first[i:i + chunksize] for i in range(0, len(first), chunksize)], chunks)
+
+        # Only keep a few chunks in flight so we don't read everything into memory
+        with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(parse_in_worker, token, recipe, validate, clock, chunk))
+                if len(pending) >= workers * 2:
+                    for res in pending.popleft().result():
+                        yield res
+
+            while pending:
+                for res in pending.popleft().result():
+                    yield res
+
+    def recipe(self):
+        """Return a picklable (callable, kwargs) that makes a grammar like this one"""
+        if self.maker is None:
+            return self.__class__, {"available_sections": self.available_sections, "cache_size": self.cache_size, "intern": self.intern}
+        maker, kwargs = self.maker
+        return maker, dict(kwargs, sections=self.available_sections, cache_size=self.cache_size, intern=self.intern)
+
+    def invalidate(self, time_spec=None):
+        """Remove this time_spec from the cache, or everything if no time_spec is given"""
+        if self.cache is None:
+            return
+
+        if time_spec is None:
+            self.cache.invalidate()
+        else:
+            time_spec = self.strip(time_spec)
+            self.cache.invalidate((time_spec, True), (time_spec, False))
+
+    def strip(self, time_spec):
+        return time_spec.replace(" ", "").replace("\t", "")
 
     def clone(self, more_sections):
-        instance = self.__class__(self.available_sections)
-        instance._visitor = self.visitor.clone(more_sections)
-        return instance
+        """Return a grammar like this one that also knows about more_sections"""
+        # Workers from parse_many make their grammar from our available_sections
+        sections = dict(self.visitor.available_sections)
+        sections.update(more_sections or {})
+        return self.__class__(sections, cache_size=self.cache_size, intern=self.intern)
 
-class TimeSpecVisitor(NodeVisitor):
+class TimeSpecVisitor(object):
     ErrorKls = DelfickError
     Joiner = NotImplemented
     Section = NotImplemented
 
-    @memoized_property
+    @property
     def grammar(self):
-        return Grammar(self.grammar_string)
+        """The compiled grammar, which is shared by every visitor with the same grammar_string"""
+        grammar = compiled_grammars.get(self.grammar_string)
+        if grammar is None:
+            grammar = compiled_grammars[self.grammar_string] = parsimonious.Grammar(self.grammar_string)
+        return grammar
 
     grammar_string = """
         time_spec = grouped_funcs?
@@ -65,62 +237,93 @@ class TimeSpecVisitor(NodeVisitor):
     """
 
     def __init__(self, available_sections=None):
-        self.count = -1
-        self.joiner_count = -1
-        self.meta = EmptyMeta
-        self.time_spec = None
-
         self.available_sections = available_sections
         if self.available_sections is None:
             self.available_sections = default_available_sections
 
-        self.visiting_methods = {}
-        for attr in dir(self):
-            if attr.startswith("visit_"):
-                self.visiting_methods[attr[6:]] = getattr(self, attr)
+        self.visiting_methods = self.dispatch_table()
+
+    @classmethod
+    def dispatch_table(kls):
+        """
+        Return {expr_name: visit_method} for this class
+
+        This is worked out once per class and values are either one of the
+        strings understood by ``visit`` or an unbound function.
+        """
+        table = kls.__dict__.get("_dispatch_table")
+        if table is None:
+            table = {}
+            for attr in dir(kls):
+                if attr.startswith("visit_"):
+                    table[attr[6:]] = getattr(kls, attr)
+            kls._dispatch_table = table
+        return table
 
     def clone(self, more_sections=None):
         sections = {}
         sections.update(dict(self.available_sections or {}))
         sections.update(dict(more_sections or {}))
-        instance = self.__class__(sections)
-        instance._grammar = getattr(self, "_grammar", None)
-        return instance
+        return self.__class__(sections)
+
+    def parse(self, text, validate=True, context=None):
+        if context is None:
+            context = ParseContext()
+        context.validate = validate
 
-    def parse(self, text, validate=True):
         try:
-            res = super(TimeSpecVisitor, self).parse(text)
+            res = self.visit(self.grammar.parse(text), context)
         except (parsimonious.exceptions.VisitationError, parsimonious.exceptions.IncompleteParseError) as error:
             raise BadSpecValue(error=error)
         else:
-            if validate:
-                if not hasattr(res, "specifies"):
-                    raise self.ErrorKls("Sorry, object can only be used as a parameter", got=res)
-                if "repeat" not in res.specifies and "once" not in res.specifies:
-                    raise self.ErrorKls("Time spec is invalid, it must be able to specify a start with an optional interval", got=res.specifies)
-            return res
-
-    def visit(self, node):
-        if not isinstance(node, Node):
+            return self.validated(res, validate)
+
+    def validated(self, res, validate):
+        if validate:
+            if not hasattr(res, "specifies"):
+                raise self.ErrorKls("Sorry, object can only be used as a parameter", got=res)
+            if "repeat" not in res.specifies and "once" not in res.specifies:
+                raise self.ErrorKls("Time spec is invalid, it must be able to specify a start with an optional interval", got=res.specifies)
+        return res
+
+    def section_made(self, section, made, context, meta):
+        """
+        Check this section is complete if we're validating, record if it was
+        time dependent and otherwise intern it if we are interning
+        """
+        if context.validate and hasattr(made, "check_complete"):
+            made.check_complete(meta)
+
+        # A section with anything time dependent inside it is also different
+        # each time, so we don't intern it or anything in it
+        if section.time_dependent or context.time_dependent_inside:
+            context.time_dependent = True
+            context.time_dependent_inside = True
+        elif context.interner is not None:
+            made = context.interner.intern(made)
+        return made
+
+    def visit(self, node, context):
+        if not isinstance(node, parsimonious.nodes.Node):
             return node
 
         method = self.visiting_methods.get(node.expr_name)
         if method is None:
             while node.expr_name == "" and node.children and len(node.children) == 1:
                 node = node.children.pop(0)
-            return [self.visit(n) for n in node.children if n.text != ""]
+            return [self.visit(n, context) for n in node.children if n.text != ""]
         if method == "first_child":
-            return self.visit(node.children[0])
+            return self.visit(node.children[0], context)
         elif method == "second_child":
-            return self.visit(node.children[1])
+            return self.visit(node.children[1], context)
         elif method == "just_text":
             return node.text.strip()
         elif method == "children":
-            return [self.visit(n) for n in node]
+            return [self.visit(n, context) for n in node]
         elif method == "integer":
             return int(node.text.strip())
         else:
-            return method(node, node.children)
+            return method(self, node, node.children, context)
 
     visit_integer = "integer"
     visit_grouped_with_joiner = "children"
@@ -128,46 +331,52 @@ class TimeSpecVisitor(NodeVisitor):
     visit_commad_key_pair = visit_wrapped_grouped_funcs = "second_child"
     visit_arbitrary_string = visit_func_name = visit_key_name = visit_key_value = visit_whitespace = "just_text"
 
-    def visit_time_spec(self, node, children):
+    def visit_time_spec(self, node, children, context):
         if node.text == "":
             raise self.ErrorKls("No specification was given")
-        return self.visit(children[0]).simplify()
+        return self.visit(children[0], context).simplify()
 
-    def visit_func_sig(self, node, children):
+    def visit_func_sig(self, node, children, context):
         if not children or children[0].text.strip() is "":
             return {}
         else:
-            return self.visit(children[0])
+            return self.visit(children[0], context)
 
-    def visit_key_pairs(self, node, children):
-        first = self.visit(children[0])
+    def visit_key_pairs(self, node, children, context):
+        first = self.visit(children[0], context)
         if children[1].text == "":
             return dict([first])
         else:
-            visited = self.visit(children[1])
+            visited = self.visit(children[1], context)
             if visited and visited[0] == []:
                 return dict([first, visited[1]])
-            return dict([first] + self.visit(children[1]))
+            return dict([first] + visited)
 
-    def visit_key_pair(self, node, children):
-        return (self.visit(children[0]), self.visit(children[2])[0])
+    def visit_key_pair(self, node, children, context):
+        return (self.visit(children[0], context), self.visit(children[2], context)[0])
 
-    def visit_grouped_funcs(self, node, children):
-        first = self.visit(children[0])
-        second = self.visit(children[1])
+    def visit_grouped_funcs(self, node, children, context):
+        first = self.visit(children[0], context)
+        second = self.visit(children[1], context)
 
         if second:
             joiner, second = second
-            return self.Joiner().normalise(self.meta.indexed_at("{0}({1})".format(self.joiner_count, joiner)), (joiner, first, second))
+            return self.Joiner().normalise(context.meta.indexed_at("{0}({1})".format(context.joiner_count, joiner)), (joiner, first, second))
         else:
             return first
 
-    def visit_func(self, node, children):
-        self.count += 1
-        nxt = (self.visit(children[0]), self.visit(children[2]))
-        return self.Section(self.available_sections).normalise(self.meta.indexed_at("{0}({1})".format(self.count, nxt[0])), nxt)
-
-    def visit_joiner(self, node, children):
-        self.joiner_count += 1
+    def visit_func(self, node, children, context):
+        context.count += 1
+        outer = context.start_section()
+        nxt = (self.visit(children[0], context), self.visit(children[2], context))
+        section = self.Section(self.available_sections)
+        meta = context.meta.indexed_at("{0}({1})".format(context.count, nxt[0]))
+        made = section.normalise(meta, nxt)
+        made = self.section_made(section, made, context, meta)
+        context.finish_section(outer)
+        return made
+
+    def visit_joiner(self, node, children, context):
+        context.joiner_count += 1
         return {"|": "OR", "&": "AND", "+": "PLUS", "-": "MINUS"}[node.text.strip()]
 
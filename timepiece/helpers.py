@@ -1,3 +1,5 @@
+import importlib
+
 class memoized_property(object):
     """Decorator to make a descriptor that memoizes it's value"""
     def __init__(self, func):
@@ -19,3 +21,32 @@ class memoized_property(object):
     def __delete__(self, instance):
         if hasattr(instance, self.cache_name):
             delattr(instance, self.cache_name)
+
+def optional_module(name):
+    """Return the module with this name, or None if it isn't installed"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+class lazy_module(object):
+    """
+    A stand in for a module that is only imported when something on it is used
+
+    So ``aniso8601 = lazy_module("aniso8601")`` means ``aniso8601.parse_date``
+    imports aniso8601 the first time it's used.
+    """
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_module = None
+
+    def __getattr__(self, key):
+        if key.startswith("_lazy"):
+            raise AttributeError(key)
+
+        if self._lazy_module is None:
+            self._lazy_module = importlib.import_module(self._lazy_name)
+        return getattr(self._lazy_module, key)
+
+    def __repr__(self):
+        return "<lazy_module {0}>".format(self._lazy_name)
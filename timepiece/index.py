@@ -0,0 +1,195 @@
+"""
+Find which of many specifications are filtered at a particular time.
+
+The FilterIndex takes the filters from each specification and keeps postings
+of the allowed values for each field, so asking what matches a time is some
+set intersections rather than calling ``is_filtered`` on everything.
+
+Each specification is indexed as one or more units:
+
+FilterSpec
+    One unit with the values from the filter.
+
+RepeatAndFiltersSpec
+    One unit that only allows the values that all its filters allow, as
+    ``is_filtered`` needs every filter to agree.
+
+ManyRepeatAndFiltersSpec
+    One unit for each of its specs, as ``is_filtered`` only needs one of them.
+
+Units are grouped by which fields they specify, and a unit matches when it's
+in the postings for the value of every field in its group. Anything else is
+kept to the side and has ``is_filtered`` called on it for every lookup.
+"""
+from timepiece.sections.final import FilterSpec, RepeatAndFiltersSpec, ManyRepeatAndFiltersSpec, CompiledFilter, bits, gregorian_week, day_of_year
+
+from delfick_error import DelfickError
+
+import threading
+import itertools
+
+class NotIndexed(DelfickError):
+    desc = "No specification with this id"
+
+class AlreadyIndexed(DelfickError):
+    desc = "Already have a specification with this id"
+
+# The value from a datetime that each filter field is compared with
+field_values = {
+      "minutes": lambda at: at.minute
+    , "hours": lambda at: at.hour
+    , "weeks": lambda at: gregorian_week(at)
+    , "months": lambda at: at.month
+    , "day_names": lambda at: at.weekday()
+    , "day_numbers": day_of_year
+    }
+
+def filter_units(spec):
+    """
+    Return a CompiledFilter for each unit of this spec, or None if we can only
+    answer for it with is_filtered
+    """
+    if isinstance(spec, FilterSpec):
+        return [spec.compiled]
+    elif isinstance(spec, RepeatAndFiltersSpec):
+        compiled = CompiledFilter()
+        for f in spec.filters:
+            compiled = compiled.intersected(f.compiled)
+        return [compiled]
+    elif isinstance(spec, ManyRepeatAndFiltersSpec):
+        return [unit for rf in spec.specs for unit in filter_units(rf)]
+
+class FilterIndex(object):
+    """
+    Postings of filter values for many specifications keyed by id.
+
+    ``matching(at)`` gives the same ids as checking ``spec.is_filtered(at)``
+    for every specification.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.specs = {}
+
+        # id -> [(fields, unit, compiled), ...] so we can take them out again
+        self.units = {}
+        self.unit_ids = {}
+        self.counter = itertools.count()
+
+        # fields -> {field: {value: set(unit)}}
+        self.postings = {}
+
+        # Units that specify no fields and ids we call is_filtered on
+        self.always = set()
+        self.checked = {}
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __contains__(self, ident):
+        return ident in self.specs
+
+    @property
+    def stats(self):
+        return {
+              "specs": len(self.specs)
+            , "units": len(self.unit_ids)
+            , "groups": len(self.postings)
+            , "postings": sum(len(units) for group in self.postings.values() for values in group.values() for units in values.values())
+            , "checked": len(self.checked)
+            }
+
+    def add(self, ident, spec):
+        with self.lock:
+            if ident in self.specs:
+                raise AlreadyIndexed(ident=ident)
+
+            # Work everything out before changing anything, so a spec we can't
+            # index doesn't leave part of itself behind
+            compiled_units = filter_units(spec)
+            if compiled_units is None:
+                self.specs[ident] = spec
+                self.checked[ident] = spec
+                return
+
+            prepared = []
+            for compiled in compiled_units:
+                fields = tuple(name for name in CompiledFilter.fields if getattr(compiled, name) is not None)
+
+                # A field that allows nothing means this unit never matches
+                if all(getattr(compiled, name) for name in fields):
+                    prepared.append((fields, compiled))
+
+            self.specs[ident] = spec
+            added = self.units[ident] = []
+            for fields, compiled in prepared:
+                unit = next(self.counter)
+                self.unit_ids[unit] = ident
+                added.append((fields, unit, compiled))
+
+                if not fields:
+                    self.always.add(unit)
+                    continue
+
+                group = self.postings.setdefault(fields, dict((name, {}) for name in fields))
+                for name in fields:
+                    for value in bits(getattr(compiled, name)):
+                        group[name].setdefault(value, set()).add(unit)
+
+    def remove(self, ident):
+        """Take this specification out of the index and return it"""
+        with self.lock:
+            if ident not in self.specs:
+                raise NotIndexed(ident=ident)
+
+            self.checked.pop(ident, None)
+            for fields, unit, compiled in self.units.pop(ident, []):
+                del self.unit_ids[unit]
+                if not fields:
+                    self.always.discard(unit)
+                    continue
+
+                group = self.postings[fields]
+                for name in fields:
+                    postings = group[name]
+                    for value in bits(getattr(compiled, name)):
+                        postings[value].discard(unit)
+                        if not postings[value]:
+                            del postings[value]
+
+                if not any(group.values()):
+                    del self.postings[fields]
+
+            return self.specs.pop(ident)
+
+    def update(self, ident, spec):
+        """Replace the specification for this id, keeping the old one if we can't index the new one"""
+        with self.lock:
+            old = self.remove(ident)
+            try:
+                self.add(ident, spec)
+            except Exception:
+                self.add(ident, old)
+                raise
+
+    def matching(self, at):
+        """Return the set of ids for specifications where is_filtered(at) is True"""
+        with self.lock:
+            values = {}
+            units = set(self.always)
+
+            for fields, group in self.postings.items():
+                found = []
+                for name in fields:
+                    if name not in values:
+                        values[name] = field_values[name](at)
+                    postings = group[name].get(values[name])
+                    if not postings:
+                        break
+                    found.append(postings)
+                else:
+                    found.sort(key=len)
+                    units.update(found[0].intersection(*found[1:]))
+
+            matched = set(self.unit_ids[unit] for unit in units)
+            matched.update(ident for ident, spec in self.checked.items() if spec.is_filtered(at))
+            return matched
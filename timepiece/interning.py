@@ -0,0 +1,103 @@
+"""
+Share identical specification objects between parsed specifications.
+
+Lots of specifications contain the same pieces, for example
+``interval(every: amount(num: 1, size: hour))``. The Interner hash-conses
+these so that every time we see the same subtree we use one object.
+
+An object is only interned after all its children have been interned, so two
+objects are the same if they are the same type and their fields are equal,
+with child specifications compared by identity.
+
+Interned objects are frozen (see ``BaseSpec.__setitem__``) because changing one
+would change it for every specification that shares it. Their lists become
+tuples for the same reason, so nothing inside them can be changed either.
+"""
+from timepiece.sections.base import BaseSpec
+
+import threading
+import sys
+
+class Interner(object):
+    """
+    Hold one canonical object for each distinct specification subtree.
+
+    ``deduplicated`` is how many objects we replaced with an existing one and
+    ``bytes_saved`` is an estimate of the memory those objects took up.
+    """
+    def __init__(self):
+        self.deduplicated = 0
+        self.bytes_saved = 0
+
+        self.lock = threading.RLock()
+        self.canonical = {}
+        self.interned_ids = set()
+
+    def __len__(self):
+        return len(self.canonical)
+
+    @property
+    def stats(self):
+        return {"nodes": len(self.canonical), "deduplicated": self.deduplicated, "bytes_saved": self.bytes_saved}
+
+    def clear(self):
+        with self.lock:
+            self.canonical.clear()
+            self.interned_ids.clear()
+
+    def intern(self, obj):
+        """Return the canonical object for obj, interning any children it has first"""
+        if not isinstance(obj, BaseSpec):
+            return obj
+
+        with self.lock:
+            return self.intern_spec(obj)
+
+    def intern_spec(self, obj):
+        if id(obj) in self.interned_ids:
+            return obj
+
+        key = [type(obj)]
+        for name in obj.fields:
+            val = obj[name]
+            if isinstance(val, BaseSpec):
+                interned = self.intern_spec(val)
+                if interned is not val:
+                    obj[name] = interned
+                key.append(id(interned))
+            elif type(val) is list:
+                for index, item in enumerate(val):
+                    if isinstance(item, BaseSpec):
+                        val[index] = self.intern_spec(item)
+                key.append(tuple(id(item) if isinstance(item, BaseSpec) else item for item in val))
+            else:
+                key.append(val)
+
+        try:
+            key = tuple(key)
+            existing = self.canonical.get(key)
+        except TypeError:
+            # Can't intern values we can't hash
+            return obj
+
+        if existing is not None:
+            self.deduplicated += 1
+            self.bytes_saved += self.size_of(obj)
+            return existing
+
+        for name in obj.fields:
+            if type(obj[name]) is list:
+                obj[name] = tuple(obj[name])
+
+        self.canonical[key] = obj
+        self.interned_ids.add(id(obj))
+        object.__setattr__(obj, "_interned", True)
+        return obj
+
+    def size_of(self, obj):
+        """Estimate the memory held by just this object, not counting child specifications"""
+        size = sys.getsizeof(obj) + sys.getsizeof(obj.__dict__)
+        for val in obj.values():
+            if type(val) in (list, tuple):
+                size += sys.getsizeof(val)
+        return size
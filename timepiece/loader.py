@@ -0,0 +1,128 @@
+"""
+Parse files of specifications one row at a time.
+
+Two formats are understood:
+
+lines
+    Each line is ``<id><TAB><specification>``. Lines without a tab use their
+    line number as the id.
+
+jsonl
+    Each line is a json object with the id and specification under the
+    ``id`` and ``spec`` keys.
+
+Blank lines are ignored. Rows we can't read are yielded with a BadRow error
+instead of stopping the whole file.
+"""
+from timepiece.spec import make_timepiece
+
+from delfick_error import DelfickError
+
+from collections import deque
+import json
+import time
+
+formats = ("lines", "jsonl")
+
+class BadRow(DelfickError):
+    desc = "Couldn't read row"
+
+class LoadStats(object):
+    """Counts of what we have loaded so far"""
+    def __init__(self):
+        self.rows = 0
+        self.parsed = 0
+        self.errors = 0
+        self.bad_rows = 0
+        self.started = time.time()
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    @property
+    def per_second(self):
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0
+        return self.rows / elapsed
+
+    def as_dict(self):
+        return {"rows": self.rows, "parsed": self.parsed, "errors": self.errors, "bad_rows": self.bad_rows, "elapsed": self.elapsed, "per_second": self.per_second}
+
+def read_rows(fle, format="lines", id_key="id", spec_key="spec"):
+    """Yield (id, specification) for each row in this file, or (id, BadRow) if we can't read it"""
+    if format not in formats:
+        raise DelfickError("Unknown format", wanted=format, available=list(formats))
+
+    for number, line in enumerate(fle, 1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+
+        if format == "lines":
+            if "\t" in line:
+                yield tuple(line.split("\t", 1))
+            else:
+                yield number, line
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, BadRow("Invalid json", line=number, error=error)
+            continue
+
+        if not isinstance(row, dict) or not isinstance(row.get(spec_key), str):
+            yield number, BadRow("Expected an object with a string specification", line=number, key=spec_key)
+        else:
+            yield row.get(id_key, number), row[spec_key]
+
+def load(fle, timepiece=None, format="lines", stats=None, workers=None, validate=True, id_key="id", spec_key="spec"):
+    """
+    Yield (id, object) for each row in this file, where object is either what
+    we parsed from the row or the error we got from parsing it
+
+    Only a small number of rows are held in memory at any time. If workers is
+    more than 1 then rows are parsed with ``timepiece.parse_many``.
+
+    Pass in a LoadStats if you want to see the counts as they change.
+    """
+    if timepiece is None:
+        timepiece = make_timepiece()
+    if stats is None:
+        stats = LoadStats()
+
+    def record(ident, res):
+        stats.rows += 1
+        if isinstance(res, BadRow):
+            stats.bad_rows += 1
+        elif isinstance(res, Exception):
+            stats.errors += 1
+        else:
+            stats.parsed += 1
+        return ident, res
+
+    rows = read_rows(fle, format=format, id_key=id_key, spec_key=spec_key)
+
+    # Rows are yielded in order, so pending has the rows that parse_many has
+    # taken but not given back yet, along with any bad rows between them
+    pending = deque()
+
+    def specs():
+        for ident, spec in rows:
+            pending.append((ident, spec))
+            if not isinstance(spec, BadRow):
+                yield spec
+
+    def flush_bad_rows():
+        while pending and isinstance(pending[0][1], BadRow):
+            yield record(*pending.popleft())
+
+    for res in timepiece.parse_many(specs(), workers=workers, validate=validate):
+        for row in flush_bad_rows():
+            yield row
+        yield record(pending.popleft()[0], res)
+
+    for row in flush_bad_rows():
+        yield row
@@ -0,0 +1,242 @@
+"""
+Turn simplified specifications into small objects that are quick to evaluate.
+
+The objects ``time_spec_to_object`` gives back are dictobjs, which keep their
+fields in a dictionary and carry everything the normalisation specs need.
+``compile`` turns one into a tree of plans with ``__slots__`` that only hold
+what ``following`` and ``is_filtered`` use:
+
+DateTimeSpec
+    A OncePlan with the datetime.
+
+RepeatSpec
+    A RepeatPlan with the start and end datetimes and a PeriodPlan for each
+    interval.
+
+FilterSpec
+    Its CompiledFilter, which keeps the allowed values as bitmasks.
+
+RepeatAndFiltersSpec
+    A FilteredPlan with the compiled repeat and filters.
+
+ManyRepeatAndFiltersSpec
+    A ManyPlan with each of its specs compiled.
+
+Anything else, like a repeat that starts at sunrise, is kept as it is. Plans
+give the same answers as the specifications they came from and can't be
+changed once they're made.
+"""
+from timepiece.sections.final import (
+      DateTimeSpec, RepeatSpec, FilterSpec, RepeatAndFiltersSpec, ManyRepeatAndFiltersSpec
+    , years_after, next_allowed, filter_search_years
+    )
+from timepiece.sizing import approximate_seconds, as_timedelta, is_relative, scaled
+from timepiece.helpers import lazy_module
+from timepiece import clock
+
+from delfick_error import DelfickError
+
+from datetime import timedelta
+
+relativedelta = lazy_module("dateutil.relativedelta")
+
+class FrozenPlan(DelfickError):
+    desc = "Plans can't be changed"
+
+class Plan(object):
+    """Base for plans, which set their slots once in __init__ and never again"""
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            object.__setattr__(self, name, kwargs[name])
+
+    def __setattr__(self, key, val):
+        raise FrozenPlan(kls=self.__class__.__name__, attribute=key)
+
+    def __delattr__(self, key):
+        raise FrozenPlan(kls=self.__class__.__name__, attribute=key)
+
+    def __repr__(self):
+        return "<{0} {1}>".format(self.__class__.__name__, " ".join("{0}={1!r}".format(name, getattr(self, name)) for name in self.__slots__))
+
+class OncePlan(Plan):
+    __slots__ = ("at", )
+
+    def following(self, at=None):
+        if at is None:
+            at = clock.now()
+        return None if at.replace(microsecond=0) > self.at else self.at
+
+    def is_filtered(self, at):
+        return self.at <= at and at - self.at < timedelta(seconds=30)
+
+class PeriodPlan(Plan):
+    """
+    One interval from a repeat, which gives times that are a whole number of
+    delta after the start of the repeat, like AmountSpec.interval
+
+    We know how many of a fixed size delta or a delta of only months and
+    years fit between start and at without stepping through them.
+    """
+    __slots__ = ("delta", "fixed", "months", "relative", "step")
+
+    @classmethod
+    def from_amount(kls, amount):
+        delta = amount.as_delta()
+        relative = is_relative(delta)
+
+        months = None
+        if relative and not any(getattr(delta, name) for name in ("days", "hours", "minutes", "seconds", "microseconds")):
+            months = delta.years * 12 + delta.months
+
+        return kls(
+              delta=delta, fixed=as_timedelta(delta) if relative else None, months=months
+            , relative=relative, step=approximate_seconds(delta)
+            )
+
+    def first(self, start, at, end):
+        """Return the first time after at and start, or None if that's after end"""
+        if at < start:
+            # Only times after start count
+            return None
+
+        if self.fixed is not None:
+            nxt = start + self.fixed * ((at - start) // self.fixed + 1)
+        elif self.months is not None:
+            # Adding months never goes past the month we ask for, so the
+            # answer is in the month at is in or the next time after it
+            count = ((at.year - start.year) * 12 + at.month - start.month) // self.months
+            nxt = start + relativedelta.relativedelta(months=count * self.months)
+            if nxt <= at:
+                nxt = start + relativedelta.relativedelta(months=(count + 1) * self.months)
+        elif not self.relative:
+            nxt = start
+            while nxt <= at:
+                nxt += self.delta
+        else:
+            count = max(0, int((at - start).total_seconds() // self.step) - 1)
+            while start + scaled(self.delta, count) <= at:
+                count += 1
+            while count > 1 and start + scaled(self.delta, count - 1) > at:
+                count -= 1
+            nxt = start + scaled(self.delta, count)
+
+        if nxt > start and (end is None or nxt.replace(microsecond=0) <= end):
+            return nxt
+
+class RepeatPlan(Plan):
+    """Times from start up to end, every one of our periods, or just start if there are none"""
+    __slots__ = ("start", "end", "periods")
+
+    def following(self, at=None):
+        if at is None:
+            at = clock.now()
+
+        if self.end is not None and at > self.end:
+            return None
+
+        if at < self.start:
+            return self.start
+
+        if self.periods is None:
+            return None
+
+        found = None
+        for period in self.periods:
+            nxt = period.first(self.start, at, self.end)
+            if nxt is not None and (found is None or nxt < found):
+                found = nxt
+        return found
+
+    def is_filtered(self, at):
+        if self.end is not None and at > self.end:
+            return False
+        return at >= self.start
+
+class FilteredPlan(Plan):
+    """
+    Times from our repeat that get through all of our filters
+
+    ``allowed`` is the intersection of the filters, so is_filtered is one
+    check rather than one per filter. Like RepeatAndFiltersSpec, is_filtered
+    only asks the filters.
+    """
+    __slots__ = ("repeat", "filters", "allowed")
+
+    def following(self, at=None):
+        if at is None:
+            at = clock.now()
+
+        nxt = self.repeat.following(at)
+        if not self.filters:
+            return nxt
+
+        until = years_after(at, filter_search_years)
+        while nxt is not None and nxt <= until:
+            if self.allowed.is_filtered(nxt):
+                return nxt
+
+            allowed = next_allowed(self.filters, nxt, until)
+            if allowed is None:
+                return None
+
+            nxt = self.repeat.following(allowed - timedelta(microseconds=1))
+
+    def is_filtered(self, at):
+        return self.allowed is None or self.allowed.is_filtered(at)
+
+class ManyPlan(Plan):
+    """The soonest of our plans, and filtered if any of them are"""
+    __slots__ = ("plans", )
+
+    def following(self, at=None):
+        if at is None:
+            at = clock.now()
+
+        found = None
+        for plan in self.plans:
+            nxt = plan.following(at)
+            if nxt is not None and (found is None or nxt < found):
+                found = nxt
+        return found
+
+    def is_filtered(self, at):
+        for plan in self.plans:
+            if plan.is_filtered(at):
+                return True
+        return False
+
+def compile(spec):
+    """Return a plan for this simplified specification, or the specification itself if we can't make one"""
+    if isinstance(spec, ManyRepeatAndFiltersSpec):
+        return ManyPlan(plans=tuple(compile(rf) for rf in spec.specs))
+
+    elif isinstance(spec, RepeatAndFiltersSpec):
+        repeat = compile(spec.repeat)
+        if repeat is spec.repeat:
+            return spec
+
+        filters = tuple(f.compiled for f in spec.filters)
+        allowed = filters[0] if filters else None
+        for f in filters[1:]:
+            allowed = allowed.intersected(f)
+        return FilteredPlan(repeat=repeat, filters=filters, allowed=allowed)
+
+    elif isinstance(spec, RepeatSpec):
+        if type(spec.start) is not DateTimeSpec or (spec.end is not None and type(spec.end) is not DateTimeSpec):
+            return spec
+
+        periods = None
+        if spec.every is not None:
+            periods = tuple(PeriodPlan.from_amount(interval.every) for interval in spec.every.intervals)
+
+        return RepeatPlan(start=spec.start.datetime, end=spec.end.datetime if spec.end is not None else None, periods=periods)
+
+    elif isinstance(spec, DateTimeSpec):
+        return OncePlan(at=spec.datetime)
+
+    elif isinstance(spec, FilterSpec):
+        return spec.compiled
+
+    return spec
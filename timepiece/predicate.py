@@ -0,0 +1,126 @@
+"""
+Generate one flat function that says whether a time is filtered by a spec.
+
+``is_filtered`` on a ManyRepeatAndFiltersSpec asks each of its
+RepeatAndFiltersSpecs, which asks each of its filters, which checks each of
+its fields. ``for_spec`` writes that out as the source for a single function
+with the allowed values as frozensets and compiles it:
+
+.. code-block:: python
+
+    def is_filtered(at):
+        minute = at.minute
+        hour = at.hour
+        if hour in allowed_0 and at.weekday() in allowed_1:
+            return True
+        if minute in allowed_2:
+            return True
+        return False
+
+The function is remembered on interned specs, which can't be changed. Other
+specs get a newly compiled function each time, so it always sees what's in them
+now, and callers should hold on to the function rather than calling
+``for_spec`` for every time they check.
+
+FilterSpec, RepeatAndFiltersSpec and ManyRepeatAndFiltersSpec get a generated
+function and anything else gets its own ``is_filtered``.
+"""
+from timepiece.sections.final import (
+      FilterSpec, RepeatAndFiltersSpec, ManyRepeatAndFiltersSpec
+    , bits, day_of_year, gregorian_week
+    )
+
+import builtins
+
+# How we get each field of the CompiledFilter from at, cheapest first
+# The first three are put in locals at the start of the function
+fields = [
+      ("minutes", "minute")
+    , ("hours", "hour")
+    , ("months", "month")
+    , ("day_names", "at.weekday()")
+    , ("day_numbers", "day_of_year(at)")
+    , ("weeks", "gregorian_week(at)")
+    ]
+
+local_fields = ("minute", "hour", "month")
+
+def clauses(spec):
+    """Return a list of CompiledFilters where a time is filtered if it gets through any of them"""
+    if isinstance(spec, FilterSpec):
+        return [spec.compiled]
+
+    elif isinstance(spec, RepeatAndFiltersSpec):
+        if not spec.filters:
+            return [None]
+
+        compiled = spec.filters[0].compiled
+        for f in spec.filters[1:]:
+            compiled = compiled.intersected(f.compiled)
+        return [compiled]
+
+    elif isinstance(spec, ManyRepeatAndFiltersSpec):
+        found = []
+        for rf in spec.specs:
+            found.extend(clauses(rf))
+        return found
+
+def source_for(compiled_filters):
+    """Return the source of an is_filtered function and the constants it uses"""
+    constants = {}
+    used = set()
+    lines = []
+
+    for compiled in compiled_filters:
+        checks = []
+        if compiled is not None:
+            for name, value in fields:
+                mask = getattr(compiled, name)
+                if mask is None:
+                    continue
+
+                if mask == 0:
+                    checks = ["False"]
+                    break
+
+                constant = "allowed_{0}".format(len(constants))
+                constants[constant] = frozenset(bits(mask))
+                checks.append("{0} in {1}".format(value, constant))
+                if value in local_fields:
+                    used.add(value)
+
+        if checks == ["False"]:
+            continue
+
+        if not checks:
+            # Something always gets through, so nothing after this matters
+            lines.append("    return True")
+            break
+
+        lines.append("    if {0}:".format(" and ".join(checks)))
+        lines.append("        return True")
+    else:
+        lines.append("    return False")
+
+    start = ["def is_filtered(at):"] + ["    {0} = at.{0}".format(value) for value in local_fields if value in used]
+    return "\n".join(start + lines) + "\n", constants
+
+def for_spec(spec):
+    """Return a function that gives the same answer as ``spec.is_filtered``, remembering it for interned specs"""
+    found = spec.__dict__.get("_predicate")
+    if found is not None:
+        return found
+
+    compiled_filters = clauses(spec)
+    if compiled_filters is None:
+        return spec.is_filtered
+
+    source, constants = source_for(compiled_filters)
+    namespace = dict(constants, day_of_year=day_of_year, gregorian_week=gregorian_week)
+    exec(builtins.compile(source, "<timepiece predicate for {0}>".format(spec.__class__.__name__), "exec"), namespace)
+
+    func = namespace["is_filtered"]
+    func.source = source
+    if spec._interned:
+        spec.__dict__["_predicate"] = func
+    return func
@@ -0,0 +1,156 @@
+"""
+Keep track of when many specifications are next due.
+
+The Scheduler holds specifications by id and a heap of when each one next
+fires, so finding what is due is a look at the top of the heap rather than a
+call to ``following`` for every specification. A specification's next time is
+only worked out again after it fires or is changed.
+
+Removing or updating a specification leaves its old heap entry behind marked
+as removed. Those entries are skipped when they get to the top of the heap,
+and the heap is rebuilt without them when they outnumber the live ones.
+"""
+from timepiece import clock
+
+from delfick_error import DelfickError
+
+import threading
+import itertools
+import heapq
+
+class NotScheduled(DelfickError):
+    desc = "No specification with this id"
+
+class AlreadyScheduled(DelfickError):
+    desc = "Already have a specification with this id"
+
+# Put in the id slot of heap entries that have been removed or replaced
+removed = object()
+
+class Scheduler(object):
+    """
+    Many specifications keyed by id and a min heap of when they next fire.
+
+    Specifications can be anything with a ``following(at)`` method, which is
+    everything ``time_spec_to_object`` makes. ``fired`` counts how many times
+    ``pop_due`` has given back a specification.
+    """
+    def __init__(self):
+        self.fired = 0
+        self.stale = 0
+
+        self.lock = threading.RLock()
+        self.specs = {}
+        self.entries = {}
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __contains__(self, ident):
+        return ident in self.specs
+
+    @property
+    def stats(self):
+        return {"specs": len(self.specs), "scheduled": len(self.entries), "heap": len(self.heap), "stale": self.stale, "fired": self.fired}
+
+    def add(self, ident, spec, after=None):
+        """
+        Add this specification and work out when it first fires after ``after``
+
+        ``after`` defaults to now. Specifications that never fire are kept but
+        aren't put on the heap.
+        """
+        with self.lock:
+            if ident in self.specs:
+                raise AlreadyScheduled(ident=ident)
+            self.specs[ident] = spec
+            self.schedule(ident, spec.following(after or clock.now()), after)
+
+    def remove(self, ident):
+        """Forget this specification and return it"""
+        with self.lock:
+            if ident not in self.specs:
+                raise NotScheduled(ident=ident)
+            self.unschedule(ident)
+            return self.specs.pop(ident)
+
+    def update(self, ident, spec, after=None):
+        """Replace the specification for this id and work out when it next fires after ``after``"""
+        with self.lock:
+            if ident not in self.specs:
+                raise NotScheduled(ident=ident)
+            self.unschedule(ident)
+            self.specs[ident] = spec
+            self.schedule(ident, spec.following(after or clock.now()), after)
+
+    def next_time(self, ident):
+        """Return when this specification next fires, or None if it won't"""
+        with self.lock:
+            if ident not in self.specs:
+                raise NotScheduled(ident=ident)
+            entry = self.entries.get(ident)
+            return entry[0] if entry else None
+
+    def peek(self):
+        """Return (time, id) for the specification that fires soonest, or None"""
+        with self.lock:
+            self.drop_removed()
+            if not self.heap:
+                return None
+            return self.heap[0][0], self.heap[0][2]
+
+    def pop_due(self, now, limit=None):
+        """
+        Return [(time, id), ...] in order for everything that fires at or before now
+
+        After a specification fires we ask it when it fires next, so one
+        that fires every minute appears once for each minute up to now. If we
+        stop at ``limit`` the rest are left for the next call.
+        """
+        due = []
+        with self.lock:
+            while limit is None or len(due) < limit:
+                self.drop_removed()
+                if not self.heap or self.heap[0][0] > now:
+                    break
+
+                when, _, ident = self.heap[0]
+                due.append((when, ident))
+
+                nxt = self.specs[ident].following(when)
+                if nxt is None or nxt <= when:
+                    heapq.heappop(self.heap)
+                    del self.entries[ident]
+                else:
+                    entry = [nxt, next(self.counter), ident]
+                    heapq.heapreplace(self.heap, entry)
+                    self.entries[ident] = entry
+
+            self.fired += len(due)
+        return due
+
+    def schedule(self, ident, when, after):
+        if when is None or (after is not None and when < after):
+            return
+        entry = [when, next(self.counter), ident]
+        self.entries[ident] = entry
+        heapq.heappush(self.heap, entry)
+
+    def unschedule(self, ident):
+        entry = self.entries.pop(ident, None)
+        if entry is None:
+            return
+
+        entry[2] = removed
+        self.stale += 1
+        if self.stale > len(self.entries):
+            self.heap = [entry for entry in self.heap if entry[2] is not removed]
+            heapq.heapify(self.heap)
+            self.stale = 0
+
+    def drop_removed(self):
+        while self.heap and self.heap[0][2] is removed:
+            heapq.heappop(self.heap)
+            self.stale -= 1
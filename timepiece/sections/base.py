@@ -3,10 +3,17 @@ from input_algorithms import spec_base as sb
 from input_algorithms.dictobj import dictobj
 from input_algorithms.meta import Meta
 
+from timepiece import vectorized, clock
+
 from delfick_error import DelfickError
 
+import functools
+
 EmptyMeta = Meta.empty()
 
+class FrozenSpec(DelfickError):
+    desc = "Interned specifications can't be changed"
+
 default_available_sections = {}
 class a_section(object):
     def __init__(self, name):
@@ -17,11 +24,119 @@ class a_section(object):
         kls._section_name = self.name.replace("Spec", "")
         return kls
 
+def remember_following(func):
+    """
+    Decorate following(at) so it remembers the last time it gave back
+
+    at defaults to ``clock.now()``.
+    Once following(at) gives t, it gives t for every time from at up to t,
+    so calls in that window are answered from the memo. The memo is one
+    (at, t) tuple that is replaced in one go, so threads only ever see a
+    whole one.
+
+    We only remember for interned specs, which are frozen along with
+    everything inside them and have tuples instead of lists. Anything else
+    could be changed underneath us, for example by appending to the filters of
+    a spec inside it. Specs that say ``remembers_following`` is False are
+    always worked out.
+    """
+    @functools.wraps(func)
+    def following(self, at=None):
+        if at is None:
+            at = clock.now()
+
+        if not self._interned:
+            return func(self, at)
+
+        memo = self.__dict__.get("_following_memo")
+        if memo is not None:
+            last, answer = memo
+            if (last.tzinfo is None) is (at.tzinfo is None) and last <= at < answer:
+                return answer
+
+        answer = func(self, at)
+        if answer is not None and (answer.tzinfo is None) is (at.tzinfo is None) and answer > at and self.remembers_following:
+            self.__dict__["_following_memo"] = (at, answer)
+        return answer
+    return following
+
+def hashable(val):
+    if type(val) is list or type(val) is tuple:
+        return tuple(hashable(v) for v in val)
+    return val
+
 class BaseSpec(dictobj.Spec):
+    # Whether making this object depends on when or how many times it's made
+    # For example ``now()`` or the random amount from ``range()``
+    time_dependent = False
+
+    # Set by timepiece.interning.Interner on objects that are shared
+    _interned = False
+
+    # Whether following(at) can remember its answer, see remember_following
+    remembers_following = True
+
+    def __hash__(self):
+        return hash((type(self), ) + tuple(hashable(self[name]) for name in self.fields))
+
+    def __eq__(self, other):
+        # Interned specs have tuples where other specs have lists
+        if not isinstance(other, BaseSpec):
+            return super(BaseSpec, self).__eq__(other)
+        return dict((k, hashable(v)) for k, v in self.items()) == dict((k, hashable(v)) for k, v in other.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __setitem__(self, key, val):
+        if self._interned and key in self.fields:
+            raise FrozenSpec(kls=self.__class__.__name__, field=key)
+        super(BaseSpec, self).__setitem__(key, val)
+
+    def __setattr__(self, key, val):
+        if self._interned and key in self.fields:
+            raise FrozenSpec(kls=self.__class__.__name__, field=key)
+        super(BaseSpec, self).__setattr__(key, val)
 
     def simplify(self):
         return self
 
+    def check_complete(self, meta):
+        """
+        Complain if this can't be used, for things that normalising each field
+        doesn't catch. The visitor calls this unless it was told not to
+        validate.
+        """
+
+    def is_filtered_many(self, times):
+        """
+        Say whether each of these times is filtered, like calling is_filtered on each
+
+        With numpy installed times can be an array of datetime64 and we return
+        a boolean array, otherwise we return a list of booleans.
+        """
+        fields = vectorized.fields(times)
+        if fields is None:
+            return vectorized.each(self.is_filtered, times)
+        return self.filtered_fields(fields)
+
+    def filtered_fields(self, fields):
+        """Return a boolean array for a vectorized.Fields; override this to do it without is_filtered"""
+        return fields.each(self.is_filtered)
+
+    def occurrences_array(self, start, end):
+        """
+        Return the times from ``occurrences(start, end)`` as an array
+
+        With numpy installed this is an array of datetime64, otherwise an
+        array("q") of seconds since the epoch.
+        """
+        return vectorized.occurrences_array(self, start, end)
+
+    def occurrence_times(self, numpy, start, end):
+        """Return a datetime64 array of occurrences; override this to do it without occurrences"""
+        return vectorized.from_datetimes(numpy, self.occurrences(start, end))
+
     def or_with(self, other):
         raise BadSpecValue("Sorry, can't do {0} | {1}".format(self.__class__.__name__, other.__class__.__name__))
 
@@ -63,6 +178,17 @@ class none_spec(sb.Spec):
         else:
             raise BadSpecValue("Expected None", got=val, meta=meta)
 
+class degrees_spec(sb.Spec):
+    """A float between -limit and limit"""
+    def setup(self, limit):
+        self.limit = limit
+
+    def normalise_filled(self, meta, val):
+        val = sb.float_spec().normalise(meta, val)
+        if not -self.limit <= val <= self.limit:
+            raise BadSpecValue("Expected degrees between -{0} and {0}".format(self.limit), got=val, meta=meta)
+        return val
+
 class JoinerSpec(sb.Spec):
     ErrorKls = DelfickError
 
@@ -82,6 +208,7 @@ class SectionSpec(sb.Spec):
     ErrorKls = DelfickError
 
     def setup(self, available_sections=None):
+        self.time_dependent = False
         if available_sections is None:
             self.available_sections = default_available_sections
         else:
@@ -112,6 +239,9 @@ class SectionSpec(sb.Spec):
             raise BadSpecValue("Unknown section type", meta=meta, wanted=val[0], available=list(self.available_sections.keys()))
 
         made = self.available_sections[val[0]].normalise(meta, val[1])
+        if getattr(made, "time_dependent", False):
+            self.time_dependent = True
+
         simplified = None
         while made is not simplified:
             if simplified is not None:
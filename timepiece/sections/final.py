@@ -1,16 +1,48 @@
-from timepiece.sections.base import BaseSpec, ssv_spec, none_spec, section_repr, fieldSpecs_from
+from timepiece.sections.base import BaseSpec, ssv_spec, none_spec, section_repr, fieldSpecs_from, remember_following
 from timepiece.helpers import memoized_property
+from timepiece import vectorized, clock
 
 from input_algorithms import spec_base as sb
 from input_algorithms.dictobj import dictobj
 from input_algorithms.meta import Meta
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date, MINYEAR, MAXYEAR
+import itertools
+import heapq
 
 EmptyMeta = Meta.empty()
 
+def unique(times):
+    """Remove repeated values from an ordered iterable of times"""
+    last = None
+    for time in times:
+        if time != last:
+            yield time
+            last = time
+
+def latest(dt):
+    """The biggest datetime we can compare with dt"""
+    return datetime.max.replace(tzinfo=dt.tzinfo)
+
 weekday_names = ["mon", "tues", "wed", "thur", "fri", "sat", "sun"]
 
+# How far ahead we look for a time that gets through some filters
+# The days of the week fall on the same days of the year every 28 years
+filter_search_years = 28
+
+# How many times in a row a filter may reject an occurrence before we skip ahead
+skip_after_rejections = 8
+
+def years_after(dt, years):
+    """Return dt this many years later, or the end of time if that is too far"""
+    year = dt.year + years
+    if year > 9999:
+        return latest(dt)
+    if dt.month == 2 and dt.day == 29:
+        # This year may not be a leap year
+        dt = dt.replace(day=28)
+    return dt.replace(year=year)
+
 def repeat_every_spec():
     return fieldSpecs_from(IntervalsSpec)
 
@@ -47,9 +79,26 @@ class RepeatSpec(BaseSpec):
 
         return self.every.is_filtered(at)
 
+    def filtered_fields(self, fields):
+        start = fields.datetime64(self.start.datetime)
+        end = fields.datetime64(self.end.datetime) if self.end else None
+        if start is None or (self.end and end is None):
+            return fields.each(self.is_filtered)
+
+        mask = fields.times >= start
+        if end is not None:
+            mask &= fields.times <= end
+        return mask & self.every.filtered_fields(fields)
+
+    @property
+    def remembers_following(self):
+        # Sunrise and sunset starts are today's time, so our answers change each day
+        return not self.start.time_dependent
+
+    @remember_following
     def following(self, at=None):
         if at is None:
-            at = datetime.utcnow()
+            at = clock.now()
 
         if self.end and at > self.end.datetime:
             return
@@ -60,6 +109,58 @@ class RepeatSpec(BaseSpec):
         if self.every:
             return self.every.following(at, self.start.datetime, self.end.datetime if self.end is not None else None)
 
+    def occurrences(self, start, end=None, limit=None):
+        """
+        Yield the times this repeats from start up to and including end
+
+        This gives the same times as feeding the result of ``following`` back
+        into itself, but keeps the interval generators going instead of
+        starting them again for every time.
+        """
+        return itertools.islice(self.each_occurrence(start, end), limit)
+
+    def each_occurrence(self, at, until=None):
+        if until is None:
+            until = latest(at)
+
+        if self.end is not None:
+            if at > self.end.datetime:
+                return
+            until = min(until, self.end.datetime)
+
+        if at < self.start.datetime:
+            first = self.start.following(at)
+            if first is None or first > until:
+                return
+            yield first
+            at = first
+
+        if self.every:
+            for nxt in self.every.occurrences(at, self.start.datetime, until):
+                yield nxt
+
+    def occurrence_times(self, numpy, at, until):
+        if self.end is not None:
+            if at > self.end.datetime:
+                return vectorized.empty(numpy)
+            vectorized.epoch_us(numpy, self.end.datetime)
+            until = min(until, self.end.datetime)
+
+        start = self.start.datetime
+        vectorized.epoch_us(numpy, start)
+
+        first = vectorized.empty(numpy)
+        if at < start:
+            nxt = self.start.following(at)
+            if nxt is None or nxt > until:
+                return first
+            first = numpy.array([nxt], dtype="datetime64[us]")
+            at = nxt
+
+        if not self.every:
+            return first
+        return numpy.concatenate([first, self.every.occurrence_times(numpy, at, start, until)])
+
     def duration(self):
         return self.start.datetime(), self.end.datetime() if self.end is not None else self.end
 
@@ -96,17 +197,170 @@ class RepeatSpec(BaseSpec):
         else:
             super(RepeatSpec, self).or_with(other)
 
+def iso_year_start(year):
+    """The ordinal of the Monday that starts iso week 1, which is the week with January 4th"""
+    jan4 = date(year, 1, 4).toordinal()
+    return jan4 - (jan4 - 1) % 7
+
+def year_weeks(year):
+    """
+    Return (previous, start, following, offset) for gregorian_week
+
+    previous, start and following are the ordinals that iso weeks start
+    counting from for the year before, this year and the year after. offset
+    is 1 if the first Monday of the year is in iso week 2, which is when the
+    year starts on a Tuesday, Wednesday or Thursday.
+    """
+    previous = iso_year_start(year - 1) if year > MINYEAR else float("-inf")
+    following = iso_year_start(year + 1) if year < MAXYEAR else float("inf")
+    offset = 1 if date(year, 1, 1).weekday() in (1, 2, 3) else 0
+    return previous, iso_year_start(year), following, offset
+
+# Filled in by gregorian_week as it sees each year
+gregorian_years = {}
+
 def gregorian_week(dt):
-    """Thanks http://stackoverflow.com/a/32638267"""
-    # The isocalendar week for this date
-    iso_week = dt.isocalendar()[1]
+    """
+    The iso week of dt, less one if the first Monday of the year isn't in iso
+    week 1 (originally from http://stackoverflow.com/a/32638267)
+
+    This is worked out from the ordinal of dt and the numbers for its year in
+    gregorian_years, rather than from strptime and isocalendar.
+    """
+    year = dt.year
+    weeks = gregorian_years.get(year)
+    if weeks is None:
+        weeks = gregorian_years[year] = year_weeks(year)
+    previous, start, following, offset = weeks
+
+    ordinal = dt.toordinal()
+    if ordinal < start:
+        week = (ordinal - previous) // 7 + 1
+    elif ordinal >= following:
+        week = 1
+    else:
+        week = (ordinal - start) // 7 + 1
+    return week - offset
+
+def day_of_year(dt):
+    """Same as dt.timetuple().tm_yday"""
+    return dt.toordinal() - date(dt.year, 1, 1).toordinal() + 1
+
+def bitmask(values, highest):
+    """Return an int with bit n set for each n in values from 0 to highest"""
+    mask = 0
+    for value in values:
+        if 0 <= value <= highest:
+            mask |= 1 << value
+    return mask
+
+def bits(mask):
+    """Return the values set in this bitmask in order"""
+    return [n for n in range(mask.bit_length()) if mask >> n & 1]
+
+class CompiledFilter(object):
+    """
+    A FilterSpec as a bitmask of the allowed values for each field
+
+    Bit n of a mask is set when n is allowed, so minutes uses bits 0 to 59,
+    weeks 0 to 53, months 1 to 12, day_numbers 1 to 366 and day_names has mon
+    as bit 0. A mask of None means the field isn't specified.
+    """
+    highest = {"minutes": 59, "hours": 23, "weeks": 53, "months": 12, "day_names": 6, "day_numbers": 366}
+    fields = ("minutes", "hours", "weeks", "months", "day_names", "day_numbers")
+    __slots__ = fields
+
+    def __init__(self, minutes=None, hours=None, weeks=None, months=None, day_names=None, day_numbers=None):
+        self.minutes = minutes
+        self.hours = hours
+        self.weeks = weeks
+        self.months = months
+        self.day_names = day_names
+        self.day_numbers = day_numbers
+
+    @classmethod
+    def from_filter(kls, spec):
+        masks = {}
+        for name in kls.fields:
+            values = getattr(spec, name)
+            if values in (sb.NotSpecified, None):
+                continue
+            if name == "day_names":
+                values = [weekday_names.index(value) for value in values]
+            masks[name] = bitmask(values, kls.highest[name])
+        return kls(**masks)
+
+    def merged(self, other):
+        """Allow the values from both filters for each field, like adding their lists together"""
+        masks = {}
+        for name in self.fields:
+            mine = getattr(self, name)
+            theirs = getattr(other, name)
+            if mine is None or theirs is None:
+                masks[name] = theirs if mine is None else mine
+            else:
+                masks[name] = mine | theirs
+        return CompiledFilter(**masks)
+
+    def intersected(self, other):
+        """Only allow the values that both filters allow, so a time gets through this if it gets through both"""
+        masks = {}
+        for name in self.fields:
+            mine = getattr(self, name)
+            theirs = getattr(other, name)
+            if mine is None or theirs is None:
+                masks[name] = theirs if mine is None else mine
+            else:
+                masks[name] = mine & theirs
+        return CompiledFilter(**masks)
+
+    def as_fields(self):
+        """Return the options for a FilterSpec with the values in our masks"""
+        options = {}
+        for name in self.fields:
+            mask = getattr(self, name)
+            if mask is not None:
+                if name == "day_names":
+                    options[name] = [weekday_names[n] for n in bits(mask)]
+                else:
+                    options[name] = [str(n) for n in bits(mask)]
+        return options
+
+    def is_filtered(self, at):
+        if self.minutes is not None and not self.minutes >> at.minute & 1:
+            return False
+        if self.hours is not None and not self.hours >> at.hour & 1:
+            return False
+        if self.months is not None and not self.months >> at.month & 1:
+            return False
+        if self.day_names is not None and not self.day_names >> at.weekday() & 1:
+            return False
+        if self.day_numbers is not None and not self.day_numbers >> day_of_year(at) & 1:
+            return False
+        if self.weeks is not None and not self.weeks >> gregorian_week(at) & 1:
+            return False
+        return True
+
+    def day_allowed(self, at):
+        if self.day_names is not None and not self.day_names >> at.weekday() & 1:
+            return False
+        if self.day_numbers is not None and not self.day_numbers >> day_of_year(at) & 1:
+            return False
+        if self.weeks is not None and not self.weeks >> gregorian_week(at) & 1:
+            return False
+        return True
 
-    # The baseline Gregorian date for the beginning of our date's year
-    base_greg = datetime.strptime('{0}-1-1'.format(dt.year), "%Y-%W-%w")
+    def next_allowed(self, at, until=None):
+        """Return the first time from at that gets through this filter, like FilterSpec.next_allowed"""
+        if until is None:
+            until = years_after(at, filter_search_years)
 
-    # If the isocalendar week for this date is not 1, we need to
-    # decrement the iso_week by 1 to get the Gregorian week number
-    return iso_week if base_greg.isocalendar()[1] == 1 else iso_week - 1
+        # Month 0 can be in the mask but isn't a month
+        months = None if self.months is None else bits(self.months & ~1)
+        hours = None if self.hours is None else bits(self.hours)
+        minutes = None if self.minutes is None else bits(self.minutes)
+        check_days = any(mask is not None for mask in (self.day_names, self.day_numbers, self.weeks))
+        return skip_to_allowed(at, until, months, hours, minutes, self.day_allowed if check_days else None)
 
 class FilterSpec(BaseSpec):
     def __repr__(self):
@@ -119,41 +373,151 @@ class FilterSpec(BaseSpec):
     day_names = dictobj.Field(lambda: ssv_spec(weekday_names))
     day_numbers = dictobj.Field(lambda: ssv_spec(spec=sb.integer_spec()))
 
+    def __setitem__(self, key, val):
+        super(FilterSpec, self).__setitem__(key, val)
+        if key in self.fields:
+            self.__dict__.pop("_compiled", None)
+
+    @property
+    def compiled(self):
+        """Our CompiledFilter, made the first time it's needed"""
+        compiled = self.__dict__.get("_compiled")
+        if compiled is None:
+            compiled = self.__dict__["_compiled"] = CompiledFilter.from_filter(self)
+        return compiled
+
+    def simplify(self):
+        self.compiled
+        return self
+
     def combine_with(self, other):
         if type(other) is DateTimeSpec:
             return RepeatAndFiltersSpec.using(repeat=RepeatSpec.using(start=other, filters=[self]))
         elif type(other) is RepeatSpec:
             return RepeatAndFiltersSpec.using(repeat=other, filters=[self]).simplify()
         elif type(other) is FilterSpec:
-            kwargs = {}
-            for field in self.fields:
-                kwargs[field] = getattr(self, field) + getattr(other, field)
-            return FilterSpec.using(**kwargs)
+            compiled = self.compiled.merged(other.compiled)
+            combined = FilterSpec.using(**compiled.as_fields())
+            combined.__dict__["_compiled"] = compiled
+            return combined
         elif type(other) is ManyRepeatAndFiltersSpec:
-            new_specs = [RepeatAndFiltersSpec.uing(repeat=s.repeat, filters=s.filters + [self]) for s in other.specs]
+            new_specs = [RepeatAndFiltersSpec.using(repeat=s.repeat, filters=list(s.filters) + [self]) for s in other.specs]
             return ManyRepeatAndFiltersSpec(specs=new_specs)
         else:
-            super(FilterSpec, self).combine_with(self, other)
+            return super(FilterSpec, self).combine_with(other)
 
     def is_filtered(self, at):
-        filtered = True
-        tup = at.timetuple()
+        return self.compiled.is_filtered(at)
+
+    def filtered_fields(self, fields):
+        mask = fields.everything()
         specified = lambda val: val not in (sb.NotSpecified, None)
 
-        if specified(self.minutes) and tup.tm_min not in self.minutes:
-            filtered = False
-        if specified(self.hours) and tup.tm_hour not in self.hours:
-            filtered = False
-        if specified(self.weeks) and gregorian_week(at) not in self.weeks:
-            filtered = False
-        if specified(self.months) and tup.tm_mon not in self.months:
-            filtered = False
-        if specified(self.day_names) and weekday_names[tup.tm_wday] not in self.day_names:
-            filtered = False
-        if specified(self.day_numbers) and tup.tm_yday not in self.day_numbers:
-            filtered = False
-
-        return filtered
+        if specified(self.minutes):
+            mask &= fields.isin("minute", self.minutes)
+        if specified(self.hours):
+            mask &= fields.isin("hour", self.hours)
+        if specified(self.weeks):
+            mask &= fields.isin("week", self.weeks)
+        if specified(self.months):
+            mask &= fields.isin("month", self.months)
+        if specified(self.day_names):
+            mask &= fields.isin("weekday", [weekday_names.index(name) for name in self.day_names])
+        if specified(self.day_numbers):
+            mask &= fields.isin("day_of_year", self.day_numbers)
+
+        return mask
+
+    def allowed(self, name, low, high):
+        """Return a sorted list of the values for this field between low and high, or None if it isn't specified"""
+        val = getattr(self, name)
+        if val in (sb.NotSpecified, None):
+            return None
+        return sorted(set(v for v in val if low <= v <= high))
+
+    def day_allowed(self, at):
+        tup = at.timetuple()
+        if self.day_names not in (sb.NotSpecified, None) and weekday_names[tup.tm_wday] not in self.day_names:
+            return False
+        if self.day_numbers not in (sb.NotSpecified, None) and tup.tm_yday not in self.day_numbers:
+            return False
+        if self.weeks not in (sb.NotSpecified, None) and gregorian_week(at) not in self.weeks:
+            return False
+        return True
+
+    def next_allowed(self, at, until=None):
+        """
+        Return the first time from at that gets through this filter
+
+        Like cron, we jump to the start of the next allowed month, day, hour
+        or minute rather than trying every minute. We give up and return None
+        if we get past until, which defaults to filter_search_years after at.
+        """
+        if until is None:
+            until = years_after(at, filter_search_years)
+
+        months = self.allowed("months", 1, 12)
+        hours = self.allowed("hours", 0, 23)
+        minutes = self.allowed("minutes", 0, 59)
+        check_days = any(val not in (sb.NotSpecified, None) for val in (self.day_names, self.day_numbers, self.weeks))
+        return skip_to_allowed(at, until, months, hours, minutes, self.day_allowed if check_days else None)
+
+def skip_to_allowed(at, until, months, hours, minutes, day_allowed):
+    """
+    Return the first time from at that is in these sorted lists of months,
+    hours and minutes and gets through day_allowed, or None if that's after
+    until
+
+    A list of None allows everything and so does a day_allowed of None.
+    """
+    if not all(allowed is None or allowed for allowed in (months, hours, minutes)):
+        return None
+
+    while at <= until:
+        if months is not None and at.month not in months:
+            later = [month for month in months if month > at.month]
+            if later:
+                at = at.replace(month=later[0], day=1, hour=0, minute=0, second=0, microsecond=0)
+            else:
+                at = at.replace(year=at.year + 1, month=months[0], day=1, hour=0, minute=0, second=0, microsecond=0)
+            continue
+
+        if day_allowed is not None and not day_allowed(at):
+            at = (at + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            continue
+
+        if hours is not None and at.hour not in hours:
+            later = [hour for hour in hours if hour > at.hour]
+            if later:
+                at = at.replace(hour=later[0], minute=0, second=0, microsecond=0)
+            else:
+                at = (at + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            continue
+
+        if minutes is not None and at.minute not in minutes:
+            later = [minute for minute in minutes if minute > at.minute]
+            if later:
+                at = at.replace(minute=later[0], second=0, microsecond=0)
+            else:
+                at = (at + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+            continue
+
+        return at
+
+def next_allowed(filters, at, until=None):
+    """Return the first time from at that gets through all of these filters, or None"""
+    while True:
+        moved = False
+        for f in filters:
+            nxt = f.next_allowed(at, until)
+            if nxt is None:
+                return None
+            if nxt != at:
+                at = nxt
+                moved = True
+
+        if not moved:
+            return at
 
 class RepeatAndFiltersSpec(BaseSpec):
     def __repr__(self):
@@ -162,12 +526,93 @@ class RepeatAndFiltersSpec(BaseSpec):
     repeat = dictobj.Field(lambda: fieldSpecs_from(RepeatSpec), wrapper=sb.required)
     filters = dictobj.Field(sb.listof(fieldSpecs_from(FilterSpec)))
 
+    @property
+    def remembers_following(self):
+        return self.repeat.remembers_following
+
+    @remember_following
     def following(self, at):
-        return self.repeat.following(at)
+        """
+        Return the first time after at from our repeat that gets through our
+        filters
+
+        When a time doesn't get through we ask the filters for the next time
+        they would allow and carry on from there.
+        """
+        nxt = self.repeat.following(at)
+        if not self.filters:
+            return nxt
+
+        until = years_after(at, filter_search_years)
+        while nxt is not None and nxt <= until:
+            if self.is_filtered(nxt):
+                return nxt
+
+            allowed = next_allowed(self.filters, nxt, until)
+            if allowed is None:
+                return None
+
+            # following gives times after what we pass in and allowed itself may be a match
+            nxt = self.repeat.following(allowed - timedelta(microseconds=1))
+
+    def occurrences(self, start, end=None, limit=None):
+        """
+        Yield the times from our repeat between start and end that get through
+        our filters
+
+        This uses the same skip ahead as ``following`` when the filters reject
+        lots of times in a row. We give up filter_search_years after the last
+        time we found if there is no end.
+        """
+        if not self.filters:
+            return self.repeat.occurrences(start, end, limit)
+        return itertools.islice(self.each_occurrence(start, end), limit)
+
+    def each_occurrence(self, at, until=None):
+        times = self.repeat.occurrences(at, until)
+        rejected = 0
+
+        while True:
+            nxt = next(times, None)
+            if nxt is None:
+                return
+
+            if self.is_filtered(nxt):
+                rejected = 0
+                at = nxt
+                yield nxt
+                continue
+
+            # Only start again from where the filters allow if we keep getting
+            # rejected, as starting again isn't free for every kind of interval
+            rejected += 1
+            if rejected < skip_after_rejections:
+                continue
+
+            search_until = years_after(at, filter_search_years)
+            if until is not None:
+                search_until = min(search_until, until)
+
+            allowed = next_allowed(self.filters, nxt, search_until)
+            if allowed is None:
+                return
+
+            rejected = 0
+            times = self.repeat.occurrences(allowed - timedelta(microseconds=1), until)
 
     def is_filtered(self, at):
         return all(f.is_filtered(at) for f in self.filters)
 
+    def filtered_fields(self, fields):
+        mask = fields.everything()
+        for f in self.filters:
+            mask &= f.filtered_fields(fields)
+        return mask
+
+    def occurrence_times(self, numpy, start, end):
+        times = self.repeat.occurrence_times(numpy, start, end)
+        return times[self.filtered_fields(vectorized.Fields(numpy, times))]
+
     def simplify(self):
         return ManyRepeatAndFiltersSpec.using(specs=[self])
 
@@ -177,14 +622,34 @@ class ManyRepeatAndFiltersSpec(BaseSpec):
     specifies = ("repeat", "filter")
     specs = dictobj.Field(sb.listof(fieldSpecs_from(RepeatAndFiltersSpec)))
 
+    @property
+    def remembers_following(self):
+        return all(rf.remembers_following for rf in self.specs)
+
+    @remember_following
     def following(self, at=None):
         if at is None:
-            at = datetime.utcnow()
-        return min([rf.following(at) for rf in self.specs])
+            at = clock.now()
+        found = [nxt for nxt in [rf.following(at) for rf in self.specs] if nxt is not None]
+        return min(found) if found else None
+
+    def occurrences(self, start, end=None, limit=None):
+        """Yield the times from all our specs between start and end in order"""
+        times = heapq.merge(*[rf.occurrences(start, end) for rf in self.specs])
+        return itertools.islice(unique(times), limit)
 
     def is_filtered(self, at):
         return any(rf.is_filtered(at) for rf in self.specs)
 
+    def filtered_fields(self, fields):
+        mask = fields.everything(False)
+        for rf in self.specs:
+            mask |= rf.filtered_fields(fields)
+        return mask
+
+    def occurrence_times(self, numpy, start, end):
+        return vectorized.merged(numpy, [rf.occurrence_times(numpy, start, end) for rf in self.specs])
+
 class DateTimeSpec(BaseSpec):
     __repr__ = section_repr
     _section_name = "Datetime"
@@ -207,7 +672,7 @@ class DateTimeSpec(BaseSpec):
 
     def following(self, at=None):
         if at is None:
-            at = datetime.utcnow()
+            at = clock.now()
         at = at.replace(microsecond=0)
         return None if at > self.datetime else self.datetime
 
@@ -223,6 +688,12 @@ class DateTimeSpec(BaseSpec):
 
         return False
 
+    def filtered_fields(self, fields):
+        dt = fields.datetime64(self.datetime)
+        if dt is None:
+            return fields.each(self.is_filtered)
+        return (fields.times >= dt) & (fields.times - dt < fields.numpy.timedelta64(30, "s"))
+
     def combine_with(self, other):
         from timepiece.sections import sections
         one = RepeatSpec.using(start=self)
@@ -284,67 +755,43 @@ class IntervalsSpec(BaseSpec):
         """Assume that this has been triggered because of using the following method, so don't reprocess"""
         return True
 
-    def following(self, at, start, end):
-        repeaters = []
-
-        # Make a list of generators from our intervals
-        for interval in self.intervals:
-            repeaters.append(iter(interval.following(at, start, end)))
-
-        # Keep generating a "round" of the next result from each repeater
-        # Until:
-        #
-        #  * we have no valid values in a round
-        #  * we have a value greater than `at`
-        #  * we have attempted this over 100 times
-        #
-        round_count = -1
-        while True:
-            round_count += 1
-            next_round = []
-
-            # Fill out the next_round with valid values
-            #
-            # Where valid is:
-            # * not None
-            # * greater than start
-            # * less or equal to end (minus microseconds)
-
-            new_repeaters = []
-            for repeater in repeaters:
-                try:
-                    nxt = next(repeater)
-                except StopIteration:
-                    pass
-                else:
-                    if nxt and nxt.replace(microsecond=0) <= end:
-                        if nxt >= start and nxt >= at:
-                            next_round.append(nxt)
-                        new_repeaters.append(repeater)
-
-            # Replace our repeaters with the ones that had valid values
-            repeaters = new_repeaters
-
-            # Quit if no more repeaters
-            if not repeaters:
-                break
-
-            # No values this round, try again
-            # i.e. all values were before the start date
-            if not next_round:
-                if round_count > 100:
-                    break
-                else:
-                    continue
-
-            # Find soonest following time
-            mn = min(next_round)
+    def filtered_fields(self, fields):
+        return fields.everything()
+
+    def occurrences(self, at, start, end):
+        """
+        Yield the times after at from all our intervals in order
+
+        We keep a heap of the next time from each interval and only move on
+        the interval we just took a time from, so each time costs log(k) for
+        k intervals. An interval is dropped when it finishes, gives a time
+        after end, or gives a time that isn't after the last one it gave.
+        """
+        heap = []
+        for index, interval in enumerate(self.intervals):
+            repeater = iter(interval.following(at, start, end))
+            nxt = next(repeater, None)
+            if nxt and (end is None or nxt.replace(microsecond=0) <= end):
+                heap.append((nxt, index, repeater))
+        heapq.heapify(heap)
+
+        last = None
+        while heap:
+            nxt, index, repeater = heap[0]
+            if nxt >= start and nxt > at and nxt != last:
+                last = nxt
+                yield nxt
+
+            after = next(repeater, None)
+            if after and after > nxt and (end is None or after.replace(microsecond=0) <= end):
+                heapq.heapreplace(heap, (after, index, repeater))
+            else:
+                heapq.heappop(heap)
+
+    def occurrence_times(self, numpy, at, start, end):
+        """The times from occurrences(at, start, end) as one sorted array without repeats"""
+        return vectorized.merged(numpy, [interval.following_array(numpy, at, start, end) for interval in self.intervals])
 
-            # Return the min if it's greater than our starting point
-            if mn > at:
-                return mn
-
-            # Let's not spin forever and ever
-            if round_count > 100:
-                return mn
+    def following(self, at, start, end):
+        return next(self.occurrences(at, start, end), None)
 
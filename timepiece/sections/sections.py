@@ -1,31 +1,38 @@
-from timepiece.sections.base import a_section, BaseSpec, ssv_spec, section_repr, fieldSpecs_from
-from timepiece.sizing import valid_sizes, convert_amount, common_size, Sizes
-from timepiece.helpers import memoized_property
+from timepiece.sections.base import a_section, BaseSpec, ssv_spec, degrees_spec, section_repr, fieldSpecs_from, remember_following
+from timepiece.sizing import valid_sizes, convert_amount, common_size, approximate_seconds, as_timedelta, is_relative, scaled
+from timepiece.helpers import memoized_property, lazy_module
 from timepiece.sections import final
+from timepiece import vectorized, solar, clock
 
 from input_algorithms.errors import BadSpecValue
 from input_algorithms import spec_base as sb
 from input_algorithms.dictobj import dictobj
 from input_algorithms.meta import Meta
 
-from dateutil.relativedelta import relativedelta
 from datetime import datetime, timedelta
 import datetime as datetime_module
-import aniso8601
+import itertools
+import operator
 import random
 
+# These are only needed for some sections, so only import them when they are used
+relativedelta = lazy_module("dateutil.relativedelta")
+aniso8601 = lazy_module("aniso8601")
+
 EmptyMeta = Meta.empty()
 
 class Forever(BaseSpec):
     __repr__ = section_repr
+    time_dependent = True
     def simplify(self):
-        return final.DateTimeSpec.contain(datetime.utcnow() + timedelta(hours=24 * 365))
+        return final.DateTimeSpec.contain(clock.now() + timedelta(hours=24 * 365))
 
 @a_section("now")
 class NowSpec(BaseSpec):
     __repr__ = section_repr
+    time_dependent = True
     def simplify(self):
-        return final.DateTimeSpec.contain(datetime.utcnow())
+        return final.DateTimeSpec.contain(clock.now())
 
 @a_section("amount")
 class AmountSpec(BaseSpec):
@@ -40,43 +47,91 @@ class AmountSpec(BaseSpec):
             return self
         return AmountSpec.using(num=convert_amount(self.size, new_size, self.num), size=new_size)
 
-    def interval(self, start, at, end):
+    def as_delta(self):
+        """Return this amount as a relativedelta, complaining if it doesn't move time forward"""
         num = self.num
         size = self.size
-        nxt = start
-        if type(size) is relativedelta:
+        if type(size) is relativedelta.relativedelta:
             if num != 1:
                 raise BadSpecValue("Num was not 1 when AmountSpec specified with a relativedelta size", num=num)
             delta = size
-
         else:
-            if at > nxt:
-                difference = (at - nxt).total_seconds()
-                if size == Sizes.SECOND.value:
-                    nxt += timedelta(seconds=int(difference/num) * num)
-
-                elif size == Sizes.MINUTE.value:
-                    nxt += timedelta(minutes=int(difference/60/num) * num)
-
-                elif size == Sizes.HOUR.value:
-                    nxt += timedelta(hours=int(difference/3600/num) * num)
+            delta = relativedelta.relativedelta(**{"{0}s".format(size): num})
+
+        if approximate_seconds(delta) <= 0:
+            raise BadSpecValue("Interval must move time forward", num=num, size=size)
+        return delta
+
+    def interval_array(self, numpy, start, at, end):
+        """
+        Return the times from ``interval(start, at, end)`` as an array of datetime64[us]
+
+        Fixed size amounts are start plus a range of multiples of the amount.
+        Months and years aren't a fixed size, so we use interval for those.
+        """
+        delta = self.as_delta()
+        fixed = as_timedelta(delta) if is_relative(delta) else None
+        if fixed is None:
+            return numpy.array(list(self.interval(start, at, end)), dtype="datetime64[us]")
+
+        start_us = vectorized.epoch_us(numpy, start)
+        at_us = vectorized.epoch_us(numpy, at)
+        step = fixed // timedelta(microseconds=1)
+        if at_us < start_us:
+            return vectorized.empty(numpy)
+
+        # interval compares the time without microseconds to end
+        last_us = (vectorized.epoch_us(numpy, end) // 1000000 + 1) * 1000000 - 1
+
+        first = (at_us - start_us) // step + 1
+        last = (last_us - start_us) // step
+        if last < first:
+            return vectorized.empty(numpy)
+        return (numpy.arange(first, last + 1, dtype="int64") * step + start_us).astype("datetime64[us]")
 
-                elif size == Sizes.DAY.value:
-                    nxt += timedelta(days=int(difference/3600*24/num) * num)
-
-            delta = relativedelta(**{"{0}s".format(size): num})
-
-        while nxt <= at:
-            nxt += delta
-
-        while True:
-            if nxt > start and nxt.replace(microsecond=0) <= end:
+    def interval(self, start, at, end):
+        """
+        Yield the times after at that are a whole number of this amount after
+        start, stopping at end
+
+        We work out the first of these directly rather than stepping from
+        start. Months and years are always added to start, so a monthly
+        interval from the 31st gives the last day of shorter months rather
+        than drifting to the 28th.
+        """
+        delta = self.as_delta()
+        step = approximate_seconds(delta)
+
+        if not is_relative(delta):
+            # We can't multiply things like "on the 3rd", so step from start
+            nxt = start
+            while nxt <= at:
+                nxt += delta
+            times = itertools.accumulate(itertools.chain([nxt], itertools.repeat(delta)), operator.add)
+        else:
+            # The smallest count where start + count * delta is after at
+            count = 0
+            if at >= start:
+                count = max(0, int((at - start).total_seconds() // step) - 1)
+
+            fixed = as_timedelta(delta)
+            if fixed is not None:
+                while start + fixed * count <= at:
+                    count += 1
+                times = itertools.accumulate(itertools.chain([start + fixed * count], itertools.repeat(fixed)), operator.add)
+            else:
+                while start + scaled(delta, count) <= at:
+                    count += 1
+                while count > 1 and start + scaled(delta, count - 1) > at:
+                    count -= 1
+                times = (start + scaled(delta, c) for c in itertools.count(count))
+
+        for nxt in times:
+            if nxt > start and (end is None or nxt.replace(microsecond=0) <= end):
                 yield nxt
             else:
                 break
 
-            nxt += delta
-
 @a_section("interval")
 class IntervalSpec(BaseSpec):
     __repr__ = section_repr
@@ -93,14 +148,21 @@ class IntervalSpec(BaseSpec):
     def following(self, at, start, end):
         yield from self.every.interval(start, at, end)
 
+    def following_array(self, numpy, at, start, end):
+        return self.every.interval_array(numpy, start, at, end)
+
     def is_filtered(self, at):
         """Assume that we got this at from the following method"""
         return True
 
+    def filtered_fields(self, fields):
+        return fields.everything()
+
 @a_section("range")
 class RangeSpec(BaseSpec):
     __repr__ = section_repr
     specifies = ("interval", )
+    time_dependent = True
     min = dictobj.Field(lambda: fieldSpecs_from(AmountSpec), wrapper=sb.required)
     max = dictobj.Field(lambda: fieldSpecs_from(AmountSpec), wrapper=sb.required)
 
@@ -114,6 +176,11 @@ class BetweenSpec(BaseSpec):
     start = dictobj.Field(lambda: fieldSpecs_from(NowSpec, EpochSpec, final.DateTimeSpec, DayNameSpec, DayNumberSpec, TimeSpec, SunRiseSpec, SunSetSpec, ISO8601DateOrTimeSpec), wrapper=sb.required)
     end = dictobj.Field(lambda: fieldSpecs_from(NowSpec, EpochSpec, final.DateTimeSpec, DayNameSpec, DayNumberSpec, TimeSpec, SunRiseSpec, SunSetSpec, ISO8601DateOrTimeSpec), default=None)
 
+    @property
+    def time_dependent(self):
+        # We use Forever when we don't have an end
+        return self.end is None
+
     def simplify(self):
         return final.RepeatSpec.using(start=self.start, end=self.end if self.end is not None else Forever.using().simplify())
 
@@ -197,15 +264,65 @@ class Date(BaseSpec):
         else:
             super(Date, self).combine_with(other)
 
-@a_section("sunrise")
-class SunRiseSpec(BaseSpec):
+class SolarSpec(BaseSpec):
+    """
+    Sunrise or sunset each day at a latitude and longitude
+
+    As the start of a repeat this is the one for today, and on its own it
+    happens every day.
+    """
     __repr__ = section_repr
-    specifies = ("day", "time")
+    specifies = ("repeat", )
+    time_dependent = True
+    latitude = dictobj.Field(lambda: degrees_spec(90), default=None)
+    longitude = dictobj.Field(lambda: degrees_spec(180), default=None)
+
+    # Set by the subclasses to "sunrise" or "sunset"
+    event = None
+
+    def check_complete(self, meta):
+        if self.latitude is None or self.longitude is None:
+            raise BadSpecValue("Need a latitude and longitude to know when the sun rises or sets", latitude=self.latitude, longitude=self.longitude, meta=meta)
+
+    @property
+    def location(self):
+        # We only get this far without both when parsed with validate=False
+        self.check_complete(EmptyMeta)
+        return self.latitude, self.longitude
+
+    @property
+    def datetime(self):
+        today = clock.now().date()
+        found = solar.event_on(self.event, today, *self.location)
+        if found is None:
+            found = solar.following(self.event, datetime.combine(today, datetime_module.time()), *self.location)
+        return found
+
+    @remember_following
+    def following(self, at=None):
+        if at is None:
+            at = clock.now()
+        return solar.following(self.event, at, *self.location)
+
+    def is_filtered(self, at):
+        previous = solar.preceding(self.event, at, *self.location)
+        return previous is not None and at - previous < timedelta(seconds=30)
+
+    def occurrences(self, start, end=None, limit=None):
+        if end is None:
+            end = final.latest(start)
+        return itertools.islice(solar.occurrences(self.event, start, end, *self.location), limit)
+
+    def occurrence_times(self, numpy, start, end):
+        return solar.event_times(numpy, self.event, start, end, *self.location)
+
+@a_section("sunrise")
+class SunRiseSpec(SolarSpec):
+    event = "sunrise"
 
 @a_section("sunset")
-class SunSetSpec(BaseSpec):
-    __repr__ = section_repr
-    specifies = "time"
+class SunSetSpec(SolarSpec):
+    event = "sunset"
 
 @a_section("iso8601")
 class ISO8601Spec(BaseSpec):
@@ -235,6 +352,12 @@ class ISO8601DateOrTimeSpec(ISO8601Spec):
     specification = dictobj.Field(sb.string_spec(), wrapper=sb.required)
     _section_name = "iso8601"
     def simplify(self): return self
+
+    @property
+    def time_dependent(self):
+        # The day is today when we only have a time
+        return self.type == "time"
+
     @memoized_property
     def specifies(self):
         if self.type == "datetime":
@@ -247,7 +370,7 @@ class ISO8601DateOrTimeSpec(ISO8601Spec):
     @property
     def day(self):
         if self.type == "time":
-            return datetime.utcnow().date()
+            return clock.now().date()
         elif self.type == "datetime":
             return self.val.date()
         else:
@@ -0,0 +1,253 @@
+"""
+A compact binary encoding of simplified specification objects.
+
+``dumps`` turns the objects that ``time_spec_to_object`` gives back into
+bytes and ``loads`` turns those bytes straight back into the same objects
+without going through the grammar or the normalisation specs.
+
+The encoding starts with ``b"TP"`` and a version byte. After that every value
+is a one byte tag followed by what that tag needs:
+
+* Integers are zigzag encoded varints
+* Strings are a varint length followed by utf-8
+* Lists are a varint length followed by that many values
+* Datetimes are the proleptic ordinal, seconds into the day and microseconds
+  as varints, and aware datetimes are followed by their utc offset in seconds
+* Specification objects are followed by each of their fields in alphabetical
+  order, so that reordering the fields on a class doesn't change the format
+"""
+from timepiece.sections import final, sections
+
+from input_algorithms import spec_base as sb
+from dateutil.relativedelta import relativedelta
+from delfick_error import DelfickError
+
+from datetime import datetime, timedelta, timezone
+import struct
+
+# Version 2 added latitude and longitude to sunrise and sunset
+VERSION = 2
+HEADER = b"TP"
+
+# The versions we can load and how their fields differ from the current ones
+# Fields that aren't in older data are given their default
+supported_versions = {1: {sections.SunRiseSpec: [], sections.SunSetSpec: []}, 2: {}}
+
+class SerialiseError(DelfickError):
+    desc = "Failed to serialise specification"
+
+class DeserialiseError(DelfickError):
+    desc = "Failed to deserialise specification"
+
+NONE = 0
+NOT_SPECIFIED = 1
+INTEGER = 2
+STRING = 3
+LIST = 4
+NAIVE_DATETIME = 5
+AWARE_DATETIME = 6
+RELATIVEDELTA = 7
+FLOAT = 8
+TRUE = 9
+FALSE = 10
+
+# Never reorder these, only add to the end
+spec_classes = [
+      final.ManyRepeatAndFiltersSpec
+    , final.RepeatAndFiltersSpec
+    , final.RepeatSpec
+    , final.FilterSpec
+    , final.DateTimeSpec
+    , final.IntervalsSpec
+    , sections.IntervalSpec
+    , sections.AmountSpec
+    , sections.SunRiseSpec
+    , sections.SunSetSpec
+    , sections.ISO8601DateOrTimeSpec
+    ]
+
+FIRST_SPEC = 32
+spec_tags = dict((kls, FIRST_SPEC + index) for index, kls in enumerate(spec_classes))
+spec_fields = dict((kls, sorted(kls.fields)) for kls in spec_classes)
+
+def fields_for(version):
+    fields = dict(spec_fields)
+    fields.update(supported_versions[version])
+    return fields
+
+version_fields = dict((version, fields_for(version)) for version in supported_versions)
+
+relativedelta_fields = ["years", "months", "days", "hours", "minutes", "seconds", "microseconds"]
+
+def dumps(obj):
+    """Return bytes representing this specification object"""
+    out = bytearray(HEADER)
+    out.append(VERSION)
+    encode(obj, out)
+    return bytes(out)
+
+def loads(data):
+    """Return the specification object represented by these bytes"""
+    if data[:2] != HEADER:
+        raise DeserialiseError("Data isn't a serialised specification")
+    if len(data) < 3:
+        raise DeserialiseError("Ran out of data")
+    if data[2] not in supported_versions:
+        raise DeserialiseError("Unknown version", got=data[2], supported=sorted(supported_versions))
+
+    try:
+        obj, position = decode(memoryview(data), 3, version_fields[data[2]])
+    except (IndexError, struct.error):
+        raise DeserialiseError("Ran out of data")
+
+    if position != len(data):
+        raise DeserialiseError("Found extra data after the specification", position=position, length=len(data))
+    return obj
+
+def encode(val, out):
+    typ = type(val)
+    if typ in spec_tags:
+        out.append(spec_tags[typ])
+        for name in spec_fields[typ]:
+            encode(val[name], out)
+
+    elif val is None:
+        out.append(NONE)
+    elif val is sb.NotSpecified:
+        out.append(NOT_SPECIFIED)
+    elif val is True:
+        out.append(TRUE)
+    elif val is False:
+        out.append(FALSE)
+
+    elif typ is int:
+        out.append(INTEGER)
+        write_varint((val << 1) ^ (val >> 63) if -2 ** 63 <= val < 2 ** 63 else overflow(val), out)
+
+    elif typ is float:
+        out.append(FLOAT)
+        out.extend(struct.pack("<d", val))
+
+    elif typ is str:
+        encoded = val.encode("utf-8")
+        out.append(STRING)
+        write_varint(len(encoded), out)
+        out.extend(encoded)
+
+    elif typ is list or typ is tuple:
+        out.append(LIST)
+        write_varint(len(val), out)
+        for item in val:
+            encode(item, out)
+
+    elif typ is datetime:
+        offset = val.utcoffset()
+        out.append(NAIVE_DATETIME if offset is None else AWARE_DATETIME)
+        write_varint(val.toordinal(), out)
+        write_varint(val.hour * 3600 + val.minute * 60 + val.second, out)
+        write_varint(val.microsecond, out)
+        if offset is not None:
+            encode(int(offset.total_seconds()), out)
+
+    elif typ is relativedelta:
+        if val.weekday is not None or any(getattr(val, name) is not None for name in ("year", "month", "day", "hour", "minute", "second", "microsecond")) or val.leapdays:
+            raise SerialiseError("Can only serialise relative relativedeltas", got=val)
+        out.append(RELATIVEDELTA)
+        for name in relativedelta_fields:
+            encode(getattr(val, name), out)
+
+    else:
+        raise SerialiseError("Don't know how to serialise this kind of object", got=typ)
+
+def overflow(val):
+    raise SerialiseError("Integer is too large to serialise", got=val)
+
+def write_varint(val, out):
+    while val > 0x7F:
+        out.append((val & 0x7F) | 0x80)
+        val >>= 7
+    out.append(val)
+
+def read_varint(data, position):
+    shift = 0
+    result = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+def decode(data, position, fields=spec_fields):
+    tag = data[position]
+    position += 1
+
+    if tag >= FIRST_SPEC:
+        try:
+            kls = spec_classes[tag - FIRST_SPEC]
+        except IndexError:
+            raise DeserialiseError("Unknown specification", tag=tag, position=position - 1)
+
+        kwargs = {}
+        for name in fields[kls]:
+            kwargs[name], position = decode(data, position, fields)
+
+        # Fill in the fields directly rather than going through the dictobj
+        # constructor, which spends most of its time working out defaults
+        obj = kls.__new__(kls)
+        for name in kls.fields:
+            obj[name] = kwargs[name] if name in kwargs else kls.fields[name].default
+        return obj, position
+
+    elif tag == NONE:
+        return None, position
+    elif tag == NOT_SPECIFIED:
+        return sb.NotSpecified, position
+    elif tag == TRUE:
+        return True, position
+    elif tag == FALSE:
+        return False, position
+
+    elif tag == INTEGER:
+        val, position = read_varint(data, position)
+        return (val >> 1) ^ -(val & 1), position
+
+    elif tag == FLOAT:
+        return struct.unpack_from("<d", data, position)[0], position + 8
+
+    elif tag == STRING:
+        length, position = read_varint(data, position)
+        if position + length > len(data):
+            raise IndexError(position + length)
+        return str(data[position:position + length], "utf-8"), position + length
+
+    elif tag == LIST:
+        length, position = read_varint(data, position)
+        result = []
+        for _ in range(length):
+            item, position = decode(data, position, fields)
+            result.append(item)
+        return result, position
+
+    elif tag == NAIVE_DATETIME or tag == AWARE_DATETIME:
+        ordinal, position = read_varint(data, position)
+        seconds, position = read_varint(data, position)
+        microsecond, position = read_varint(data, position)
+
+        tzinfo = None
+        if tag == AWARE_DATETIME:
+            offset, position = decode(data, position, fields)
+            tzinfo = timezone(timedelta(seconds=offset))
+
+        minutes, second = divmod(seconds, 60)
+        hour, minute = divmod(minutes, 60)
+        return datetime.fromordinal(ordinal).replace(hour=hour, minute=minute, second=second, microsecond=microsecond, tzinfo=tzinfo), position
+
+    elif tag == RELATIVEDELTA:
+        kwargs = {}
+        for name in relativedelta_fields:
+            kwargs[name], position = decode(data, position, fields)
+        return relativedelta(**kwargs), position
+
+    raise DeserialiseError("Unknown tag", tag=tag, position=position - 1)
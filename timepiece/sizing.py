@@ -1,9 +1,12 @@
+from timepiece.helpers import lazy_module
+
 from input_algorithms.errors import BadSpecValue
 
-from dateutil.relativedelta import relativedelta
-from datetime import datetime
+from datetime import timedelta
 import enum
 
+relativedelta = lazy_module("dateutil.relativedelta")
+
 class Sizes(enum.Enum):
     SECOND = "second"
     MINUTE = "minute"
@@ -15,38 +18,95 @@ class Sizes(enum.Enum):
 
 valid_sizes = [s.value for s in Sizes]
 
+# The average length of each size in seconds
+# Months and years are the average over the 400 year cycle of the Gregorian calendar
+average_seconds = {
+      Sizes.SECOND.value: 1
+    , Sizes.MINUTE.value: 60
+    , Sizes.HOUR.value: 3600
+    , Sizes.DAY.value: 86400
+    , Sizes.WEEK.value: 604800
+    , Sizes.MONTH.value: 30.436875 * 86400
+    , Sizes.YEAR.value: 365.2425 * 86400
+    }
+
+# The seconds in each size, with the average month and year
+seconds_in = dict((size, int(seconds)) for size, seconds in average_seconds.items())
+
+# Converting to years from a fixed size counts this many seconds as a year
+seconds_in_counted_year = 365 * 86400
+
+# The months in each calendar size
+calendar_months = {Sizes.MONTH.value: 1, Sizes.YEAR.value: 12}
+
+relative_fields = ["years", "months", "days", "hours", "minutes", "seconds", "microseconds"]
+absolute_fields = ["year", "month", "day", "weekday", "hour", "minute", "second", "microsecond"]
+
+def is_relative(delta):
+    """Say whether this relativedelta only moves time rather than setting parts of it"""
+    return not delta.leapdays and all(getattr(delta, name) is None for name in absolute_fields)
+
+def approximate_seconds(delta):
+    """Roughly how many seconds a relativedelta moves time by"""
+    return (
+          delta.years * average_seconds[Sizes.YEAR.value]
+        + delta.months * average_seconds[Sizes.MONTH.value]
+        + delta.days * 86400
+        + delta.hours * 3600
+        + delta.minutes * 60
+        + delta.seconds
+        + delta.microseconds / 1e6
+        )
+
+def as_timedelta(delta):
+    """Return a timedelta for a relativedelta, or None if it has months or years"""
+    if delta.years or delta.months:
+        return None
+    return timedelta(days=delta.days, hours=delta.hours, minutes=delta.minutes, seconds=delta.seconds, microseconds=delta.microseconds)
+
+def scaled(delta, times):
+    """
+    Return a relativedelta that is this one times times
+
+    Unlike multiplying a relativedelta this keeps fractions of a second
+    """
+    return relativedelta.relativedelta(**dict((name, getattr(delta, name) * times) for name in relative_fields))
+
 def common_size(min_size, max_size):
     if min_size not in valid_sizes or max_size not in valid_sizes:
         raise BadSpecValue("Size must be one of the valid units", first=min_size, second=max_size, valid=valid_sizes)
     return valid_sizes[min([valid_sizes.index(min_size), valid_sizes.index(max_size)])]
 
 def convert_amount(old_size, new_size, old_num):
-    now = datetime.utcnow()
-    class seconds_diff(relativedelta):
-        def _fix(self):
-            pass
+    """
+    Return old_num of old_size as an amount of new_size
+
+    Seconds, minutes, hours, days and weeks are always the same length, so
+    converting between them is a multiply and a divide. Months and years are
+    a whole number of each other, and going between them and the fixed sizes
+    uses the averages from ``average_seconds``, giving whole months or years.
+    Seconds, minutes, hours and days to years is the exception, which counts
+    365 days as a year. Weeks to years counts 52 weeks as a year instead.
+
+    Seconds are given back as is and the other fixed sizes as floats.
+    """
+    if old_size not in seconds_in or new_size not in seconds_in:
+        raise BadSpecValue("Sorry, can't convert amount", have=old_size, want=new_size)
 
     if old_size == Sizes.WEEK.value and new_size == Sizes.YEAR.value and old_num % 52 == 0:
+        # 52 weeks is a day short of a year, but it has always counted as one
         old_num += 1
 
-    delta = relativedelta(**{"{0}s".format(old_size): old_num})
-    if new_size == Sizes.MONTH.value:
-        return relativedelta(now+delta, now).months
-    elif new_size == Sizes.YEAR.value:
-        return relativedelta(now+delta, now).years
+    if new_size == Sizes.YEAR.value and old_size not in calendar_months and old_size != Sizes.WEEK.value:
+        # A year has always been 365 days of these, whatever the leap years
+        return int(old_num * seconds_in[old_size] // seconds_in_counted_year)
 
-    diff = seconds_diff(now+delta, now).seconds
+    if new_size in calendar_months:
+        if old_size in calendar_months:
+            return old_num * calendar_months[old_size] // calendar_months[new_size]
+        return int(old_num * seconds_in[old_size] // seconds_in[new_size])
 
+    seconds = old_num * seconds_in[old_size]
     if new_size == Sizes.SECOND.value:
-        return diff
-    elif new_size == Sizes.MINUTE.value:
-        return diff / 60.0
-    elif new_size == Sizes.HOUR.value:
-        return diff / 3600.0
-    elif new_size == Sizes.DAY.value:
-        return diff / 3600.0 / 24.0
-    elif new_size == Sizes.WEEK.value:
-        return diff / 3600.0 / 24.0 / 7.0
-    else:
-        raise BadSpecValue("Sorry, can't convert amount", have=old_size, want=new_size)
-
+        return seconds
+    return seconds / float(seconds_in[new_size])
@@ -0,0 +1,220 @@
+"""
+Work out sunrise and sunset without going to the network.
+
+This uses the NOAA general solar position equations, which give the equation
+of time and the declination of the sun from the fractional year and find the
+hour angle where the sun is 0.833 degrees below the horizon. Times are worked
+out once at noon and then again at the time that gave, and are good to within
+a minute or two away from the poles.
+
+Latitude is in degrees north and longitude in degrees east, and times are
+datetimes in UTC without a timezone. The event for a day is the one nearest
+local solar noon on that day, so at longitudes far from Greenwich it can land
+on the UTC day before or after. Days where the sun doesn't rise or set give
+None.
+
+Each (event, day, latitude, longitude) is remembered in ``cache``, so asking
+about the same few places over and over is a dictionary lookup. ``year_of``
+works out a whole year at once with numpy and fills the cache while it's
+there.
+"""
+from timepiece.helpers import optional_module
+
+from datetime import datetime, date, timedelta, timezone
+import calendar
+import math
+
+# The sun is this far below the horizon when its top edge is on the horizon
+zenith = math.radians(90.833)
+
+# events -> the sign of the hour angle
+events = {"sunrise": 1, "sunset": -1}
+
+# (event, day, latitude, longitude) -> datetime or None
+cache = {}
+
+# The cache is emptied when it gets this big
+max_cached = 500000
+
+# How many days to look at before deciding the sun is never going to rise or set
+search_days = 370
+
+one_day = timedelta(days=1)
+
+def position(gamma):
+    """Return (equation of time in minutes, declination in radians) for this fractional year"""
+    eqtime = 229.18 * (
+          0.000075 + 0.001868 * math.cos(gamma) - 0.032077 * math.sin(gamma)
+        - 0.014615 * math.cos(2 * gamma) - 0.040849 * math.sin(2 * gamma)
+        )
+    decl = (
+          0.006918 - 0.399912 * math.cos(gamma) + 0.070257 * math.sin(gamma)
+        - 0.006758 * math.cos(2 * gamma) + 0.000907 * math.sin(2 * gamma)
+        - 0.002697 * math.cos(3 * gamma) + 0.00148 * math.sin(3 * gamma)
+        )
+    return eqtime, decl
+
+def event_minutes(event, day, latitude, longitude):
+    """Return minutes after midnight UTC at the start of day for this event, or None"""
+    sign = events[event]
+    lat = math.radians(latitude)
+    days = 366 if calendar.isleap(day.year) else 365
+    day_of_year = day.timetuple().tm_yday
+
+    minutes = 720
+    for _ in range(2):
+        gamma = 2 * math.pi / days * (day_of_year - 1 + (minutes / 60 - 12) / 24)
+        eqtime, decl = position(gamma)
+
+        below = math.cos(lat) * math.cos(decl)
+        if abs(below) < 1e-12:
+            return None
+
+        cos_ha = math.cos(zenith) / below - math.tan(lat) * math.tan(decl)
+        if not -1 <= cos_ha <= 1:
+            return None
+
+        minutes = 720 - 4 * (longitude + sign * math.degrees(math.acos(cos_ha))) - eqtime
+    return minutes
+
+def event_on(event, day, latitude, longitude):
+    """Return the datetime of this event on this day, or None if it doesn't happen"""
+    key = (event, day, latitude, longitude)
+    if key in cache:
+        return cache[key]
+
+    minutes = event_minutes(event, day, latitude, longitude)
+    found = None
+    if minutes is not None:
+        found = datetime(day.year, day.month, day.day) + timedelta(seconds=round(minutes * 60))
+
+    remember(key, found)
+    return found
+
+def remember(key, found):
+    if len(cache) >= max_cached:
+        cache.clear()
+    cache[key] = found
+
+def sunrise(day, latitude, longitude):
+    return event_on("sunrise", day, latitude, longitude)
+
+def sunset(day, latitude, longitude):
+    return event_on("sunset", day, latitude, longitude)
+
+def as_naive(at):
+    """Return (at in UTC without a timezone, whether at had a timezone)"""
+    if at.tzinfo is None:
+        return at, False
+    return at.astimezone(timezone.utc).replace(tzinfo=None), True
+
+def as_given(found, aware):
+    if found is None or not aware:
+        return found
+    return found.replace(tzinfo=timezone.utc)
+
+def following(event, at, latitude, longitude):
+    """
+    Return the first time this event happens after at, or None if it doesn't
+    happen in the next year
+    """
+    at, aware = as_naive(at)
+
+    # The event for a day can be a day and a half either side of midnight
+    day = max(at.date(), date.min + 2 * one_day) - 2 * one_day
+    for _ in range(search_days):
+        found = event_on(event, day, latitude, longitude)
+        if found is not None and found > at:
+            return as_given(found, aware)
+        if day == date.max:
+            return None
+        day += one_day
+
+def preceding(event, at, latitude, longitude):
+    """Return the last time this event happened at or before at, or None if it didn't in the last year"""
+    at, aware = as_naive(at)
+
+    day = min(at.date(), date.max - 2 * one_day) + 2 * one_day
+    for _ in range(search_days):
+        found = event_on(event, day, latitude, longitude)
+        if found is not None and found <= at:
+            return as_given(found, aware)
+        if day == date.min:
+            return None
+        day -= one_day
+
+def occurrences(event, start, end, latitude, longitude):
+    """Yield each time this event happens after start up to and including end"""
+    nxt = start
+    while True:
+        nxt = following(event, nxt, latitude, longitude)
+        if nxt is None or nxt > end:
+            return
+        yield nxt
+
+def event_array(numpy, event, days, latitude, longitude):
+    """
+    Return a datetime64[us] array with the time of this event on each day in
+    an array of datetime64[D], with NaT where it doesn't happen
+    """
+    sign = events[event]
+    lat = numpy.radians(latitude)
+
+    years = days.astype("datetime64[Y]")
+    day_of_year = (days - years.astype("datetime64[D]")).astype("int64") + 1
+    year = years.astype("int64") + 1970
+    in_year = numpy.where((year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0)), 366, 365)
+
+    minutes = numpy.full(len(days), 720.0)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(2):
+            gamma = 2 * numpy.pi / in_year * (day_of_year - 1 + (minutes / 60 - 12) / 24)
+            eqtime = 229.18 * (
+                  0.000075 + 0.001868 * numpy.cos(gamma) - 0.032077 * numpy.sin(gamma)
+                - 0.014615 * numpy.cos(2 * gamma) - 0.040849 * numpy.sin(2 * gamma)
+                )
+            decl = (
+                  0.006918 - 0.399912 * numpy.cos(gamma) + 0.070257 * numpy.sin(gamma)
+                - 0.006758 * numpy.cos(2 * gamma) + 0.000907 * numpy.sin(2 * gamma)
+                - 0.002697 * numpy.cos(3 * gamma) + 0.00148 * numpy.sin(3 * gamma)
+                )
+
+            below = numpy.cos(lat) * numpy.cos(decl)
+            cos_ha = numpy.cos(zenith) / below - numpy.tan(lat) * numpy.tan(decl)
+            cos_ha = numpy.where((numpy.abs(below) < 1e-12) | (cos_ha < -1) | (cos_ha > 1), numpy.nan, cos_ha)
+            minutes = 720 - 4 * (longitude + sign * numpy.degrees(numpy.arccos(cos_ha))) - eqtime
+
+    missing = numpy.isnan(minutes)
+    seconds = numpy.round(numpy.where(missing, 0, minutes) * 60).astype("int64")
+    found = days.astype("datetime64[us]") + seconds.astype("timedelta64[s]")
+    found[missing] = numpy.datetime64("NaT")
+    return found
+
+def year_of(event, year, latitude, longitude):
+    """
+    Return the time of this event on every day of this year and remember them
+    all in the cache
+
+    With numpy this is a datetime64[us] array with NaT for days it doesn't
+    happen, otherwise it's a list of datetimes and None.
+    """
+    numpy = optional_module("numpy")
+    first = date(year, 1, 1)
+    count = 366 if calendar.isleap(year) else 365
+
+    if numpy is None:
+        return [event_on(event, first + timedelta(days=offset), latitude, longitude) for offset in range(count)]
+
+    days = numpy.arange(numpy.datetime64(first, "D"), numpy.datetime64(first, "D") + count)
+    found = event_array(numpy, event, days, latitude, longitude)
+    for day, when in zip(days.tolist(), found.tolist()):
+        remember((event, day, latitude, longitude), when)
+    return found
+
+def event_times(numpy, event, start, end, latitude, longitude):
+    """Return a datetime64[us] array of each time this event happens after start up to and including end"""
+    start_us = numpy.datetime64(start, "us")
+    end_us = numpy.datetime64(end, "us")
+    days = numpy.arange(start_us.astype("datetime64[D]") - 2, end_us.astype("datetime64[D]") + 3)
+    found = event_array(numpy, event, days, latitude, longitude)
+    return found[~numpy.isnat(found) & (found > start_us) & (found <= end_us)]
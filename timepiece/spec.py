@@ -1,6 +1,7 @@
 from timepiece.grammar import TimeSpecGrammar, TimeSpecVisitor
 from timepiece.sections.base import JoinerSpec, SectionSpec
 from timepiece.sections import sections as sections_module
+from timepiece.descent import DescentVisitor
 
 from delfick_error import DelfickError
 
@@ -8,9 +9,23 @@ from delfick_error import DelfickError
 # only imported so sections are registered
 sections_module = sections_module
 
-def make_timepiece(ErrorKls=DelfickError, JoinerSpec=JoinerSpec, SectionSpec=SectionSpec, sections=None):
-	Joiner = type("Joiner", (JoinerSpec, ), {"ErrorKls": ErrorKls})
-	Section = type("Section", (SectionSpec, ), {"ErrorKlss": ErrorKls})
-	Visitor = type("Visitor", (TimeSpecVisitor, ), {"ErrorKls": ErrorKls, "Joiner": Joiner, "Section": Section})
-	return type("Grammar", (TimeSpecGrammar, ), {"Visitor": Visitor})(sections)
+parsers = {"parsimonious": TimeSpecVisitor, "descent": DescentVisitor}
 
+# Grammar classes we have made, so calling make_timepiece with the same options
+# gives back the same classes
+made_grammars = {}
+
+def make_timepiece(ErrorKls=DelfickError, JoinerSpec=JoinerSpec, SectionSpec=SectionSpec, sections=None, cache_size=None, parser="parsimonious", intern=False):
+	if parser not in parsers:
+		raise ErrorKls("Unknown parser", wanted=parser, available=sorted(parsers))
+
+	key = (ErrorKls, JoinerSpec, SectionSpec, parser)
+	if key not in made_grammars:
+		Joiner = type("Joiner", (JoinerSpec, ), {"ErrorKls": ErrorKls})
+		Section = type("Section", (SectionSpec, ), {"ErrorKlss": ErrorKls})
+		Visitor = type("Visitor", (parsers[parser], ), {"ErrorKls": ErrorKls, "Joiner": Joiner, "Section": Section})
+
+		maker = (make_timepiece, {"ErrorKls": ErrorKls, "JoinerSpec": JoinerSpec, "SectionSpec": SectionSpec, "parser": parser})
+		made_grammars[key] = type("Grammar", (TimeSpecGrammar, ), {"Visitor": Visitor, "maker": maker})
+
+	return made_grammars[key](sections, cache_size=cache_size, intern=intern)
@@ -0,0 +1,162 @@
+"""
+Work out is_filtered and occurrences for many times at once
+
+If numpy is installed, the times are put in an array of datetime64 and the
+fields filters care about are worked out for the whole array in one go.
+Otherwise ``is_filtered_many`` falls back to calling ``is_filtered`` on each
+time and gives back a list of booleans.
+
+``occurrences_array`` makes fixed size intervals with numpy.arange and applies
+the bounds of the repeat and the filters to the whole array. Without numpy it
+gives an array("q") of seconds since the epoch from ``occurrences``.
+
+numpy is an optional extra: ``pip install "timepiece[numpy]"``.
+"""
+from timepiece.helpers import optional_module
+
+from datetime import datetime, timezone
+from array import array
+import calendar
+
+class HasTimezone(Exception):
+    """Raised when we find a datetime with a timezone and need to use the datetimes instead"""
+
+def epoch_us(numpy, dt):
+    """Return microseconds since the epoch for a datetime without a timezone"""
+    if dt.tzinfo is not None:
+        raise HasTimezone()
+    return int(numpy.datetime64(dt, "us").astype("int64"))
+
+def from_datetimes(numpy, times):
+    """Make an array of datetime64 from datetimes, putting any with a timezone in UTC"""
+    return numpy.array([t if t.tzinfo is None else t.astimezone(timezone.utc).replace(tzinfo=None) for t in times], dtype="datetime64[us]")
+
+def empty(numpy):
+    return numpy.array([], dtype="datetime64[us]")
+
+def merged(numpy, arrays):
+    """Sort these arrays of times together without repeats"""
+    arrays = [arr for arr in arrays if len(arr)]
+    if not arrays:
+        return empty(numpy)
+    return numpy.unique(numpy.concatenate(arrays))
+
+def occurrences_array(spec, start, end):
+    """
+    Return the times from spec.occurrences(start, end) as an array
+
+    With numpy this is an array of datetime64[us] made by
+    ``spec.occurrence_times``. Times with a timezone are given in UTC and are
+    found with ``spec.occurrences``. Without numpy it's an array("q") of
+    seconds since the epoch, with microseconds dropped.
+    """
+    numpy = optional_module("numpy")
+    if numpy is None:
+        return array("q", (calendar.timegm(t.utctimetuple()) for t in spec.occurrences(start, end)))
+
+    try:
+        epoch_us(numpy, start)
+        epoch_us(numpy, end)
+        return spec.occurrence_times(numpy, start, end)
+    except HasTimezone:
+        return from_datetimes(numpy, spec.occurrences(start, end))
+
+def each(func, times):
+    """The pure python fallback: call func with every time"""
+    return [bool(func(t)) for t in times]
+
+def fields(times):
+    """
+    Return Fields for these times, or None if we can't use numpy for them
+
+    We can't use numpy if it isn't installed, or if we have datetimes with a
+    timezone, because numpy would turn those into UTC and filters look at the
+    local time.
+    """
+    if isinstance(times, Fields):
+        return times
+
+    numpy = optional_module("numpy")
+    if numpy is None:
+        return None
+
+    if not isinstance(times, numpy.ndarray):
+        times = list(times)
+        if any(getattr(t, "tzinfo", None) is not None for t in times):
+            return None
+
+    return Fields(numpy, numpy.asarray(times, dtype="datetime64[us]"))
+
+class Fields(object):
+    """
+    An array of times and the parts of them that filters look at
+
+    Each part is only worked out the first time it's asked for, so specs
+    that share a Fields share the work.
+    """
+    def __init__(self, numpy, times):
+        self.numpy = numpy
+        self.times = times
+        self.found = {}
+
+    def get(self, name):
+        if name not in self.found:
+            self.found[name] = getattr(self, "make_{0}".format(name))()
+        return self.found[name]
+
+    def everything(self, value=True):
+        return self.numpy.full(self.times.shape, value, dtype=bool)
+
+    def isin(self, name, allowed):
+        return self.numpy.isin(self.get(name), list(allowed))
+
+    def each(self, func):
+        """Call func with each time as a datetime, for specs that can't work on the array"""
+        found = [bool(func(t)) for t in self.times.astype(datetime).ravel()]
+        return self.numpy.array(found, dtype=bool).reshape(self.times.shape)
+
+    def datetime64(self, dt):
+        """Return dt as a datetime64 or None if it has a timezone and can't be compared with our times"""
+        if dt.tzinfo is not None:
+            return None
+        return self.numpy.datetime64(dt, "us")
+
+    def as_int(self, unit):
+        return self.times.astype("datetime64[{0}]".format(unit)).astype("int64")
+
+    def make_minute(self):
+        return self.as_int("m") % 60
+
+    def make_hour(self):
+        return self.as_int("h") % 24
+
+    def make_days(self):
+        return self.as_int("D")
+
+    def make_weekday(self):
+        # 1970-01-01 was a Thursday and Monday is 0
+        return (self.get("days") + 3) % 7
+
+    def make_month(self):
+        return self.as_int("M") % 12 + 1
+
+    def make_year_start(self):
+        """Days since the epoch of the first day of the year for each time"""
+        return self.times.astype("datetime64[Y]").astype("datetime64[D]").astype("int64")
+
+    def make_day_of_year(self):
+        return self.get("days") - self.get("year_start") + 1
+
+    def make_week(self):
+        """The same week number as timepiece.sections.final.gregorian_week"""
+        days = self.get("days")
+
+        # The iso week is counted from the start of the year its Thursday is in
+        thursday = days + 3 - self.get("weekday")
+        iso_year_start = thursday.astype("datetime64[D]").astype("datetime64[Y]").astype("datetime64[D]").astype("int64")
+        iso_week = (thursday - iso_year_start) // 7 + 1
+
+        # gregorian_week takes one off unless the first Monday of the year is in iso week 1
+        # Which is when the year doesn't start on a Tuesday, Wednesday or Thursday
+        first_weekday = (self.get("year_start") + 3) % 7
+        return iso_week - self.numpy.isin(first_weekday, [1, 2, 3])